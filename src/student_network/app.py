@@ -7,17 +7,22 @@ import os
 import sqlite3
 from datetime import datetime
 
+import student_network.helpers.helper_images as helper_images
+import student_network.helpers.helper_migrations as helper_migrations
+import student_network.helpers.helper_reference as helper_reference
 import student_network.views.achievements as achievements
 import student_network.views.chat as chat
 import student_network.views.connections as connections
 import student_network.views.flashcards as flashcards
 import student_network.views.login as login
+import student_network.views.media as media
 import student_network.views.posts as posts
 import student_network.views.profile as profile
 import student_network.views.quizzes as quizzes
 import student_network.views.staff as staff
 from flask import Flask, request, session
 from flask_socketio import SocketIO
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
@@ -28,6 +33,7 @@ app.register_blueprint(achievements.achievements_blueprint, url_prefix="")
 app.register_blueprint(chat.chat_blueprint, url_prefix="")
 app.register_blueprint(connections.connections_blueprint, url_prefix="")
 app.register_blueprint(login.login_blueprint, url_prefix="")
+app.register_blueprint(media.media_blueprint, url_prefix="")
 app.register_blueprint(posts.posts_blueprint, url_prefix="")
 app.register_blueprint(profile.profile_blueprint, url_prefix="")
 app.register_blueprint(quizzes.quizzes_blueprint, url_prefix="")
@@ -37,8 +43,27 @@ app.secret_key = (
     '\xfd{H\xe5 <\x95\xf9\xe3\x96.5\xd1\x01O <!\xd5"' "xa2\xa0\x9fR\xa1\xa8"
 )
 app.url_map.strict_slashes = False
+# Lets the web server in front of the application send uploaded images rather
+# than the Python workers, using either X-Sendfile or nginx's X-Accel-Redirect.
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
+app.config["MEDIA_ACCEL_REDIRECT"] = os.environ.get("MEDIA_ACCEL_REDIRECT")
+# Trusts the client address given by this many proxies in front of the
+# application, such as nginx, so that logins are limited by the address of
+# the client rather than the proxy. Only set this when behind a proxy, as
+# otherwise clients could choose their own address.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+# Lets templates request a smaller size of an uploaded image.
+app.add_template_filter(helper_images.get_variant_url, "variant")
 users = {}
 
+# Brings the database schema up to date before any requests are handled.
+with sqlite3.connect("db.sqlite3") as migration_conn:
+    helper_migrations.apply_migrations(migration_conn)
+# Reads the reference tables once, as they only change when deploying.
+helper_reference.reload_reference_data()
+
 
 @socketio.on("username", namespace="/private")
 def receive_username(username):
@@ -4,16 +4,65 @@ Performs checks and actions to help the achievements system work effectively.
 import os
 import sqlite3
 from datetime import date
-from typing import Sized, Tuple
+from typing import List, Sized, Tuple
 
+import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
-import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_reference as helper_reference
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import session
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
 
 
+def award_achievement(cur, username: str, achievement_id: int) -> bool:
+    """
+    Marks an achievement as unlocked by the user and awards its experience,
+    using the caller's transaction. The caller must commit, and then call
+    announce_achievement if an achievement was unlocked.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user who unlocked the achievement.
+        achievement_id: The ID of the achievement unlocked.
+
+    Returns:
+        Whether the user didn't already have the achievement.
+    """
+    cur.execute(
+        "INSERT OR IGNORE INTO CompleteAchievements "
+        "(username, achievement_ID, date_completed) VALUES (?, ?, ?);",
+        (username, achievement_id, date.today()),
+    )
+    if cur.rowcount == 0:
+        return False
+    cur.execute(
+        "INSERT OR IGNORE INTO UserLevel (username, experience) VALUES (?, 0);",
+        (username,),
+    )
+    achievement = helper_reference.get_achievements().get(achievement_id)
+    cur.execute(
+        "UPDATE UserLevel SET experience = experience + ? WHERE username=?;",
+        (achievement.xp_value if achievement else 0, username),
+    )
+    return True
+
+
+def announce_achievement(username: str):
+    """
+    Notifies a user that they've unlocked an achievement, once it has been
+    committed.
+
+    Args:
+        username: The user who unlocked the achievement.
+    """
+    helper_user_cards.invalidate_user_card(username)
+    helper_general.new_notification_username(
+        username, "You have received an achievement badge!", "/achievements"
+    )
+
+
 def apply_achievement(username: str, achievement_id: int):
     """
     Marks an achievement as unlocked by the user.
@@ -24,35 +73,34 @@ def apply_achievement(username: str, achievement_id: int):
     """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute(
-            "SELECT * FROM CompleteAchievements "
-            "WHERE (username=? AND achievement_ID=?);",
-            (username, achievement_id),
-        )
-        if cur.fetchone() is None:
-            cur.execute(
-                "INSERT INTO CompleteAchievements "
-                "(username, achievement_ID, date_completed) VALUES (?, ?, ?);",
-                (username, achievement_id, date.today()),
-            )
-            conn.commit()
-            cur.execute(
-                "SELECT xp_value FROM Achievements WHERE achievement_ID=?;",
-                (achievement_id,),
-            )
-            exp = cur.fetchone()[0]
-            helper_general.check_level_exists(username, conn)
-            cur.execute(
-                "UPDATE UserLevel "
-                "SET experience = experience + ? "
-                "WHERE username=?;",
-                (exp, username),
-            )
-            conn.commit()
-
-            helper_general.new_notification(
-                "You have received an achievement badge!", "/achievements"
-            )
+        unlocked = award_achievement(cur, username, achievement_id)
+        conn.commit()
+    if unlocked:
+        announce_achievement(username)
+
+
+def get_unlocked_achievements(cur, username: str) -> List[Sized]:
+    """
+    Gets the achievements which a user has unlocked.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user to get the achievements of.
+
+    Returns:
+        The details of each unlocked achievement, sorted by XP descending.
+    """
+    achievements = helper_reference.get_achievements()
+    cur.execute(
+        "SELECT achievement_ID FROM CompleteAchievements WHERE username=?;",
+        (username,),
+    )
+    unlocked_achievements = [
+        achievements[row[0]] for row in cur.fetchall() if row[0] in achievements
+    ]
+    unlocked_achievements.sort(key=lambda x: x.xp_value, reverse=True)
+
+    return unlocked_achievements
 
 
 def get_achievements(username: str) -> Tuple[Sized, Sized]:
@@ -63,27 +111,16 @@ def get_achievements(username: str) -> Tuple[Sized, Sized]:
         A list of unlocked and locked achievements and their details.
     """
     with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        # Gets unlocked achievements, sorted by XP descending.
-        cur.execute(
-            "SELECT description, icon, rarity, xp_value, achievement_name "
-            "FROM CompleteAchievements "
-            "INNER JOIN Achievements ON CompleteAchievements"
-            ".achievement_ID = Achievements.achievement_ID "
-            "WHERE username=?;",
-            (username,),
-        )
-        unlocked_achievements = cur.fetchall()
-        unlocked_achievements.sort(key=lambda x: x[3], reverse=True)
-
-        # Get locked achievements, sorted by XP ascending.
-        cur.execute(
-            "SELECT description, icon, rarity, xp_value, achievement_name "
-            "FROM Achievements"
-        )
-        all_achievements = cur.fetchall()
-        locked_achievements = list(set(all_achievements) - set(unlocked_achievements))
-        locked_achievements.sort(key=lambda x: x[3])
+        unlocked_achievements = get_unlocked_achievements(conn.cursor(), username)
+
+    # Get locked achievements, sorted by XP ascending.
+    achievements = helper_reference.get_achievements()
+    unlocked_ids = {achievement.achievement_id for achievement in unlocked_achievements}
+    locked_achievements = [
+        achievements[achievement_id]
+        for achievement_id in sorted(achievements.keys() - unlocked_ids)
+    ]
+    locked_achievements.sort(key=lambda x: x.xp_value)
 
     return unlocked_achievements, locked_achievements
 
@@ -99,8 +136,8 @@ def update_close_connection_achievements(cur):
     apply_achievement(session["username"], 12)
 
     # Award achievement ID 13 - Friend Group if necessary
-    cur.execute("SELECT * FROM CloseFriend WHERE user1=?;", (session["username"],))
-    if len(cur.fetchall()) >= 10:
+    counts = helper_connections.get_connection_counts(cur, session["username"])
+    if counts.close_friends >= 10:
         apply_achievement(session["username"], 13)
 
 
@@ -118,72 +155,32 @@ def update_connection_achievements(cur, username: str):
     # Award achievement ID 4 to connected user
     apply_achievement(username, 4)
 
-    # Get user interests and hobbies
-    cur.execute(
-        "SELECT interest FROM UserInterests WHERE username=?;",
-        (session["username"],),
+    # Checks for shared hobbies and interests in a single query.
+    (
+        shared_hobbies,
+        shared_interests,
+    ) = helper_connections.get_shared_hobbies_and_interests(
+        cur, session["username"], username
     )
-    row = cur.fetchall()
-    my_interests = []
-    for interest in row:
-        my_interests.append(interest[0])
-    cur.execute("SELECT hobby FROM UserHobby WHERE username=?;", (session["username"],))
-    row = cur.fetchall()
-    my_hobbies = []
-    for hobby in row:
-        my_hobbies.append(hobby[0])
-    # Get connected user interests and hobbies
-    cur.execute("SELECT interest FROM UserInterests WHERE username=?;", (username,))
-    row = cur.fetchall()
-    connection_interests = []
-    for interest in row:
-        connection_interests.append(interest[0])
-    cur.execute("SELECT hobby FROM UserHobby WHERE username=?;", (username,))
-    row = cur.fetchall()
-    connection_hobbies = []
-    for hobby in row:
-        connection_hobbies.append(hobby[0])
     # Awards achievement ID 16 - Shared interests if necessary.
-    common_interests = set(my_interests) - (
-        set(my_interests) - set(connection_interests)
-    )
-    if common_interests:
+    if shared_interests:
         apply_achievement(session["username"], 16)
         # Award achievement ID 16 to connected user
         apply_achievement(username, 16)
 
     # Award achievement ID 26 - Shared hobbies if necessary
-    common_hobbies = set(my_hobbies) - (set(my_hobbies) - set(connection_hobbies))
-    if common_hobbies:
+    if shared_hobbies:
         apply_achievement(session["username"], 26)
         # Award achievement ID 26 to connected user
         apply_achievement(username, 26)
 
-    # Get connections
-    cons_user = helper_general.get_all_connections(session["username"])
-    cons_user2 = helper_general.get_all_connections(username)
-    # Get user degree and connections degree
-    degree = helper_profile.get_degree(session["username"])[0]
-    degree_user2 = helper_profile.get_degree(username)[0]
-    # Get count of connections who study a different degree
-    valid_user_count = 0
-    for user in cons_user:
-        cur.execute(
-            "SELECT username from UserProfile WHERE degree!=? AND username=?;",
-            (degree, user[0]),
-        )
-        if cur.fetchone():
-            valid_user_count += 1
-    # Gets count of other user connections who study a
-    # different degree.
-    valid_user_count2 = 0
-    for user in cons_user2:
-        cur.execute(
-            "SELECT username from UserProfile WHERE degree!=? AND username=?;",
-            (degree_user2, user[0]),
-        )
-        if cur.fetchone():
-            valid_user_count2 += 1
+    # Gets how many connections of both users study a different degree, in a
+    # single grouped query.
+    counts = helper_connections.get_connection_degree_counts(
+        cur, [session["username"], username]
+    )
+    _, valid_user_count = counts[session["username"]]
+    _, valid_user_count2 = counts[username]
     # Awards achievement ID 14 - Reaching out if necessary.
     if valid_user_count >= 1:
         apply_achievement(session["username"], 14)
@@ -198,9 +195,11 @@ def update_connection_achievements(cur, username: str):
     if valid_user_count2 >= 10:
         apply_achievement(username, 15)
 
-    # Get number of connections
-    con_count_user = len(cons_user)
-    con_count_user2 = len(cons_user2)
+    # Reads the number of connections of both users from their kept counts.
+    user_counts = helper_connections.get_connection_counts(cur, session["username"])
+    user2_counts = helper_connections.get_connection_counts(cur, username)
+    con_count_user, con_count_user2 = user_counts.connections, user2_counts.connections
+
     # Award achievement ID 5 - Popular if necessary
     if con_count_user >= 10:
         apply_achievement(session["username"], 5)
@@ -274,23 +273,39 @@ def update_profile_achievements(username: str):
         apply_achievement(session["username"], 23)
 
 
-def update_quiz_achievements(score: int, other_user: bool = False):
+def update_quiz_achievements(
+    cur, username: str, author: str, score: int, question_count: int
+) -> list:
     """
-    Updates achievements after completing a quiz.
+    Updates achievements after completing a quiz, using the caller's
+    transaction.
 
     Args:
+        cur: Cursor for the SQLite database.
+        username: The user who completed the quiz.
+        author: The author of the quiz.
         score: Number of correct answers from the quiz.
+        question_count: Number of questions in the quiz.
+
+    Returns:
+        The users who unlocked an achievement, to announce once committed.
     """
+    unlocked = []
     # Award achievement ID 27 - Boffin if necessary
-    apply_achievement(session["username"], 27)
+    if award_achievement(cur, username, 27):
+        unlocked.append(username)
 
     # Award achievement ID 28 - Brainiac if necessary
-    if score == 5:
-        apply_achievement(session["username"], 28)
+    if question_count and score == question_count:
+        if award_achievement(cur, username, 28):
+            unlocked.append(username)
 
     # Award achievement ID 30 - Trivia writer if necessary
-    if other_user:
-        apply_achievement(session["username"], 30)
+    if author != username:
+        if award_achievement(cur, author, 30):
+            unlocked.append(author)
+
+    return unlocked
 
 
 def update_flashcard_achievements(author, plays):
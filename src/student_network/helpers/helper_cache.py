@@ -0,0 +1,146 @@
+"""
+Provides in-memory caches which are bounded in size and age, so that data
+which is read on almost every page doesn't need to be fetched from the
+database every time.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Every cache which has been created, so their statistics can be reported.
+caches = {}
+
+
+class LRUCache:
+    """
+    A least-recently-used cache with a maximum size, where entries also
+    expire after a given number of seconds.
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl: float = 300):
+        """
+        Args:
+            name: The name of the cache, used when reporting statistics.
+            max_size: The maximum number of entries held in the cache.
+            ttl: The number of seconds that an entry remains valid for.
+        """
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        caches[name] = self
+
+    def get_many(self, keys) -> dict:
+        """
+        Gets the entries which are cached for the given keys.
+
+        Args:
+            keys: The keys to look up.
+
+        Returns:
+            A dictionary of the keys which were found to their values.
+        """
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    self.misses += 1
+
+        return found
+
+    def get(self, key, default=None):
+        """
+        Gets the entry which is cached for the given key.
+
+        Args:
+            key: The key to look up.
+            default: The value to return if the key isn't cached.
+
+        Returns:
+            The cached value, or the default if it isn't cached.
+        """
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, entries: dict):
+        """
+        Caches the given entries, evicting the least recently used entries if
+        the cache is full.
+
+        Args:
+            entries: A dictionary of keys to the values to cache.
+        """
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        """
+        Caches the given value.
+
+        Args:
+            key: The key to cache the value under.
+            value: The value to cache.
+        """
+        self.set_many({key: value})
+
+    def invalidate(self, key):
+        """
+        Removes an entry from the cache, if it's cached.
+
+        Args:
+            key: The key of the entry to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Gets statistics on how effective the cache has been.
+
+        Returns:
+            The size of the cache, and its number of hits, misses and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def get_cache_stats() -> list:
+    """
+    Gets statistics for every cache.
+
+    Returns:
+        A list of statistics for each cache.
+    """
+    return [cache.stats() for cache in caches.values()]
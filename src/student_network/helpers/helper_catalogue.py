@@ -0,0 +1,125 @@
+"""
+Lists quizzes and flashcard sets for their catalogue pages, most played first,
+one page at a time. Pages are found using the position of the last item on
+the previous page rather than an offset, so that every page is read straight
+from an index however many quizzes and sets there are.
+"""
+
+from typing import List, Optional, Tuple
+
+# The number of quizzes or sets shown on each page of the catalogue.
+PAGE_SIZE = 20
+
+# The table of each catalogue, with its ID, name, plays and count columns.
+_CATALOGUES = {
+    "quizzes": ("Quiz", "quiz_id", "quiz_name", "plays", "question_count"),
+    "sets": ("QuestionSets", "set_id", "set_name", "cards_played", "card_count"),
+}
+
+
+def encode_cursor(plays: int, item_id: int) -> str:
+    """
+    Gets the cursor for the position after an item in a catalogue.
+
+    Args:
+        plays: The number of times the item has been played.
+        item_id: The ID of the item.
+
+    Returns:
+        The cursor, to be passed back as the after parameter.
+    """
+    return "{}-{}".format(plays, item_id)
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Gets the position in a catalogue that a cursor refers to.
+
+    Args:
+        cursor: The cursor given for the previous page.
+
+    Returns:
+        The plays and ID of the last item on the previous page, or None if
+        the cursor is missing or invalid, which gives the first page.
+    """
+    try:
+        plays, item_id = cursor.split("-")
+        return int(plays), int(item_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _get_page(
+    cur, catalogue: str, author: Optional[str], after: Optional[str], limit: int
+) -> Tuple[List[list], Optional[str]]:
+    """
+    Gets a page of a catalogue, ordered by plays and then newest first.
+    """
+    table, id_column, name_column, plays_column, count_column = _CATALOGUES[catalogue]
+    conditions, parameters = [], []
+    if author is not None:
+        conditions.append("author=?")
+        parameters.append(author)
+    position = decode_cursor(after)
+    if position is not None:
+        conditions.append("({}, {}) < (?, ?)".format(plays_column, id_column))
+        parameters.extend(position)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    # Fetches one extra item to find out whether there's another page.
+    cur.execute(
+        "SELECT {id}, date_created, author, {name}, {plays}, {count} FROM {table} "
+        "{where} ORDER BY {plays} DESC, {id} DESC LIMIT ?;".format(
+            id=id_column,
+            name=name_column,
+            plays=plays_column,
+            count=count_column,
+            table=table,
+            where=where,
+        ),
+        parameters + [limit + 1],
+    )
+    rows = [list(row) for row in cur.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][4], rows[-1][0])
+    return rows, next_cursor
+
+
+def get_quizzes(
+    cur, author: Optional[str] = None, after: Optional[str] = None, limit=PAGE_SIZE
+) -> Tuple[List[list], Optional[str]]:
+    """
+    Gets a page of quizzes, most played first.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        author: The username to only get quizzes created by.
+        after: The cursor given for the previous page.
+        limit: The number of quizzes on the page.
+
+    Returns:
+        The ID, date created, author, name, plays and number of questions of
+        each quiz, and the cursor for the next page if there is one.
+    """
+    return _get_page(cur, "quizzes", author, after, limit)
+
+
+def get_sets(
+    cur, author: Optional[str] = None, after: Optional[str] = None, limit=PAGE_SIZE
+) -> Tuple[List[list], Optional[str]]:
+    """
+    Gets a page of flashcard sets, most played first.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        author: The username to only get sets created by.
+        after: The cursor given for the previous page.
+        limit: The number of sets on the page.
+
+    Returns:
+        The ID, date created, author, name, plays and number of cards of each
+        set, and the cursor for the next page if there is one.
+    """
+    return _get_page(cur, "sets", author, after, limit)
@@ -1,10 +1,14 @@
 """
 Performs checks and actions to help user connections work effectively.
 """
+
+import itertools
 import os
 import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_graph as helper_graph
 import student_network.helpers.helper_profile as helper_profile
 from flask import session
 
@@ -12,61 +16,303 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
 
 
+# How a connection started by the other user looks to the user.
+INCOMING_TYPES = {"request": "incoming", "connected": "connected", "block": "blocked"}
+# The number of users whose relationships are got in each query, which keeps
+# the query within SQLite's limit of 999 placeholders.
+RELATIONSHIP_BATCH_SIZE = 400
+# The badge shown next to users in lists of members for each connection type.
+RELATIONSHIP_BADGES = {
+    "connected": "Connected",
+    "request": "Request sent",
+    "incoming": "Wants to connect",
+    "block": "Blocked",
+}
+# The score added to recommended users in the same community as the user.
+CLUSTER_SCORE = 10
+# Each pair of users has at most one connection, whichever of them started it,
+# which is found by the pair in this order using Connection_pair_index.
+PAIR_CONDITION = "min(user1, user2)=? AND max(user1, user2)=?"
+
+
+def get_pair(username1: str, username2: str) -> Tuple[str, str]:
+    """
+    Orders a pair of users in the same way as Connection_pair_index, so that
+    their connection can be found whichever of them started it.
+
+    Args:
+        username1: The first user.
+        username2: The second user.
+
+    Returns:
+        The usernames in order.
+    """
+    return min(username1, username2), max(username1, username2)
+
+
+def request_connection(cur, username: str, other: str) -> bool:
+    """
+    Sends a connection request, unless the users already have a connection.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user sending the request.
+        other: The user to send the request to.
+
+    Returns:
+        Whether the request was sent.
+    """
+    cur.execute(
+        "INSERT INTO Connection (user1, user2, connection_type) "
+        "SELECT ?, ?, 'request' WHERE EXISTS "
+        "(SELECT 1 FROM ACCOUNTS WHERE username=?) ON CONFLICT DO NOTHING;",
+        (username, other, other),
+    )
+    return cur.rowcount > 0
+
+
+def accept_connection(cur, username: str, requester: str) -> bool:
+    """
+    Accepts a connection request sent to the user.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user accepting the request.
+        requester: The user who sent the request.
+
+    Returns:
+        Whether there was a request to accept.
+    """
+    cur.execute(
+        "UPDATE Connection SET connection_type='connected' "
+        "WHERE user1=? AND user2=? AND connection_type='request';",
+        (requester, username),
+    )
+    return cur.rowcount > 0
+
+
+def block_connection(cur, username: str, other: str) -> bool:
+    """
+    Blocks a user, replacing any connection or request between them. If the
+    other user had already blocked the user, their block is kept, so that
+    the user can't remove it by blocking them back and then unblocking them.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user blocking the other.
+        other: The user to block.
+
+    Returns:
+        Whether the user was blocked.
+    """
+    cur.execute(
+        "INSERT INTO Connection (user1, user2, connection_type) "
+        "SELECT ?, ?, 'block' WHERE EXISTS "
+        "(SELECT 1 FROM ACCOUNTS WHERE username=?) "
+        "ON CONFLICT (min(user1, user2), max(user1, user2)) DO UPDATE "
+        "SET user1=excluded.user1, user2=excluded.user2, connection_type='block' "
+        "WHERE Connection.connection_type != 'block';",
+        (username, other, other),
+    )
+    return cur.rowcount > 0
+
+
+def unblock_connection(cur, username: str, other: str) -> bool:
+    """
+    Unblocks a user blocked by the user.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user who blocked the other.
+        other: The user to unblock.
+
+    Returns:
+        Whether the user had been blocked.
+    """
+    cur.execute(
+        "DELETE FROM Connection "
+        "WHERE user1=? AND user2=? AND connection_type='block';",
+        (username, other),
+    )
+    return cur.rowcount > 0
+
+
+def remove_connection(cur, username: str, other: str) -> bool:
+    """
+    Removes the connection or request between two users, along with any close
+    friends between them. Blocks made by the other user aren't removed.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user removing the connection.
+        other: The user to remove the connection with.
+
+    Returns:
+        Whether there was a connection to remove.
+    """
+    cur.execute(
+        "DELETE FROM Connection WHERE " + PAIR_CONDITION + " "
+        "AND NOT (user1=? AND connection_type='block');",
+        (*get_pair(username, other), other),
+    )
+    return cur.rowcount > 0
+
+
+def add_close_friend(cur, username: str, other: str) -> bool:
+    """
+    Adds a connection as a close friend.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user adding the close friend.
+        other: The connection to add as a close friend.
+
+    Returns:
+        Whether the close friend was added.
+    """
+    cur.execute(
+        "INSERT OR IGNORE INTO CloseFriend (user1, user2) SELECT ?, ? "
+        "WHERE EXISTS (SELECT 1 FROM Connection WHERE " + PAIR_CONDITION + " "
+        "AND connection_type='connected');",
+        (username, other, *get_pair(username, other)),
+    )
+    return cur.rowcount > 0
+
+
+def remove_close_friend(cur, username: str, other: str) -> bool:
+    """
+    Removes a close friend.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user removing the close friend.
+        other: The close friend to remove.
+
+    Returns:
+        Whether they had been a close friend.
+    """
+    cur.execute("DELETE FROM CloseFriend WHERE user1=? AND user2=?;", (username, other))
+    return cur.rowcount > 0
+
+
 def delete_connection(username: str) -> bool:
     """
-    Deletes all connections with the given user.
+    Deletes the connection with the given user.
 
     Args:
-        username: The user to delete all connections with.
+        username: The user to delete the connection with.
 
     Returns:
-        Whether deleting connections was successful (True/False).
-    """
-    # Checks that the user isn't trying to remove a connection with
-    # themselves.
-    if username != session["username"]:
-        with sqlite3.connect("db.sqlite3") as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-
-            # Searches for the connection in the database.
-            if cur.fetchone() is not None:
-                row = cur.execute(
-                    "SELECT * FROM Connection WHERE (user1=? AND user2=?) OR "
-                    "(user1=? AND user2=?);",
-                    (username, session["username"], session["username"], username),
-                )
-                # Removes the connection from the database if it exists.
-                if row:
-                    cur.execute(
-                        "DELETE FROM Connection WHERE (user1=? AND user2=?) "
-                        "OR (user1=? AND user2=?);",
-                        (username, session["username"], session["username"], username),
-                    )
-                    row = cur.execute(
-                        "SELECT * FROM Connection "
-                        "WHERE (user1=? AND user2=?) "
-                        "OR (user1=? AND user2=?);",
-                        (username, session["username"], session["username"], username),
-                    )
-                    if row:
-                        cur.execute(
-                            "DELETE FROM CloseFriend "
-                            "WHERE (user1=? AND user2=?) "
-                            "OR (user1=? AND user2=?);",
-                            (
-                                username,
-                                session["username"],
-                                session["username"],
-                                username,
-                            ),
-                        )
-                    conn.commit()
-                    return True
-                else:
-                    return True
-            else:
-                return False
+        Whether there was a connection to delete.
+    """
+    with sqlite3.connect("db.sqlite3") as conn:
+        deleted = remove_connection(conn.cursor(), session["username"], username)
+        conn.commit()
+
+    return deleted
+
+
+class ConnectionCounts(NamedTuple):
+    """
+    The number of connections of each kind that a user has, as kept in
+    UserConnectionCounts.
+    """
+
+    connections: int = 0
+    incoming_requests: int = 0
+    outgoing_requests: int = 0
+    close_friends: int = 0
+    blocked: int = 0
+
+
+def get_connection_counts(cur, username: str) -> ConnectionCounts:
+    """
+    Gets the number of connections of each kind that a user has.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user to get the counts of.
+
+    Returns:
+        The user's counts.
+    """
+    cur.execute(
+        "SELECT connections, incoming_requests, outgoing_requests, close_friends, "
+        "blocked FROM UserConnectionCounts WHERE username=?;",
+        (username,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return ConnectionCounts()
+    return ConnectionCounts(*row)
+
+
+def count_all_connections(cur) -> Dict[str, ConnectionCounts]:
+    """
+    Counts the connections of each kind that every user has from the
+    connections themselves, rather than the kept counts.
+
+    Args:
+        cur: Cursor for the SQLite database.
+
+    Returns:
+        The counts of each user with any connections.
+    """
+    cur.execute(
+        "SELECT username, SUM(connected), SUM(incoming), SUM(outgoing), "
+        "SUM(close), SUM(blocked) FROM ("
+        "SELECT user1 AS username, connection_type = 'connected' AS connected, "
+        "0 AS incoming, connection_type = 'request' AS outgoing, 0 AS close, "
+        "connection_type = 'block' AS blocked FROM Connection UNION ALL "
+        "SELECT user2, connection_type = 'connected', "
+        "connection_type = 'request', 0, 0, 0 FROM Connection UNION ALL "
+        "SELECT user1, 0, 0, 0, 1, 0 FROM CloseFriend) GROUP BY username;"
+    )
+    return {row[0]: ConnectionCounts(*row[1:]) for row in cur.fetchall()}
+
+
+def repair_connection_counts(
+    cur, repair: bool = True
+) -> List[Tuple[str, ConnectionCounts, ConnectionCounts]]:
+    """
+    Finds the users whose kept counts don't match their connections, and
+    replaces their counts with the correct ones. The caller must commit.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        repair: Whether to replace the incorrect counts, rather than only
+            finding them.
+
+    Returns:
+        Each user with incorrect counts, along with their kept and correct
+        counts.
+    """
+    actual = count_all_connections(cur)
+    cur.execute(
+        "SELECT username, connections, incoming_requests, outgoing_requests, "
+        "close_friends, blocked FROM UserConnectionCounts;"
+    )
+    kept = {row[0]: ConnectionCounts(*row[1:]) for row in cur.fetchall()}
+
+    mismatches = [
+        (
+            username,
+            kept.get(username, ConnectionCounts()),
+            actual.get(username, ConnectionCounts()),
+        )
+        for username in sorted(kept.keys() | actual.keys())
+        if kept.get(username, ConnectionCounts())
+        != actual.get(username, ConnectionCounts())
+    ]
+    if repair:
+        cur.executemany(
+            "INSERT OR REPLACE INTO UserConnectionCounts (username, connections, "
+            "incoming_requests, outgoing_requests, close_friends, blocked) "
+            "VALUES (?, ?, ?, ?, ?, ?);",
+            [(username, *counts) for username, _, counts in mismatches],
+        )
+
+    return mismatches
 
 
 def get_connection_request_count() -> int:
@@ -81,15 +327,39 @@ def get_connection_request_count() -> int:
         return 0
 
     with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT * FROM Connection WHERE user2=? AND connection_type='request';",
-            (session["username"],),
-        )
-        return len(list(cur.fetchall()))
+        counts = get_connection_counts(conn.cursor(), session["username"])
+        return counts.incoming_requests
 
 
-def get_connection_type(username: str):
+def read_connection_type(cur, username: str, other: str) -> Optional[str]:
+    """
+    Checks what type of connection a user has with another user, from the
+    user's point of view.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose point of view to take.
+        other: The user to check the connection type with.
+
+    Returns:
+        The type of connection ("request", "connected" or "block" if started
+        by the user, or "incoming", "connected" or "blocked" if started by the
+        other user), or None if there isn't one.
+    """
+    cur.execute(
+        "SELECT user1, connection_type FROM Connection WHERE " + PAIR_CONDITION + ";",
+        get_pair(username, other),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    initiator, connection_type = row
+    if initiator == username:
+        return connection_type
+    return INCOMING_TYPES[connection_type]
+
+
+def get_connection_type(username: str) -> Optional[str]:
     """
     Checks what type of connection the user has with the specified user.
 
@@ -100,38 +370,105 @@ def get_connection_type(username: str):
         The type of connection with the specified user.
     """
     with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
+        return read_connection_type(conn.cursor(), session["username"], username)
+
+
+class Relationship(NamedTuple):
+    """
+    How a user relates to the viewer, for showing alongside the user in
+    lists of members.
+    """
+
+    connection_type: Optional[str]
+    close_friend: bool
+    close_friend_of: bool
+    mutual_connections: int
+
+
+def get_relationships(
+    cur, viewer: str, usernames: List[str]
+) -> Dict[str, Relationship]:
+    """
+    Gets how each of many users relates to the viewer, using one query for
+    each batch of users rather than several queries for each user.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        viewer: The user viewing the list.
+        usernames: The users in the list.
+
+    Returns:
+        The type of connection each user has with the viewer, from the
+        viewer's point of view as in read_connection_type, whether the viewer
+        has them as a close friend, whether they have the viewer as a close
+        friend, and their number of mutual connections, by username. The
+        viewer isn't included.
+    """
+    usernames = list(dict.fromkeys(x for x in usernames if x != viewer))
+    relationships = {}
+    for start in range(0, len(usernames), RELATIONSHIP_BATCH_SIZE):
+        batch = usernames[start : start + RELATIONSHIP_BATCH_SIZE]
+        # The viewer is ?1, so the users in the batch start from ?2.
         cur.execute(
-            "SELECT connection_type FROM Connection WHERE user1=? AND user2=?",
-            (
-                session["username"],
-                username,
+            "WITH targets (username) AS (VALUES {0}), "
+            "viewer_connections (username) AS ("
+            "SELECT user2 FROM Connection "
+            "WHERE user1=?1 AND connection_type='connected' UNION ALL "
+            "SELECT user1 FROM Connection "
+            "WHERE user2=?1 AND connection_type='connected') "
+            "SELECT targets.username, "
+            "(SELECT CASE WHEN user1=?1 THEN connection_type "
+            "WHEN connection_type='request' THEN 'incoming' "
+            "WHEN connection_type='block' THEN 'blocked' "
+            "ELSE connection_type END FROM Connection "
+            "WHERE min(user1, user2)=min(targets.username, ?1) "
+            "AND max(user1, user2)=max(targets.username, ?1)), "
+            "EXISTS (SELECT 1 FROM CloseFriend "
+            "WHERE user1=?1 AND user2=targets.username), "
+            "EXISTS (SELECT 1 FROM CloseFriend "
+            "WHERE user1=targets.username AND user2=?1), "
+            "(SELECT COUNT(*) FROM ("
+            "SELECT user2 AS username FROM Connection "
+            "WHERE user1=targets.username AND connection_type='connected' "
+            "UNION ALL SELECT user1 FROM Connection "
+            "WHERE user2=targets.username AND connection_type='connected') "
+            "AS theirs WHERE theirs.username IN viewer_connections) "
+            "FROM targets;".format(
+                ", ".join("(?{})".format(i + 2) for i in range(len(batch)))
             ),
+            (viewer, *batch),
         )
-        conn.commit()
-
-        # Checks if there is a connection between the two users.
-        row = cur.fetchone()
-        if row:
-            return row[0]
-        else:
-            cur.execute(
-                "SELECT connection_type FROM Connection WHERE user1=? AND user2=?",
-                (
-                    username,
-                    session["username"],
-                ),
+        for username, connection_type, close, close_of, mutual in cur.fetchall():
+            relationships[username] = Relationship(
+                connection_type, bool(close), bool(close_of), mutual
             )
-            conn.commit()
-            row = cur.fetchone()
-            if row:
-                if row[0] == "connected":
-                    return "connected"
-                elif row[0] == "block":
-                    return "blocked"
-                return "incoming"
-            else:
-                return None
+
+    return relationships
+
+
+def get_relationship_badge(relationship: Optional[Relationship]) -> Tuple[str, int]:
+    """
+    Describes how a user relates to the viewer, for showing as a badge next
+    to them in lists of members. Users who have blocked the viewer are shown
+    without a badge or mutual connections, so that they can't be told apart
+    from strangers.
+
+    Args:
+        relationship: The user's relationship with the viewer, or None if the
+            viewer isn't logged in or is the user.
+
+    Returns:
+        The text of the badge, which is empty if there isn't one, and the
+        number of mutual connections.
+    """
+    if relationship is None or relationship.connection_type == "blocked":
+        return "", 0
+    if relationship.close_friend:
+        return "Close friend", relationship.mutual_connections
+    return (
+        RELATIONSHIP_BADGES.get(relationship.connection_type, ""),
+        relationship.mutual_connections,
+    )
 
 
 def get_mutual_connections(
@@ -264,8 +601,68 @@ def get_mutual_degree(cur, username: str, invalid: list, degree: str) -> list:
     return shared_users
 
 
+def get_shared_hobbies_and_interests(cur, username1: str, username2: str) -> tuple:
+    """
+    Checks whether two users have any hobbies or interests in common, using a
+    single query which intersects their hobbies and interests.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username1: The first user to compare.
+        username2: The second user to compare.
+
+    Returns:
+        Whether the users share a hobby, and whether they share an interest.
+    """
+    cur.execute(
+        "SELECT EXISTS (SELECT hobby FROM UserHobby WHERE username=? "
+        "INTERSECT SELECT hobby FROM UserHobby WHERE username=?), "
+        "EXISTS (SELECT interest FROM UserInterests WHERE username=? "
+        "INTERSECT SELECT interest FROM UserInterests WHERE username=?);",
+        (username1, username2, username1, username2),
+    )
+    shared_hobbies, shared_interests = cur.fetchone()
+    return bool(shared_hobbies), bool(shared_interests)
+
+
+def get_connection_degree_counts(cur, usernames: list) -> dict:
+    """
+    Counts the connections of each user, and how many of those connections
+    study a different degree to them, using a single grouped query.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        usernames: The users to count the connections of.
+
+    Returns:
+        A dictionary mapping each username to their number of connections and
+        their number of connections who study a different degree.
+    """
+    placeholders = ", ".join("?" * len(usernames))
+    cur.execute(
+        "SELECT edges.owner, COUNT(*), TOTAL(theirs.degree != mine.degree) "
+        "FROM (SELECT user1 AS owner, user2 AS other FROM Connection "
+        "WHERE user1 IN ({0}) AND connection_type='connected' UNION ALL "
+        "SELECT user2, user1 FROM Connection "
+        "WHERE user2 IN ({0}) AND connection_type='connected') AS edges "
+        "LEFT JOIN UserProfile AS mine ON mine.username = edges.owner "
+        "LEFT JOIN UserProfile AS theirs ON theirs.username = edges.other "
+        "GROUP BY edges.owner;".format(placeholders),
+        tuple(usernames) * 2,
+    )
+    counts = {username: (0, 0) for username in usernames}
+    for owner, connection_count, other_degree_count in cur.fetchall():
+        counts[owner] = (connection_count, int(other_degree_count))
+
+    return counts
+
+
 def calculate_similarity(
-    mutual_connections: dict, hobbies: dict, interests: dict, shared_degree: list
+    mutual_connections: dict,
+    hobbies: dict,
+    interests: dict,
+    shared_degree: list,
+    same_cluster: Set[str] = frozenset(),
 ) -> dict:
     """
     Calculates a list of users who have similarities with the chosen user.
@@ -278,6 +675,8 @@ def calculate_similarity(
         interests: The dictionary of interests of the user with users who have each
                    interest in common
         shared_degree: The list of users who shere the same degree as the chosen user
+        same_cluster: The users in the same community of connections as the
+                      chosen user, who are ranked higher
 
     Returns:
         A dictionary of users who share similarity with the chosen user
@@ -289,7 +688,7 @@ def calculate_similarity(
             super_close = False
 
             if user not in score_totals.keys():
-                score_totals[user] = [0, 0, 0, 0]
+                score_totals[user] = [0, 0, 0, 0, 0]
 
             if is_close_friend(session["username"], conec):
                 close = True
@@ -306,23 +705,28 @@ def calculate_similarity(
     for hobby in hobbies.keys():
         for user in hobbies[hobby]:
             if user not in score_totals.keys():
-                score_totals[user] = [0, 0, 0, 0]
+                score_totals[user] = [0, 0, 0, 0, 0]
 
             score_totals[user][1] += 5
 
     for interest in interests.keys():
         for user in interests[interest]:
             if user not in score_totals.keys():
-                score_totals[user] = [0, 0, 0, 0]
+                score_totals[user] = [0, 0, 0, 0, 0]
 
             score_totals[user][2] += 5
 
     for user in shared_degree:
         if user not in score_totals.keys():
-            score_totals[user] = [0, 0, 0, 0]
+            score_totals[user] = [0, 0, 0, 0, 0]
 
         score_totals[user][3] += 5
 
+    # Only adds to users who are already similar, as being in the same
+    # community isn't shown as a reason for the recommendation.
+    for user in score_totals.keys() & same_cluster:
+        score_totals[user][4] += CLUSTER_SCORE
+
     return score_totals
 
 
@@ -357,14 +761,28 @@ def get_recommended_connections(username: str) -> list:
         degree = helper_profile.get_degree(session["username"])
         shared_degree = get_mutual_degree(cur, session["username"], invalid, degree[0])
 
+        # Only the users who could be recommended are looked up, rather than
+        # everyone in the user's community.
+        same_cluster = helper_graph.get_cluster_members(
+            cur,
+            session["username"],
+            itertools.chain(
+                mutual_connections,
+                itertools.chain.from_iterable(hobbies.values()),
+                itertools.chain.from_iterable(interests.values()),
+                shared_degree,
+            ),
+        )
+
         score_totals = calculate_similarity(
-            mutual_connections, hobbies, interests, shared_degree
+            mutual_connections, hobbies, interests, shared_degree, same_cluster
         )
 
         recommendations = []
         for student in score_totals.keys():
             simlist = []
-            index = score_totals[student].index(max(score_totals[student]))
+            # Picks the reason shown from all but the community score.
+            index = score_totals[student].index(max(score_totals[student][:4]))
             if index == 0:
                 l1, l2 = [], []
                 count = len(mutual_connections[student])
@@ -435,3 +853,49 @@ def is_close_friend(username1: str, username2: str) -> bool:
             return True
 
     return False
+
+
+def get_profile_access(username: str, privacy: str) -> Tuple[Optional[str], str, str]:
+    """
+    Works out how much of a user's profile the logged in user can see, based
+    on the profile's privacy setting and the connection between them.
+
+    Args:
+        username: The user whose profile is being viewed.
+        privacy: The privacy setting of the profile.
+
+    Returns:
+        The tier of posts the viewer can see ("owner", "close_friend",
+        "connection" or "public"), the type of connection with the user, and
+        the reason the profile can't be viewed, with no tier if it can't.
+    """
+    viewer = session.get("username")
+    if not viewer:
+        return "public", "none", ""
+    if viewer == username:
+        return "owner", "", ""
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        relationship = get_relationships(conn.cursor(), viewer, [username])[username]
+
+    if relationship.close_friend:
+        conn_type = "close_friend"
+        if privacy == "private":
+            return None, conn_type, "This profile is private."
+    else:
+        conn_type = relationship.connection_type
+        if conn_type == "blocked":
+            return (
+                None,
+                conn_type,
+                "Unable to view this profile since " + username + " has blocked you.",
+            )
+        if privacy in ("close_friends", "private"):
+            return None, conn_type, "This profile is private"
+
+    if relationship.connection_type != "connected":
+        return "public", conn_type, ""
+    # Checks whether the profile owner has the viewer as a close friend.
+    if relationship.close_friend_of:
+        return "close_friend", conn_type, ""
+    return "connection", conn_type, ""
@@ -0,0 +1,46 @@
+"""
+Lets parts of the application react to changes made elsewhere, such as caches
+which need to forget a user's details after they edit their profile, without
+the code making the change needing to know about each of them.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable
+
+# The event published after a user's profile has been edited, with a
+# ProfileChange describing what changed.
+PROFILE_CHANGED = "profile_changed"
+# The event published after two users have become connected or stopped being
+# connected, with the pair of usernames.
+CONNECTION_CHANGED = "connection_changed"
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event: str, handler: Callable):
+    """
+    Calls a function every time an event is published.
+
+    Args:
+        event: The name of the event.
+        handler: The function to call with the details of each event.
+    """
+    with _lock:
+        _subscribers[event].append(handler)
+
+
+def publish(event: str, details):
+    """
+    Calls every function subscribed to an event. This should only be called
+    once the change has been committed, so that subscribers see it.
+
+    Args:
+        event: The name of the event.
+        details: The details of the event, passed to each subscriber.
+    """
+    with _lock:
+        handlers = list(_subscribers[event])
+    for handler in handlers:
+        handler(details)
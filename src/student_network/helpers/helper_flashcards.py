@@ -1,18 +1,39 @@
 """
 Performs checks and actions to help flashcard sets work effectively.
 """
+
 import os
 import sqlite3
 from datetime import date
-from typing import Tuple
+from typing import List, Optional, Tuple
 
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
 from flask import request, session
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
+# The most cards that can be changed, added or removed in one save. The
+# versions of the changed and removed cards are checked in one query, which
+# SQLite limits to 999 placeholders.
+MAX_CARD_CHANGES = 500
+
+
+class CardConflictError(Exception):
+    """
+    Raised when cards being saved have been changed or deleted elsewhere since
+    the editor loaded them.
+    """
 
+    def __init__(self, conflicts: List[dict]):
+        """
+        Args:
+            conflicts: The current state of each conflicting card.
+        """
+        super().__init__("{} cards have changed".format(len(conflicts)))
+        self.conflicts = conflicts
 
-def get_set_details(cur, set_id: int) -> Tuple[str, date, str, dict, int]:
+
+def get_set_details(cur, set_id: int) -> Tuple[str, date, str, list, int]:
     """
     Gets the details for the flashcard set being used.
     Args:
@@ -20,30 +41,51 @@ def get_set_details(cur, set_id: int) -> Tuple[str, date, str, dict, int]:
         set_id: The ID of the flashcard set being used.
 
     Returns:
-        Questions with answers, author, and name of the set.
+        Name, date created, author, cards and plays of the set.
     """
-    cur.execute("SELECT * FROM QuestionSets WHERE set_id=?;", (set_id,))
-    set_details = cur.fetchone()
+    cur.execute(
+        "SELECT set_name, date_created, author, cards_played FROM QuestionSets "
+        "WHERE set_id=?;",
+        (set_id,),
+    )
+    set_name, date_created, author, plays = cur.fetchone()
 
-    if set_details[4]:
-        questions = set_details[4].split("|")
-    else:
-        questions = ""
-    if set_details[5]:
-        answers = set_details[5].split("|")
-    else:
-        answers = ""
-    questions_and_answers = {}
-    for c, question in enumerate(questions):
-        questions_and_answers[question] = answers[c]
-
-    return (
-        set_details[1],
-        set_details[2],
-        set_details[3],
-        questions_and_answers,
-        set_details[6],
+    return set_name, date_created, author, get_cards(cur, set_id), plays
+
+
+def get_cards(cur, set_id: int) -> List[Tuple[int, str, str, int]]:
+    """
+    Gets the cards in a flashcard set, in the order they were added.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the flashcard set.
+
+    Returns:
+        The ID, question, answer and version of each card.
+    """
+    cur.execute(
+        "SELECT card_id, question, answer, version FROM Flashcard WHERE set_id=? "
+        "ORDER BY position;",
+        (set_id,),
     )
+    return cur.fetchall()
+
+
+def get_set_author(cur, set_id: int) -> Optional[str]:
+    """
+    Gets the author of a flashcard set.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the flashcard set.
+
+    Returns:
+        The username of the author, or None if the set doesn't exist.
+    """
+    cur.execute("SELECT author FROM QuestionSets WHERE set_id=?;", (set_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
 
 
 def delete_set(set_id):
@@ -55,100 +97,148 @@ def delete_set(set_id):
     """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("SELECT author FROM QuestionSets WHERE set_id=?;", (set_id,))
-        author = cur.fetchone()[0]
-        if author == session["username"]:
+        if get_set_author(cur, set_id) == session["username"]:
+            cur.execute("DELETE FROM Flashcard WHERE set_id=?;", (set_id,))
             cur.execute("DELETE FROM QuestionSets WHERE set_id=?;", (set_id,))
             conn.commit()
+            helper_profile_snapshot.invalidate_profile_snapshot(session["username"])
         else:
             session["error"] = ["You cannot delete another user's flashcard set"]
 
 
-def delete_question(set_id, index):
+def insert_card(cur, set_id: int, question: str, answer: str) -> int:
     """
-    Delete specific set
+    Adds a card to the end of a set and updates its number of cards.
 
     Args:
-        set_id: ID of the set to delete from
-        index: the index of the question to delete
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the set to add to.
+        question: The question on the card.
+        answer: The answer on the card.
+
+    Returns:
+        The ID of the new card.
     """
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT author FROM QuestionSets WHERE set_id=?;", (set_id,))
-        author = cur.fetchone()[0]
-        if author == session["username"]:
-            cur.execute(
-                "SELECT questions, answers FROM QuestionSets WHERE set_id=?;", (set_id,)
-            )
-            set_details = cur.fetchone()
-            if not all(set_details[0]):
-                session["error"] = ["Question does not exist"]
+    # Positions only need to keep the cards in order, so deleting a card
+    # leaves a gap instead of renumbering the cards after it.
+    cur.execute(
+        "INSERT INTO Flashcard (set_id, position, question, answer) "
+        "SELECT ?, IFNULL(MAX(position), -1) + 1, ?, ? FROM Flashcard "
+        "WHERE set_id=?;",
+        (set_id, question, answer, set_id),
+    )
+    card_id = cur.lastrowid
+    cur.execute(
+        "UPDATE QuestionSets SET card_count = card_count + 1 WHERE set_id=?;",
+        (set_id,),
+    )
+    return card_id
 
-            questions = set_details[0].split("|")
-            answers = set_details[1].split("|")
 
-            if len(questions) > index:
-                questions.pop(index)
-                questions = "|".join(questions)
+def update_card(cur, set_id: int, card_id: int, question: str, answer: str) -> bool:
+    """
+    Changes the question and answer on a card.
 
-                answers.pop(index)
-                answers = "|".join(answers)
-            else:
-                session["error"] = ["Question does not exist"]
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the set the card is in.
+        card_id: The ID of the card to change.
+        question: The new question.
+        answer: The new answer.
 
-            cur.execute(
-                "UPDATE QuestionSets SET questions=?, answers=? WHERE set_id=?;",
-                (questions, answers, set_id),
-            )
-            conn.commit()
+    Returns:
+        Whether the card exists in the set.
+    """
+    cur.execute(
+        "UPDATE Flashcard SET question=?, answer=?, version = version + 1 "
+        "WHERE card_id=? AND set_id=?;",
+        (validate_inputs(question), validate_inputs(answer), card_id, set_id),
+    )
+    return cur.rowcount > 0
+
+
+def remove_card(cur, set_id: int, card_id: int) -> bool:
+    """
+    Deletes a card from a set and updates its number of cards.
 
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the set the card is in.
+        card_id: The ID of the card to delete.
+
+    Returns:
+        Whether the card existed in the set.
+    """
+    cur.execute(
+        "DELETE FROM Flashcard WHERE card_id=? AND set_id=?;", (card_id, set_id)
+    )
+    if cur.rowcount == 0:
+        return False
+    cur.execute(
+        "UPDATE QuestionSets SET card_count = card_count - 1 WHERE set_id=?;",
+        (set_id,),
+    )
+    return True
+
+
+def delete_question(set_id, card_id):
+    """
+    Delete specific card from a set
+
+    Args:
+        set_id: ID of the set to delete from
+        card_id: ID of the card to delete
+    """
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        if get_set_author(cur, set_id) == session["username"]:
+            if remove_card(cur, set_id, card_id):
+                conn.commit()
+            else:
+                session["error"] = ["Question does not exist"]
         else:
             session["error"] = ["You cannot delete another user's flashcard set"]
 
 
 def save_set(set_id):
     """
-    Save changes to question set
+    Save changes to question set, only writing the cards which have changed
 
     Args:
         set_id: ID of the set to save
     """
-    # Gets set details.
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        count = get_question_count(cur, set_id)
-
-    questions, answers = "", ""
-    for i in range(count):
-        new_q = str(request.form.get("question_" + str(i)))
-        if new_q:
-            new_q = validate_inputs(new_q)
-            questions += new_q + "|"
-        else:
-            questions += "|"
-        new_a = str(request.form.get("answer_" + str(i)))
-        if new_a:
-            new_a = validate_inputs(new_a)
-            answers += new_a + "|"
-        else:
-            answers += "|"
-    if questions:
-        if questions[-1] == "|":
-            questions = questions[:-1]
-    if answers:
-        if answers[-1] == "|":
-            answers = answers[:-1]
-
-    if request.form.get("set_name"):
-        name = request.form.get("set_name")
-    else:
-        name = "Unnamed"
+        if get_set_author(cur, set_id) != session["username"]:
+            session["error"] = ["You cannot edit another user's flashcard set"]
+            return
+
+        changed_cards = []
+        for card_id, question, answer, _ in get_cards(cur, set_id):
+            # Cards added since the page was loaded aren't in the form.
+            new_q = request.form.get("question_" + str(card_id))
+            new_a = request.form.get("answer_" + str(card_id))
+            if new_q is None or new_a is None:
+                continue
+            new_q, new_a = validate_inputs(new_q), validate_inputs(new_a)
+            if (new_q, new_a) != (question, answer):
+                changed_cards.append((new_q, new_a, card_id))
+        cur.executemany(
+            "UPDATE Flashcard SET question=?, answer=?, version = version + 1 "
+            "WHERE card_id=?;",
+            changed_cards,
+        )
 
-    cur.execute(
-        "UPDATE QuestionSets SET set_name=?, questions=?, answers=? WHERE set_id=?;",
-        (name, questions, answers, set_id),
-    )
-    conn.commit()
+        if request.form.get("set_name"):
+            name = request.form.get("set_name")
+        else:
+            name = "Unnamed"
+        cur.execute(
+            "UPDATE QuestionSets SET set_name=? WHERE set_id=?;", (name, set_id)
+        )
+        conn.commit()
+    # The set's name is shown on its author's profile.
+    helper_profile_snapshot.invalidate_profile_snapshot(session["username"])
 
 
 def generate_set() -> int:
@@ -166,57 +256,192 @@ def generate_set() -> int:
         )
         cur.execute("SELECT MAX(set_id) FROM QuestionSets;")
         new_id = cur.fetchone()[0]
+    helper_profile_snapshot.invalidate_profile_snapshot(session["username"])
 
     return new_id
 
 
-def add_card(set_id):
+def parse_card_changes(data) -> dict:
     """
-    Add card to specific set
+    Checks the changes sent by the flashcard editor.
 
     Args:
-        set_id: ID of the set to add to
+        data: The JSON body of the request, containing the cards which have
+            been changed, added and removed, and optionally a new set name.
+
+    Returns:
+        The changes, with any missing lists filled in.
+
+    Raises:
+        ValueError: If the changes are malformed.
     """
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
+    if not isinstance(data, dict):
+        raise ValueError("Changes must be a JSON object")
+    changes = {
+        "set_name": data.get("set_name"),
+        "changed": data.get("changed") or [],
+        "added": data.get("added") or [],
+        "removed": data.get("removed") or [],
+    }
+    if changes["set_name"] is not None and not isinstance(changes["set_name"], str):
+        raise ValueError("Set name must be a string")
+    if not all(
+        isinstance(changes[key], list) for key in ("changed", "added", "removed")
+    ):
+        raise ValueError("Changed, added and removed cards must be lists")
+    if sum(len(changes[key]) for key in ("changed", "added", "removed")) > (
+        MAX_CARD_CHANGES
+    ):
+        raise ValueError("Too many cards changed at once")
+
+    for card in changes["changed"] + changes["removed"]:
+        if not isinstance(card, dict) or not all(
+            type(card.get(key)) is int for key in ("id", "version")
+        ):
+            raise ValueError("Changed and removed cards must have an ID and version")
+    for card in changes["changed"] + changes["added"]:
+        if not isinstance(card, dict) or not all(
+            isinstance(card.get(key), str) for key in ("question", "answer")
+        ):
+            raise ValueError("Cards must have a question and answer")
+    card_ids = [card["id"] for card in changes["changed"] + changes["removed"]]
+    if len(card_ids) != len(set(card_ids)):
+        raise ValueError("Each card can only be changed or removed once")
+
+    return changes
+
+
+def get_conflicts(cur, set_id: int, cards: List[dict]) -> List[dict]:
+    """
+    Finds the cards whose version differs from the one the editor loaded.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the set the cards are in.
+        cards: The ID and version of each card the editor is changing.
+
+    Returns:
+        The current state of each conflicting card, or just its ID and that
+        it was deleted.
+    """
+    if not cards:
+        return []
+    cur.execute(
+        "SELECT card_id, question, answer, version FROM Flashcard "
+        "WHERE set_id=? AND card_id IN ({});".format(", ".join("?" * len(cards))),
+        [set_id] + [card["id"] for card in cards],
+    )
+    current = {row[0]: row for row in cur.fetchall()}
+
+    conflicts = []
+    for card in cards:
+        if card["id"] not in current:
+            conflicts.append({"id": card["id"], "deleted": True})
+        elif current[card["id"]][3] != card["version"]:
+            card_id, question, answer, version = current[card["id"]]
+            conflicts.append(
+                {
+                    "id": card_id,
+                    "question": question,
+                    "answer": answer,
+                    "version": version,
+                }
+            )
+    return conflicts
+
+
+def apply_card_changes(cur, set_id: int, changes: dict) -> dict:
+    """
+    Applies the changes from the flashcard editor, if none of the cards being
+    changed or removed have been changed since it loaded them. The work done
+    depends on the number of cards changed, not the size of the set. Must be
+    run in a transaction which is rolled back if this raises.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        set_id: The ID of the set being edited.
+        changes: The changes returned by parse_card_changes.
+
+    Returns:
+        The new versions of the changed cards, the IDs and versions of the
+        added cards in the order they were sent, and the number of cards.
+
+    Raises:
+        CardConflictError: If any cards have been changed elsewhere.
+    """
+    changed, added, removed = changes["changed"], changes["added"], changes["removed"]
+    conflicts = get_conflicts(cur, set_id, changed + removed)
+    if conflicts:
+        raise CardConflictError(conflicts)
+
+    if changes["set_name"] is not None:
         cur.execute(
-            "SELECT questions, answers, author FROM QuestionSets WHERE set_id=?;",
-            (set_id,),
+            "UPDATE QuestionSets SET set_name=? WHERE set_id=?;",
+            (changes["set_name"] or "Unnamed", set_id),
         )
-        row = cur.fetchone()
-
-        author = row[2]
-        if author == session["username"]:
-            if row[0] != "None" and row[1] != "None":
-                question_list = row[0].split("|")
-                answer_list = row[1].split("|")
-                count = len(question_list) + 1
-                if not "question " + str(count) in question_list:
-                    questions = row[0] + "|question " + str(count)
-                else:
-                    q = "question " + str(count)
-                    while q in question_list:
-                        q = q + " 2"
-                    questions = row[0] + "|" + q
-
-                if not "answer " + str(count) in answer_list:
-                    answers = row[1] + "|answer " + str(count)
-                else:
-                    a = "answer " + str(count)
-                    while a in answer_list:
-                        a = a + " 2"
-                    answers = row[1] + "|" + a
-
-            else:
-                questions = "question1"
-                answers = "answer1"
+    cur.executemany(
+        "UPDATE Flashcard SET question=?, answer=?, version = version + 1 "
+        "WHERE card_id=?;",
+        [
+            (
+                validate_inputs(card["question"]),
+                validate_inputs(card["answer"]),
+                card["id"],
+            )
+            for card in changed
+        ],
+    )
+    cur.executemany(
+        "DELETE FROM Flashcard WHERE card_id=?;", [(card["id"],) for card in removed]
+    )
 
+    added_cards = []
+    if added:
+        cur.execute(
+            "SELECT IFNULL(MAX(position), -1) FROM Flashcard WHERE set_id=?;",
+            (set_id,),
+        )
+        last_position = cur.fetchone()[0]
+        for position, card in enumerate(added, start=last_position + 1):
             cur.execute(
-                "UPDATE QuestionSets SET questions=?, answers=? WHERE set_id=?;",
-                (questions, answers, set_id),
+                "INSERT INTO Flashcard (set_id, position, question, answer) "
+                "VALUES (?, ?, ?, ?);",
+                (
+                    set_id,
+                    position,
+                    validate_inputs(card["question"]),
+                    validate_inputs(card["answer"]),
+                ),
             )
-            conn.commit()
+            added_cards.append({"id": cur.lastrowid, "version": 0})
 
+    cur.execute(
+        "UPDATE QuestionSets SET card_count = card_count + ? WHERE set_id=?;",
+        (len(added) - len(removed), set_id),
+    )
+
+    return {
+        "changed": [
+            {"id": card["id"], "version": card["version"] + 1} for card in changed
+        ],
+        "added": added_cards,
+        "card_count": get_question_count(cur, set_id),
+    }
+
+
+def add_card(set_id):
+    """
+    Add card to specific set
+
+    Args:
+        set_id: ID of the set to add to
+    """
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        if get_set_author(cur, set_id) == session["username"]:
+            count = get_question_count(cur, set_id) + 1
+            insert_card(cur, set_id, "question " + str(count), "answer " + str(count))
+            conn.commit()
         else:
             session["error"] = ["You cannot add cards to another user's flashcard set"]
 
@@ -242,18 +467,17 @@ def get_question_count(cur, set_id) -> int:
     Args:
         set_id: ID of the set to count
     """
-    cur.execute("SELECT questions FROM QuestionSets WHERE set_id=?;", (set_id,))
+    cur.execute("SELECT card_count FROM QuestionSets WHERE set_id=?;", (set_id,))
     set_details = cur.fetchone()
-    if set_details[0] is None:
+    if set_details is None:
         return 0
 
-    return len(set_details[0].split("|"))
+    return set_details[0]
 
 
 def validate_inputs(text: str) -> str:
     """
-    Cut the flashcard to max size of 600 characters and remove '|'
-    characters since they split questions in the database
+    Cut the flashcard to max size of 600 characters
 
     Args:
         text: input string
@@ -261,32 +485,4 @@ def validate_inputs(text: str) -> str:
     Returns:
         Reformatted string
     """
-    text = text[:600]
-    return text.replace("|", "")
-
-
-def get_user_cards(username: str) -> list:
-    """
-    Get the flashcard sets of a given user
-
-    Args:
-        username: username to get sets from
-
-    Returns:
-        list of sets belonging to the user
-    """
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT set_id, date_created, author, set_name, cards_played "
-            "FROM QuestionSets WHERE author=?;",
-            (username,),
-        )
-        row = cur.fetchall()
-        set_posts = sorted(row, key=lambda x: x[4], reverse=True)
-        set_posts = [list(x) for x in set_posts]
-
-        for i, card_set in enumerate(set_posts):
-            set_posts[i].append(get_question_count(cur, card_set[0]))
-
-    return set_posts
+    return text[:600]
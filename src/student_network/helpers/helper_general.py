@@ -7,7 +7,8 @@ from datetime import datetime
 from math import floor
 from typing import Tuple
 
-import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_images as helper_images
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import session
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -81,6 +82,9 @@ def get_all_usernames() -> list:
 
 
 def get_notifications():
+    if "username" not in session:
+        return []
+
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
 
@@ -184,8 +188,17 @@ def get_rooms():
         chat rooms of user
     """
     chat_rooms = get_all_connections(session["username"])
+    cards = helper_user_cards.get_user_cards([x[0] for x in chat_rooms])
     chat_rooms = list(
-        map(lambda x: (x[0], helper_profile.get_profile_picture(x[0])), chat_rooms)
+        map(
+            lambda x: (
+                x[0],
+                helper_images.get_variant_url(
+                    helper_user_cards.get_avatar(cards, x[0])
+                ),
+            ),
+            chat_rooms,
+        )
     )
 
     chat_rooms = [list(x) for x in chat_rooms]
@@ -206,7 +219,8 @@ def get_rooms():
 
 def one_exp(cur, username: str):
     """
-    Awards 1 exp point
+    Awards 1 exp point. The user's card must be invalidated once this has
+    been committed, as their level is shown on it.
 
     Args:
         username: user to award exp to
@@ -0,0 +1,497 @@
+"""
+Finds how users are connected to each other through their connections, such
+as to show "connected through X and Y" on a profile. The connections are held
+in memory as a compact adjacency index, which is searched from both ends at
+once so that only a small part of the network needs to be visited. The index
+is also used to find communities of users across the whole network.
+"""
+
+import itertools
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import student_network.helpers.helper_events as helper_events
+import student_network.helpers.helper_reference as helper_reference
+
+# The most connections a path can go through, counting the first and last.
+MAX_HOPS = 3
+# The most users a single search can visit before giving up, which bounds the
+# memory each search can use on a large network.
+MAX_VISITED = 200000
+# The least number of seconds between rebuilding the index after connections
+# change, so a burst of changes only rebuilds it once. Paths can be this out
+# of date, but blocks are always checked against the database.
+MIN_REBUILD_INTERVAL = 30
+# The most rounds of label propagation to run before stopping, in case the
+# communities never settle.
+MAX_LABEL_ROUNDS = 20
+# Label propagation stops once fewer than this share of users change community
+# in a round, as the last few users can swap between communities for a while.
+MIN_CHANGED_SHARE = 0.001
+# The number of communities, and of members of each, shown to staff.
+CLUSTERS_SHOWN = 10
+MEMBERS_SHOWN = 5
+# The number of users checked in each query for whether they are in a user's
+# community, which keeps the query within SQLite's limit of 999 placeholders.
+CLUSTER_BATCH_SIZE = 400
+
+
+class ConnectionGraph:
+    """
+    The connections between users as a compressed sparse row index. The
+    connections of the user numbered i are neighbours[offsets[i]:offsets[i + 1]],
+    as the numbers of the other users.
+    """
+
+    def __init__(self, usernames: List[str], offsets: array, neighbours: array):
+        self.usernames = usernames
+        self.indexes = {username: i for i, username in enumerate(usernames)}
+        self.offsets = offsets
+        self.neighbours = neighbours
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[str, str]]) -> "ConnectionGraph":
+        """
+        Builds the index from pairs of connected users.
+
+        Args:
+            edges: Each pair of connected users, in either order.
+
+        Returns:
+            The index of the connections.
+        """
+        indexes = {}
+        sources, targets = array("i"), array("i")
+        for username1, username2 in edges:
+            sources.append(indexes.setdefault(username1, len(indexes)))
+            targets.append(indexes.setdefault(username2, len(indexes)))
+
+        # Counts the connections of each user, then places each connection
+        # after those of the users numbered before them.
+        offsets = array("i", bytes(4 * (len(indexes) + 1)))
+        for source, target in zip(sources, targets):
+            offsets[source + 1] += 1
+            offsets[target + 1] += 1
+        for i in range(len(indexes)):
+            offsets[i + 1] += offsets[i]
+        neighbours = array("i", bytes(4 * offsets[-1]))
+        positions = offsets[:-1]
+        for source, target in zip(sources, targets):
+            neighbours[positions[source]] = target
+            positions[source] += 1
+            neighbours[positions[target]] = source
+            positions[target] += 1
+
+        return cls(list(indexes), offsets, neighbours)
+
+    def get_neighbours(self, index: int) -> array:
+        """
+        Gets the connections of a user.
+
+        Args:
+            index: The number of the user.
+
+        Returns:
+            The numbers of the user's connections.
+        """
+        return self.neighbours[self.offsets[index] : self.offsets[index + 1]]
+
+    def shortest_path(
+        self,
+        source: str,
+        target: str,
+        max_hops: int = MAX_HOPS,
+        excluded: Iterable[str] = (),
+        max_visited: int = MAX_VISITED,
+    ) -> Optional[List[str]]:
+        """
+        Finds one of the shortest paths between two users by searching
+        outwards from both of them, a level at a time from whichever side has
+        fewer users to expand.
+
+        Args:
+            source: The user to start from.
+            target: The user to find.
+            max_hops: The most connections the path can go through.
+            excluded: Users who the path can't go through.
+            max_visited: The most users which can be visited before giving up.
+
+        Returns:
+            The users along the path, including the source and target, or
+            None if there isn't a short enough path.
+        """
+        if source == target:
+            return [source]
+        if source not in self.indexes or target not in self.indexes:
+            return None
+        excluded = {self.indexes[x] for x in excluded if x in self.indexes}
+
+        # Maps each user reached from each side to the user it was reached
+        # from, so the path can be followed back to each end.
+        source_index, target_index = self.indexes[source], self.indexes[target]
+        parents = ({source_index: -1}, {target_index: -1})
+        frontiers = ([source_index], [target_index])
+        depths = [0, 0]
+        while frontiers[0] and frontiers[1] and depths[0] + depths[1] < max_hops:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            visited, other_visited = parents[side], parents[1 - side]
+            next_frontier = []
+            meeting = None
+            for index in frontiers[side]:
+                for neighbour in self.get_neighbours(index):
+                    if neighbour in visited or neighbour in excluded:
+                        continue
+                    visited[neighbour] = index
+                    if neighbour in other_visited:
+                        # Prefers meeting users found earlier by the other
+                        # side, as they make for a shorter path.
+                        if meeting is None or _get_depth(
+                            other_visited, neighbour
+                        ) < _get_depth(other_visited, meeting):
+                            meeting = neighbour
+                    next_frontier.append(neighbour)
+                if len(parents[0]) + len(parents[1]) > max_visited:
+                    return None
+            if meeting is not None:
+                return self._join_path(parents, meeting)
+
+            frontiers = (
+                (next_frontier, frontiers[1])
+                if side == 0
+                else (frontiers[0], next_frontier)
+            )
+            depths[side] += 1
+
+        return None
+
+    def _join_path(self, parents: tuple, meeting: int) -> List[str]:
+        """
+        Follows the users each side was reached from back to both ends.
+        """
+        path = []
+        index = meeting
+        while index != -1:
+            path.append(index)
+            index = parents[0][index]
+        path.reverse()
+        index = parents[1][meeting]
+        while index != -1:
+            path.append(index)
+            index = parents[1][index]
+
+        return [self.usernames[index] for index in path]
+
+
+def _get_depth(parents: Dict[int, int], index: int) -> int:
+    """
+    Counts the connections between a user and the end their side started from.
+    """
+    depth = 0
+    while parents[index] != -1:
+        index = parents[index]
+        depth += 1
+    return depth
+
+
+_graph = None
+_built_at = 0.0
+_stale = False
+_lock = threading.Lock()
+
+
+def load_graph(cur) -> ConnectionGraph:
+    """
+    Reads the connections from the database and builds an index of them.
+
+    Args:
+        cur: Cursor for the SQLite database.
+
+    Returns:
+        The index of the connections.
+    """
+    cur.execute(
+        "SELECT user1, user2 FROM Connection WHERE connection_type='connected';"
+    )
+    return ConnectionGraph.from_edges(cur)
+
+
+def get_graph() -> ConnectionGraph:
+    """
+    Gets the index of the connections, building it if it hasn't been built
+    yet, or rebuilding it if connections have changed since it was built.
+
+    Returns:
+        The index of the connections.
+    """
+    global _graph, _built_at, _stale
+    graph = _graph
+    if graph is not None and not (
+        _stale and time.monotonic() - _built_at >= MIN_REBUILD_INTERVAL
+    ):
+        return graph
+
+    with _lock:
+        # Another thread may have rebuilt it while this one was waiting.
+        if _graph is graph:
+            _stale = False
+            with sqlite3.connect("db.sqlite3") as conn:
+                _graph = load_graph(conn.cursor())
+            _built_at = time.monotonic()
+        return _graph
+
+
+def invalidate_graph(_=None):
+    """
+    Marks the index of the connections as out of date, so that it's rebuilt
+    the next time it's used once MIN_REBUILD_INTERVAL has passed.
+    """
+    global _stale
+    _stale = True
+
+
+def get_blocked_with(cur, username: str) -> List[str]:
+    """
+    Gets the users who have blocked, or been blocked by, a user.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user to get the blocks of.
+
+    Returns:
+        The usernames of the other users in each block.
+    """
+    cur.execute(
+        "SELECT user2 FROM Connection WHERE user1=? AND connection_type='block' "
+        "UNION ALL SELECT user1 FROM Connection "
+        "WHERE user2=? AND connection_type='block';",
+        (username, username),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def find_connection_path(viewer: str, username: str) -> Optional[List[str]]:
+    """
+    Finds how the viewer of a profile is connected to its user through their
+    connections, avoiding anyone who the viewer has blocked or been blocked by.
+
+    Args:
+        viewer: The user viewing the profile.
+        username: The user whose profile is being viewed.
+
+    Returns:
+        The users between the viewer and the user along one of the shortest
+        paths, which is empty if they're connected, or None if they aren't
+        within MAX_HOPS of each other.
+    """
+    with sqlite3.connect("db.sqlite3") as conn:
+        blocked = get_blocked_with(conn.cursor(), viewer)
+    if username in blocked:
+        return None
+
+    path = get_graph().shortest_path(viewer, username, excluded=blocked)
+    if path is None:
+        return None
+    return path[1:-1]
+
+
+class ClusterSummary(NamedTuple):
+    """
+    The details of a community of users shown to staff.
+    """
+
+    cluster_id: int
+    size: int
+    degree: Optional[str]
+    degree_share: float
+    members: List[str]
+
+
+class ClusterReport(NamedTuple):
+    """
+    The communities found the last time utils/detect_communities.py was run.
+    """
+
+    computed_at: Optional[datetime]
+    cluster_count: int
+    clustered_users: int
+    largest: List[ClusterSummary]
+
+
+def propagate_labels(
+    graph: ConnectionGraph, max_rounds: int = MAX_LABEL_ROUNDS, seed: int = 0
+) -> Tuple[array, int]:
+    """
+    Finds communities of users who are more connected to each other than to
+    everyone else, using label propagation. Every user starts in their own
+    community, then joins whichever community most of their connections are
+    in, visiting users in a random order each round until almost no one moves.
+
+    Args:
+        graph: The index of the connections.
+        max_rounds: The most times every user can be visited.
+        seed: The seed for the order users are visited in, and for breaking
+            ties between communities.
+
+    Returns:
+        The community of each user, in the same order as graph.usernames and
+        numbered from 0 for the largest, and the number of rounds run.
+    """
+    rng = random.Random(seed)
+    offsets, neighbours = graph.offsets, graph.neighbours
+    labels = array("i", range(len(graph.usernames)))
+    order = list(range(len(graph.usernames)))
+    rounds = 0
+    while rounds < max_rounds:
+        rounds += 1
+        rng.shuffle(order)
+        changed = 0
+        for index in order:
+            counts = {}
+            for neighbour in neighbours[offsets[index] : offsets[index + 1]]:
+                label = labels[neighbour]
+                counts[label] = counts.get(label, 0) + 1
+            if not counts:
+                continue
+            best = max(counts.values())
+            # Stays in the same community if it's one of the most common.
+            if counts.get(labels[index]) == best:
+                continue
+            labels[index] = rng.choice(
+                [label for label, count in counts.items() if count == best]
+            )
+            changed += 1
+        if changed <= MIN_CHANGED_SHARE * len(order):
+            break
+
+    cluster_ids = {
+        label: cluster_id
+        for cluster_id, (label, _) in enumerate(Counter(labels).most_common())
+    }
+    return array("i", (cluster_ids[label] for label in labels)), rounds
+
+
+def save_clusters(cur, graph: ConnectionGraph, labels: array):
+    """
+    Replaces the stored community of every user. The caller must commit.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        graph: The index of the connections the communities were found in.
+        labels: The community of each user, from propagate_labels.
+    """
+    computed_at = time.time()
+    cur.execute("DELETE FROM UserCluster;")
+    cur.executemany(
+        "INSERT INTO UserCluster (username, cluster_id, computed_at) "
+        "VALUES (?, ?, ?);",
+        zip(graph.usernames, labels, itertools.repeat(computed_at)),
+    )
+
+
+def get_cluster_members(cur, username: str, candidates: Iterable[str]) -> Set[str]:
+    """
+    Gets which of some users are in the same community as a user, without
+    reading the rest of the community, which can be very large.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user to get the community of.
+        candidates: The users to check.
+
+    Returns:
+        The usernames of the candidates in the same community as the user,
+        which is empty if the user isn't in one.
+    """
+    candidates = list(dict.fromkeys(candidates))
+    members = set()
+    for start in range(0, len(candidates), CLUSTER_BATCH_SIZE):
+        batch = candidates[start : start + CLUSTER_BATCH_SIZE]
+        # The unary plus stops the community index being used, so that each
+        # candidate is looked up by username instead of scanning the
+        # community for them.
+        cur.execute(
+            "SELECT username FROM UserCluster WHERE username IN ({}) AND "
+            "+cluster_id = "
+            "(SELECT cluster_id FROM UserCluster WHERE username=?);".format(
+                ", ".join("?" * len(batch))
+            ),
+            batch + [username],
+        )
+        members.update(row[0] for row in cur.fetchall())
+
+    return members
+
+
+def get_cluster_report(cur, limit: int = CLUSTERS_SHOWN) -> ClusterReport:
+    """
+    Summarises the largest communities, including the degree which most of
+    their members study and a few of their members.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        limit: The number of communities to summarise.
+
+    Returns:
+        The summary of the communities.
+    """
+    cur.execute(
+        "SELECT MAX(computed_at), COUNT(DISTINCT cluster_id), COUNT(*) "
+        "FROM UserCluster;"
+    )
+    computed_at, cluster_count, clustered_users = cur.fetchone()
+    if computed_at is not None:
+        computed_at = datetime.fromtimestamp(computed_at)
+    cur.execute(
+        "SELECT cluster_id, COUNT(*) FROM UserCluster GROUP BY cluster_id "
+        "ORDER BY COUNT(*) DESC, cluster_id LIMIT ?;",
+        (limit,),
+    )
+    sizes = dict(cur.fetchall())
+    if not sizes:
+        return ClusterReport(computed_at, cluster_count, clustered_users, [])
+
+    placeholders = ", ".join("?" * len(sizes))
+    cur.execute(
+        "SELECT cluster_id, degree, COUNT(*) FROM UserCluster "
+        "LEFT JOIN UserProfile ON UserProfile.username = UserCluster.username "
+        "WHERE cluster_id IN ({}) GROUP BY cluster_id, degree "
+        "ORDER BY COUNT(*) DESC;".format(placeholders),
+        tuple(sizes),
+    )
+    degrees = {}
+    for cluster_id, degree_id, count in cur.fetchall():
+        degrees.setdefault(cluster_id, (degree_id, count))
+    cur.execute(
+        "SELECT cluster_id, username FROM (SELECT cluster_id, username, "
+        "ROW_NUMBER() OVER (PARTITION BY cluster_id ORDER BY username) AS position "
+        "FROM UserCluster WHERE cluster_id IN ({})) WHERE position <= ?;".format(
+            placeholders
+        ),
+        (*sizes, MEMBERS_SHOWN),
+    )
+    members = {}
+    for cluster_id, username in cur.fetchall():
+        members.setdefault(cluster_id, []).append(username)
+
+    largest = []
+    for cluster_id, size in sizes.items():
+        degree_id, degree_count = degrees[cluster_id]
+        largest.append(
+            ClusterSummary(
+                cluster_id,
+                size,
+                helper_reference.get_degree_name(degree_id),
+                degree_count / size,
+                members[cluster_id],
+            )
+        )
+    return ClusterReport(computed_at, cluster_count, clustered_users, largest)
+
+
+helper_events.subscribe(helper_events.CONNECTION_CHANGED, invalidate_graph)
@@ -0,0 +1,198 @@
+"""
+Hashes and checks passwords in a pool of worker processes, so that a burst of
+logins can't use up every request thread on bcrypt and stall other pages.
+"""
+
+import itertools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from typing import List, Union
+
+import bcrypt
+
+# The bcrypt cost factor for new hashes. Existing hashes with a different cost
+# are replaced the next time their user logs in.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# Leaves half of the CPU cores free for handling other requests.
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# The number of hashes which can be waiting or running at once, after which
+# requests are turned away until the queue has cleared.
+MAX_QUEUED_HASHES = MAX_WORKERS * 8
+# The number of seconds to wait for a hash before giving up.
+HASH_TIMEOUT = 10
+# The number of seconds clients are asked to wait before trying again.
+RETRY_AFTER = 5
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+
+
+class HashingBusyError(Exception):
+    """
+    Raised when too many passwords are already waiting to be hashed.
+    """
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Gets the pool of worker processes, starting it if it isn't running yet.
+
+    Returns:
+        The pool of worker processes.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+
+def _release(_):
+    """
+    Frees up a place in the queue once a hash has finished.
+    """
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _run(function, *args):
+    """
+    Runs a hashing function in a worker process and waits for its result.
+
+    Args:
+        function: The function to run.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        HashingBusyError: If the queue of hashes is full, or the hash took too
+            long to finish.
+    """
+    global _pending
+    with _lock:
+        if _pending >= MAX_QUEUED_HASHES:
+            raise HashingBusyError()
+        _pending += 1
+
+    try:
+        future = _get_executor().submit(function, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except TimeoutError:
+        raise HashingBusyError()
+
+
+def _hash_password(password: bytes, rounds: int) -> bytes:
+    """
+    Hashes a password with a new salt. This runs in a worker process.
+    """
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check_password(password: bytes, hashed_password: bytes) -> bool:
+    """
+    Checks a password against its hash. This runs in a worker process.
+    """
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    """
+    Encodes a password or hash as UTF-8 if it isn't already bytes.
+    """
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def hash_password(password: Union[str, bytes]) -> bytes:
+    """
+    Hashes a password using the configured bcrypt cost.
+
+    Args:
+        password: The password to hash.
+
+    Returns:
+        The salted hash of the password.
+
+    Raises:
+        HashingBusyError: If too many passwords are already being hashed.
+    """
+    return _run(_hash_password, _to_bytes(password), BCRYPT_ROUNDS)
+
+
+def check_password(
+    password: Union[str, bytes], hashed_password: Union[str, bytes]
+) -> bool:
+    """
+    Checks whether a password matches its stored hash.
+
+    Args:
+        password: The password input by the user.
+        hashed_password: The hash stored for the user.
+
+    Returns:
+        Whether the password is correct.
+
+    Raises:
+        HashingBusyError: If too many passwords are already being hashed.
+    """
+    return _run(_check_password, _to_bytes(password), _to_bytes(hashed_password))
+
+
+def hash_passwords(executor: ProcessPoolExecutor, passwords: List[str]) -> List[bytes]:
+    """
+    Hashes many passwords at once using the given pool of processes, such as
+    when creating accounts in bulk. Unlike hash_password, the number of hashes
+    isn't limited, so this shouldn't be used while handling requests.
+
+    Args:
+        executor: The pool of processes to hash the passwords in.
+        passwords: The passwords to hash.
+
+    Returns:
+        The salted hash of each password, in the same order.
+    """
+    return list(
+        executor.map(
+            _hash_password,
+            [_to_bytes(password) for password in passwords],
+            itertools.repeat(BCRYPT_ROUNDS),
+            chunksize=8,
+        )
+    )
+
+
+def get_rounds(hashed_password: Union[str, bytes]) -> int:
+    """
+    Gets the cost factor that a bcrypt hash was made with.
+
+    Args:
+        hashed_password: The hash, such as "$2b$12$...".
+
+    Returns:
+        The cost factor of the hash.
+    """
+    return int(_to_bytes(hashed_password).split(b"$")[2])
+
+
+def needs_rehash(hashed_password: Union[str, bytes]) -> bool:
+    """
+    Checks whether a hash was made with a different cost to the configured
+    one, so it should be replaced once the password is known.
+
+    Args:
+        hashed_password: The hash stored for the user.
+
+    Returns:
+        Whether the password should be hashed again.
+    """
+    return get_rounds(hashed_password) != BCRYPT_ROUNDS
@@ -0,0 +1,223 @@
+"""
+Keeps track of the images which have been uploaded, so that identical images
+are only processed and stored once, and images which are no longer used by any
+post or profile can be deleted.
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from typing import List, Optional
+
+import student_network.helpers.helper_images as helper_images
+
+# Unused images are kept for this many seconds after they were last uploaded,
+# so that images attached to a post which is still being written are kept.
+GARBAGE_GRACE_PERIOD = 24 * 60 * 60
+
+
+def hash_upload(data: bytes) -> str:
+    """
+    Hashes the contents of an uploaded file, so that a file which has been
+    uploaded before can be recognised without decoding it.
+
+    Args:
+        data: The contents of the uploaded file.
+
+    Returns:
+        The SHA-256 hash of the file as a hexadecimal string.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_upload(cur, kind: str, upload_hash: str) -> Optional[str]:
+    """
+    Finds the image that an identical file was saved as when it was uploaded
+    before.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        kind: The kind of image, either "post_imgs" or "avatars".
+        upload_hash: The hash of the uploaded file.
+
+    Returns:
+        The name of the image, or None if the file hasn't been saved before.
+    """
+    cur.execute(
+        "SELECT name FROM ImageUpload WHERE kind=? AND uploadHash=?;",
+        (kind, upload_hash),
+    )
+    row = cur.fetchone()
+    if row and helper_images.image_exists(kind, row[0]):
+        return row[0]
+    return None
+
+
+def record_upload(cur, kind: str, upload_hash: str, name: str):
+    """
+    Records that a file was uploaded and saved as the given image, which also
+    stops the image being deleted for a while if it's unused.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        kind: The kind of image, either "post_imgs" or "avatars".
+        upload_hash: The hash of the uploaded file.
+        name: The name the image was saved under.
+    """
+    cur.execute(
+        "INSERT INTO Image (kind, name, uploaded) VALUES (?, ?, ?) "
+        "ON CONFLICT (kind, name) DO UPDATE SET uploaded=excluded.uploaded;",
+        (kind, name, int(time.time())),
+    )
+    cur.execute(
+        "INSERT OR REPLACE INTO ImageUpload (kind, uploadHash, name) "
+        "VALUES (?, ?, ?);",
+        (kind, upload_hash, name),
+    )
+
+
+def store_avatar(file) -> str:
+    """
+    Saves a profile picture, skipping processing if the same file has been
+    uploaded before.
+
+    Args:
+        file: The file uploaded by the user.
+
+    Returns:
+        The name the profile picture was saved under.
+    """
+    data = file.read()
+    upload_hash = hash_upload(data)
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        name = find_upload(cur, "avatars", upload_hash)
+    if name is None:
+        name = helper_images.process_avatar(io.BytesIO(data))
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        record_upload(cur, "avatars", upload_hash, name)
+        conn.commit()
+
+    return name
+
+
+def add_references(cur, kind: str, names: List[str]):
+    """
+    Counts a new use of each of the given images, such as by a post.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        kind: The kind of image, either "post_imgs" or "avatars".
+        names: The names of the images, once for each use.
+    """
+    uploaded = int(time.time())
+    cur.executemany(
+        "INSERT INTO Image (kind, name, referenceCount, uploaded) "
+        "VALUES (?, ?, 1, ?) ON CONFLICT (kind, name) "
+        "DO UPDATE SET referenceCount=referenceCount + 1;",
+        [(kind, name, uploaded) for name in names],
+    )
+
+
+def remove_references(cur, kind: str, names: List[str]):
+    """
+    Stops counting a use of each of the given images, such as by a post which
+    has been deleted.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        kind: The kind of image, either "post_imgs" or "avatars".
+        names: The names of the images, once for each use.
+    """
+    cur.executemany(
+        "UPDATE Image SET referenceCount=MAX(referenceCount - 1, 0) "
+        "WHERE kind=? AND name=?;",
+        [(kind, name) for name in names],
+    )
+
+
+def get_image_name(file_name: str, sizes: dict) -> str:
+    """
+    Gets the name of the image that a file on disk belongs to.
+
+    Args:
+        file_name: The name of the file, such as "abc_thumb.jpg".
+        sizes: The sizes that the kind of image is saved in.
+
+    Returns:
+        The name of the image, such as "abc".
+    """
+    name = file_name.split(".", 1)[0]
+    for size in sizes:
+        suffix = "_" + size
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def collect_garbage(
+    conn, delete: bool = False, grace_period: float = GARBAGE_GRACE_PERIOD
+) -> list:
+    """
+    Finds images which aren't used by any post or profile, and files on disk
+    which don't belong to any tracked image, optionally deleting them.
+
+    Args:
+        conn: The connection to the database.
+        delete: Whether to delete the unused images, or only find them.
+        grace_period: The number of seconds after an image was last uploaded
+            before it can be deleted.
+
+    Returns:
+        The paths of the files which are unused.
+    """
+    cur = conn.cursor()
+    cutoff = time.time() - grace_period
+    unused = []
+
+    cur.execute(
+        "SELECT kind, name FROM Image WHERE referenceCount <= 0 AND uploaded < ?;",
+        (cutoff,),
+    )
+    for kind, name in cur.fetchall():
+        if delete:
+            # Only deletes the files if the image wasn't used in the meantime.
+            cur.execute(
+                "DELETE FROM Image WHERE kind=? AND name=? "
+                "AND referenceCount <= 0 AND uploaded < ?;",
+                (kind, name, cutoff),
+            )
+            if cur.rowcount == 0:
+                continue
+            cur.execute(
+                "DELETE FROM ImageUpload WHERE kind=? AND name=?;", (kind, name)
+            )
+            conn.commit()
+        for file_path in helper_images.get_image_files(kind, name):
+            if os.path.exists(file_path):
+                unused.append(file_path)
+                if delete:
+                    os.remove(file_path)
+
+    cur.execute("SELECT kind, name FROM Image;")
+    tracked = set(cur.fetchall())
+    for kind, (sizes, _, _) in helper_images.KINDS.items():
+        root = os.path.join(helper_images.IMAGES_DIR, kind)
+        for directory, _, file_names in os.walk(root, topdown=False):
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                name = get_image_name(file_name, sizes)
+                if (kind, name) in tracked or os.path.getmtime(file_path) >= cutoff:
+                    continue
+                unused.append(file_path)
+                if delete:
+                    os.remove(file_path)
+            # Removes directories which no longer hold any images.
+            if delete and directory != root and not os.listdir(directory):
+                os.rmdir(directory)
+
+    return unused
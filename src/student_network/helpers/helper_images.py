@@ -0,0 +1,409 @@
+"""
+Processes images uploaded by users into the sizes and formats which are served
+on the website, so that pages only download as much of an image as they show.
+"""
+
+import hashlib
+import os
+import re
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(os.path.dirname(BASE_DIR), "static", "images")
+# Uploaded images are served by the media blueprint, though images uploaded
+# before then may still be referred to by their old static URLs.
+IMAGES_URL = "/media"
+LEGACY_IMAGES_URL = "/static/images"
+
+# The sizes each kind of image is saved in, from largest to smallest. Post
+# images keep their aspect ratio, whereas avatars are cropped to a square.
+POST_IMAGE_SIZES = {"full": (1600, 1600), "feed": (800, 600), "thumb": (200, 200)}
+AVATAR_SIZES = {"full": (400, 400), "thumb": (96, 96)}
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# How each kind of image is saved: its sizes, whether it's cropped to fill
+# each size exactly, and whether it's also saved as WebP.
+KINDS = {
+    "post_imgs": (POST_IMAGE_SIZES, False, True),
+    "avatars": (AVATAR_SIZES, True, False),
+}
+# Images are named by the SHA-256 hash of their pixels, whereas images
+# uploaded before then were given random UUIDs.
+CONTENT_HASH_PATTERN = re.compile("[0-9a-f]{64}")
+
+
+def open_image(file, largest_size: tuple) -> Image.Image:
+    """
+    Opens an uploaded image, decoding it at a reduced scale where possible.
+
+    Args:
+        file: The file uploaded by the user.
+        largest_size: The largest size which will be saved from the image.
+
+    Returns:
+        The decoded image in RGB mode, rotated according to its EXIF data.
+    """
+    img = Image.open(file)
+    # Lets the JPEG decoder skip detail which would be lost when resizing.
+    img.draft("RGB", largest_size)
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        # Flattens transparent images onto white rather than black.
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    return img
+
+
+def get_variant_name(name: str, size: str) -> str:
+    """
+    Gets the file name, without an extension, for a size of an image.
+
+    Args:
+        name: The name of the image.
+        size: The name of the size, such as "thumb" or "full".
+
+    Returns:
+        The file name for that size of the image.
+    """
+    if size == "full":
+        return name
+    return "{}_{}".format(name, size)
+
+
+def save_variants(img, directory: str, name: str, sizes: dict, crop: bool, webp: bool):
+    """
+    Saves each size of an image as a progressive JPEG, and optionally WebP.
+
+    Args:
+        img: The decoded image.
+        directory: The directory to save the image in.
+        name: The name to save the image under.
+        sizes: The sizes to save the image in, from largest to smallest.
+        crop: Whether to crop the image to fill each size exactly.
+        webp: Whether to also save each size as a WebP image.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for size, dimensions in sizes.items():
+        # Each size is made from the previous one, which is cheaper than
+        # resizing from the original every time.
+        img = resize_image(img, dimensions, crop)
+
+        file_path = os.path.join(directory, get_variant_name(name, size))
+        # Files are written under a temporary name and then renamed, so that
+        # an image which is being saved is never served half-written.
+        img.save(
+            file_path + ".jpg.tmp",
+            "JPEG",
+            quality=JPEG_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        os.replace(file_path + ".jpg.tmp", file_path + ".jpg")
+        if webp:
+            img.save(file_path + ".webp.tmp", "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(file_path + ".webp.tmp", file_path + ".webp")
+
+
+def resize_image(img, dimensions: tuple, crop: bool) -> Image.Image:
+    """
+    Resizes an image to fit within, or to exactly fill, the given dimensions.
+
+    Args:
+        img: The decoded image.
+        dimensions: The width and height to resize the image to.
+        crop: Whether to crop the image to fill the dimensions exactly.
+
+    Returns:
+        The resized image.
+    """
+    if crop:
+        return ImageOps.fit(img, dimensions, Image.LANCZOS)
+    img = img.copy()
+    img.thumbnail(dimensions, Image.LANCZOS)
+    return img
+
+
+def hash_image(img) -> str:
+    """
+    Hashes the pixels of a decoded image, so that identical images are given
+    the same name however they were encoded.
+
+    Args:
+        img: The decoded image.
+
+    Returns:
+        The SHA-256 hash of the image as a hexadecimal string.
+    """
+    digest = hashlib.sha256("{}:{}x{}:".format(img.mode, *img.size).encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def is_content_hash(name: str) -> bool:
+    """
+    Checks whether an image is named by the hash of its contents.
+
+    Args:
+        name: The name of the image.
+
+    Returns:
+        Whether the image is named by its hash, rather than a random UUID.
+    """
+    return CONTENT_HASH_PATTERN.fullmatch(name) is not None
+
+
+def get_image_subdirectory(name: str) -> str:
+    """
+    Gets the subdirectory an image is saved in. Images named by their hash are
+    split across two levels of directories by the start of their hash, so that
+    no single directory holds too many files.
+
+    Args:
+        name: The name of the image.
+
+    Returns:
+        The subdirectory, relative to the directory for the kind of image.
+    """
+    if is_content_hash(name):
+        return "{}/{}".format(name[:2], name[2:4])
+    return ""
+
+
+def get_image_directory(kind: str, name: str) -> str:
+    """
+    Gets the directory an image is saved in.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name of the image.
+
+    Returns:
+        The path of the directory on disk.
+    """
+    return os.path.join(IMAGES_DIR, kind, get_image_subdirectory(name))
+
+
+def get_image_files(kind: str, name: str) -> list:
+    """
+    Gets the path of every file saved for an image, in the order they're saved.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name of the image.
+
+    Returns:
+        The paths of each size and format of the image.
+    """
+    sizes, _, webp = KINDS[kind]
+    extensions = ("jpg", "webp") if webp else ("jpg",)
+    directory = get_image_directory(kind, name)
+    return [
+        os.path.join(directory, get_variant_name(name, size) + "." + extension)
+        for size in sizes
+        for extension in extensions
+    ]
+
+
+def image_exists(kind: str, name: str) -> bool:
+    """
+    Checks whether every size of an image has been saved.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name of the image.
+
+    Returns:
+        Whether the image has been saved.
+    """
+    # The smallest size is saved last, so the image is complete if it exists.
+    return os.path.exists(get_image_files(kind, name)[-1])
+
+
+def has_smaller_sizes(kind: str, name: str) -> bool:
+    """
+    Checks whether the smaller sizes and formats of an image have been saved.
+    Images uploaded before the image pipeline only have their original until
+    utils/generate_image_derivatives.py has been run.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name of the image.
+
+    Returns:
+        Whether the smaller sizes can be served.
+    """
+    # Images named by their hash are always saved in every size at once.
+    return is_content_hash(name) or image_exists(kind, name)
+
+
+def store_image(file, kind: str) -> str:
+    """
+    Saves an uploaded image in each size it's served in, under the hash of
+    the image once it has been scaled to its largest size. Images which have
+    already been saved aren't saved again.
+
+    Args:
+        file: The file uploaded by the user.
+        kind: The kind of image, either "post_imgs" or "avatars".
+
+    Returns:
+        The name the image was saved under.
+    """
+    sizes, crop, webp = KINDS[kind]
+    largest_size = next(iter(sizes.values()))
+    img = resize_image(open_image(file, largest_size), largest_size, crop)
+    name = hash_image(img)
+    if not image_exists(kind, name):
+        save_variants(img, get_image_directory(kind, name), name, sizes, crop, webp)
+    return name
+
+
+def process_post_image(file) -> str:
+    """
+    Saves an image attached to a post in each size it's served in.
+
+    Args:
+        file: The file uploaded by the user.
+
+    Returns:
+        The name the image was saved under.
+    """
+    return store_image(file, "post_imgs")
+
+
+def process_avatar(file) -> str:
+    """
+    Saves a profile picture, cropped to a square, in each size it's served in.
+
+    Args:
+        file: The file uploaded by the user.
+
+    Returns:
+        The name the image was saved under.
+    """
+    return store_image(file, "avatars")
+
+
+def delete_image(kind: str, name: str):
+    """
+    Deletes every size of an image.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name the image was saved under.
+    """
+    for file_path in get_image_files(kind, name):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def get_image_url(kind: str, name: str, size: str = "full", extension: str = "jpg"):
+    """
+    Gets the URL of a size of an uploaded image.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+        name: The name the image was saved under.
+        size: The name of the size to get.
+        extension: The file extension of the format to get.
+
+    Returns:
+        The URL of the image.
+    """
+    return "/".join(
+        part
+        for part in (
+            IMAGES_URL,
+            kind,
+            get_image_subdirectory(name),
+            get_variant_name(name, size) + "." + extension,
+        )
+        if part
+    )
+
+
+def parse_image_url(url) -> Optional[Tuple[str, str]]:
+    """
+    Gets the kind and name of an uploaded image from the URL of its full size.
+
+    Args:
+        url: The URL of the full size of the image.
+
+    Returns:
+        The kind and name of the image, or None if it wasn't uploaded by a
+        user, such as the default profile picture.
+    """
+    if not url or not url.endswith(".jpg"):
+        return None
+    for base_url in (IMAGES_URL, LEGACY_IMAGES_URL):
+        for kind in KINDS:
+            prefix = "{}/{}/".format(base_url, kind)
+            if url.startswith(prefix):
+                name = url[len(prefix) : -len(".jpg")].rsplit("/", 1)[-1]
+                return kind, name
+
+    return None
+
+
+def get_avatar_url(name: str) -> str:
+    """
+    Gets the URL of the full size of a profile picture.
+
+    Args:
+        name: The name the profile picture was saved under.
+
+    Returns:
+        The URL of the profile picture.
+    """
+    return get_image_url("avatars", name)
+
+
+def get_variant_url(url, size: str = "thumb", extension: str = "jpg"):
+    """
+    Gets the URL of a smaller size of an uploaded image. Images which weren't
+    uploaded by users, such as the default profile picture, are unchanged, and
+    the original is used for older images without smaller sizes.
+
+    Args:
+        url: The URL of the full size of the image.
+        size: The name of the size to get.
+        extension: The file extension of the format to get.
+
+    Returns:
+        The URL of the requested size of the image.
+    """
+    image = parse_image_url(url)
+    if image is None:
+        return url
+    if not has_smaller_sizes(*image):
+        return get_image_url(*image)
+    return get_image_url(*image, size, extension)
+
+
+def get_post_image_urls(name: str) -> dict:
+    """
+    Gets the URLs needed to display an image attached to a post.
+
+    Args:
+        name: The name the image was saved under.
+
+    Returns:
+        The URLs of the feed size as JPEG and WebP, and of the full size. Older
+        images without smaller sizes use the full size, without WebP.
+    """
+    if not has_smaller_sizes("post_imgs", name):
+        full = get_image_url("post_imgs", name)
+        return {"src": full, "webp": None, "full": full}
+    return {
+        "src": get_image_url("post_imgs", name, "feed"),
+        "webp": get_image_url("post_imgs", name, "feed", "webp"),
+        "full": get_image_url("post_imgs", name),
+    }
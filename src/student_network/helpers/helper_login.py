@@ -1,11 +1,166 @@
 """
 Performs checks and actions to help the login system work effectively.
 """
+import functools
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List
 
+import student_network.helpers.helper_general as helper_general
 from email_validator import validate_email, EmailNotValidError
 
+# Educational email domains end in .edu, or .ac or .edu followed by a country
+# code, such as exeter.ac.uk or sydney.edu.au.
+ACADEMIC_DOMAIN_PATTERN = re.compile(r".+\.(?:edu|(?:ac|edu)\.[a-z]{2})")
+# Whether to check that new email addresses can receive mail once the account
+# has been created. This looks up the domain's DNS records, so it's done in
+# the background rather than while registering.
+CHECK_DELIVERABILITY = os.environ.get("REGISTRATION_CHECK_DELIVERABILITY") == "1"
+
+_deliverability_executor = ThreadPoolExecutor(max_workers=2)
+
+
+@functools.lru_cache(maxsize=4096)
+def is_academic_domain(domain: str) -> bool:
+    """
+    Checks whether an email domain belongs to an educational institute, using
+    the .ac and .edu domains rather than looking anything up online.
+
+    Args:
+        domain: The domain of the email address, such as "exeter.ac.uk".
+
+    Returns:
+        Whether the domain is allowed to register.
+    """
+    return ACADEMIC_DOMAIN_PATTERN.fullmatch(domain.lower()) is not None
+
+
+def get_registered_details(cur, username: str, email: str) -> Tuple[bool, bool]:
+    """
+    Checks whether a username or email address has already been registered,
+    using a single query.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The username to check.
+        email: The email address to check.
+
+    Returns:
+        Whether the username is taken, and whether the email address is taken.
+    """
+    cur.execute(
+        "SELECT MAX(username=?), MAX(email=?) FROM ACCOUNTS "
+        "WHERE username=? OR email=?;",
+        (username, email, username, email),
+    )
+    username_taken, email_taken = cur.fetchone()
+    return bool(username_taken), bool(email_taken)
+
+
+def _check_deliverability(username: str, email: str):
+    """
+    Checks that an email address can receive mail, notifying the user if not.
+    This runs in a background thread after they have registered.
+    """
+    try:
+        validate_email(email)
+    except EmailNotValidError:
+        helper_general.new_notification_username(
+            username,
+            "We couldn't confirm that {} can receive emails, please check "
+            "that it's correct.".format(email),
+            "/profile",
+        )
+
+
+def check_deliverability_later(username: str, email: str):
+    """
+    Checks in the background that a newly registered email address can
+    receive mail, if deliverability checks are enabled.
+
+    Args:
+        username: The username of the new account.
+        email: The email address of the new account.
+    """
+    if CHECK_DELIVERABILITY:
+        _deliverability_executor.submit(_check_deliverability, username, email)
+
+
+def get_username_errors(username: str) -> List[str]:
+    """
+    Checks that a new username only contains letters and numbers.
+
+    Args:
+        username: The username to check.
+
+    Returns:
+        The reasons the username is invalid, if any.
+    """
+    if username.isalnum() is False:
+        return ["Username must only contain letters and numbers!"]
+    return []
+
+
+def get_full_name_errors(full_name: str) -> List[str]:
+    """
+    Checks that a full name doesn't exceed 40 characters, and only contains
+    letters and spaces.
+
+    Args:
+        full_name: The full name to check.
+
+    Returns:
+        The reasons the full name is invalid, if any.
+    """
+    message = []
+    if len(full_name) > 40:
+        message.append("Full name exceeds 40 characters!")
+    if not all(x.isalpha() or x.isspace() for x in full_name):
+        message.append("Full name must only contain letters and spaces!")
+    return message
+
+
+def get_email_errors(email: str) -> List[str]:
+    """
+    Checks that an email address has the correct format and belongs to an
+    educational institute, without checking whether its domain exists, which
+    is done after registering instead.
+
+    Args:
+        email: The email address to check.
+
+    Returns:
+        The reasons the email address is invalid, if any.
+    """
+    try:
+        valid_email = validate_email(email, check_deliverability=False)
+    except EmailNotValidError:
+        return ["Email is invalid!"]
+    if not is_academic_domain(valid_email.domain):
+        return ["Email does not belong to a registered educational institute!"]
+    return []
+
+
+def get_password_errors(password: str) -> List[str]:
+    """
+    Checks that a password has a minimum length of 8 characters, and at least
+    one number.
+
+    Args:
+        password: The password to check.
+
+    Returns:
+        The reasons the password is invalid, if any.
+    """
+    if len(password) <= 7 or any(char.isdigit() for char in password) is False:
+        return [
+            "Password does not meet requirements! It must contain "
+            "at least eight characters, including at least one "
+            "number."
+        ]
+    return []
+
 
 def validate_registration(
     cur,
@@ -35,7 +190,6 @@ def validate_registration(
     """
     # Registration remains valid as long as it isn't caught by any checks. If
     # not, error messages will be provided to the user.
-    valid = True
     message = []
 
     # Checks that there are no null inputs.
@@ -47,69 +201,26 @@ def validate_registration(
         or email == ""
     ):
         message.append("Not all fields have been filled in!")
-        valid = False
 
-    # Checks that the username only contains valid characters.
-    if username.isalnum() is False:
-        message.append("Username must only contain letters and numbers!")
-        valid = False
-    # Checks that the username hasn't already been registered.
-    cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-    if cur.fetchone() is not None:
+    message += get_username_errors(username)
+    # Checks that the username and email haven't already been registered.
+    username_taken, email_taken = get_registered_details(cur, username, email)
+    if username_taken:
         message.append("Username has already been registered!")
-        valid = False
 
-    # Checks that the full name doesn't exceed 40 characters.
-    if len(full_name) > 40:
-        message.append("Full name exceeds 40 characters!")
-        valid = False
-    # Checks that the full name only contains valid characters.
-    if not all(x.isalpha() or x.isspace() for x in full_name):
-        message.append("Full name must only contain letters and spaces!")
-        valid = False
+    message += get_full_name_errors(full_name)
 
-    # Checks that the email hasn't already been registered.
-    cur.execute("SELECT * FROM Accounts WHERE email=?;", (email,))
-    if cur.fetchone() is not None:
+    if email_taken:
         message.append("Email has already been registered!")
-        valid = False
-    # Checks that the email address has the correct format, checks whether it
-    # exists, and isn't a blacklist email.
-    try:
-        valid_email = validate_email(email)
-        # Updates with the normalised form of the email address.
-        email = valid_email.email
-        # If the format is valid, checks that the email address has the
-        # University of Exeter domain.
-        if re.search("@.*", email) is not None:
-            domain = re.search("@.*", email).group()
-            domain_type = domain.split(".")[1]
-            if domain_type not in ["ac", "edu"]:
-                valid = False
-                message.append(
-                    "Email does not belong to a registered educational institute!"
-                )
-    except EmailNotValidError:
-        message.append("Email is invalid!")
-        valid = False
+    message += get_email_errors(email)
 
-    # Checks that the password has a minimum length of 8 characters, and at
-    # least one number.
-    if len(password) <= 7 or any(char.isdigit() for char in password) is False:
-        message.append(
-            "Password does not meet requirements! It must contain "
-            "at least eight characters, including at least one "
-            "number."
-        )
-        valid = False
+    message += get_password_errors(password)
     # Checks that the passwords match.
     if password != password_confirm:
         message.append("Passwords do not match!")
-        valid = False
 
     # Checks that the terms of service has been ticked.
     if terms is None:
         message.append("You must accept the terms of service!")
-        valid = False
 
-    return valid, message
+    return not message, message
@@ -0,0 +1,478 @@
+"""
+Applies schema changes to the database so that it matches what the helpers
+expect. The version of the schema is tracked using SQLite's user_version.
+"""
+
+
+def _index_connection_user2(cur):
+    """
+    Indexes connections by the second user, so that both directions of a
+    connection can be looked up without scanning the table.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS Connection_user2_index "
+        "ON Connection (user2, connection_type);"
+    )
+
+
+def _create_image_store(cur):
+    """
+    Tracks how many posts and profiles use each uploaded image, and which
+    image each uploaded file was saved as, so identical uploads are only
+    stored once and unused images can be deleted.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS Image ("
+        "kind TEXT NOT NULL, "
+        "name TEXT NOT NULL, "
+        "referenceCount INTEGER NOT NULL DEFAULT 0, "
+        "uploaded INTEGER NOT NULL, "
+        "PRIMARY KEY (kind, name));"
+    )
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS ImageUpload ("
+        "kind TEXT NOT NULL, "
+        "uploadHash TEXT NOT NULL, "
+        "name TEXT NOT NULL, "
+        "PRIMARY KEY (kind, uploadHash));"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ImageUpload_name_index "
+        "ON ImageUpload (kind, name);"
+    )
+    # Counts the references to images uploaded before they were tracked.
+    cur.execute(
+        "INSERT OR IGNORE INTO Image (kind, name, referenceCount, uploaded) "
+        "SELECT 'post_imgs', contentUrl, COUNT(*), strftime('%s', 'now') "
+        "FROM PostContent JOIN POSTS ON POSTS.postId = PostContent.postId "
+        "WHERE IFNULL(POSTS.privacy, '') != 'deleted' GROUP BY contentUrl;"
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO Image (kind, name, referenceCount, uploaded) "
+        "SELECT 'avatars', substr(profilepicture, 24, length(profilepicture) - 27), "
+        "COUNT(*), strftime('%s', 'now') FROM UserProfile "
+        "WHERE profilepicture LIKE '/static/images/avatars/%.jpg' "
+        "GROUP BY profilepicture;"
+    )
+
+
+def _serve_avatars_as_media(cur):
+    """
+    Points profile pictures at the media URLs they're now served from, which
+    browsers can cache indefinitely.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "UPDATE UserProfile SET profilepicture='/media/avatars/' || "
+        "substr(profilepicture, 24) "
+        "WHERE profilepicture LIKE '/static/images/avatars/%';"
+    )
+
+
+def _create_login_throttle(cur):
+    """
+    Stores the limits on login attempts, for when they're shared between
+    worker processes.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS LoginThrottle ("
+        "key TEXT PRIMARY KEY, "
+        "tokens REAL NOT NULL, "
+        "updated REAL NOT NULL);"
+    )
+
+
+def _index_account_email(cur):
+    """
+    Indexes accounts by email address, so that registering can check whether
+    an email address is taken without scanning every account.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS ACCOUNTS_email_index ON ACCOUNTS (email);")
+
+
+def _create_flashcards(cur):
+    """
+    Stores each flashcard in its own row instead of joining every question
+    and answer of a set into one string, so that editing a card only touches
+    that card. The number of cards in each set is kept alongside it.
+
+    The old questions and answers columns are left in place but no longer
+    used, as dropping columns needs SQLite 3.35 and would lose the original
+    cards if splitting them out went wrong.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS Flashcard ("
+        "card_id INTEGER PRIMARY KEY, "
+        "set_id INTEGER NOT NULL, "
+        "position INTEGER NOT NULL, "
+        "question TEXT NOT NULL DEFAULT '', "
+        "answer TEXT NOT NULL DEFAULT '');"
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS Flashcard_set_position_index "
+        "ON Flashcard (set_id, position);"
+    )
+    cur.execute(
+        "ALTER TABLE QuestionSets ADD COLUMN card_count INTEGER NOT NULL DEFAULT 0;"
+    )
+
+    # Splits the cards out of the old columns, where they were separated by '|'.
+    cur.execute("SELECT set_id, questions, answers FROM QuestionSets;")
+    cards = []
+    for set_id, questions, answers in cur.fetchall():
+        questions = questions.split("|") if questions else []
+        answers = answers.split("|") if answers else []
+        for position, question in enumerate(questions):
+            answer = answers[position] if position < len(answers) else ""
+            cards.append((set_id, position, question, answer))
+    cur.executemany(
+        "INSERT INTO Flashcard (set_id, position, question, answer) "
+        "VALUES (?, ?, ?, ?);",
+        cards,
+    )
+    cur.execute(
+        "UPDATE QuestionSets SET card_count = "
+        "(SELECT COUNT(*) FROM Flashcard WHERE Flashcard.set_id = QuestionSets.set_id);"
+    )
+
+
+def _version_flashcards(cur):
+    """
+    Counts the changes made to each flashcard, so that the editor can tell
+    when a card it is saving has been changed elsewhere since it was loaded.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute("ALTER TABLE Flashcard ADD COLUMN version INTEGER NOT NULL DEFAULT 0;")
+
+
+def _index_catalogues(cur):
+    """
+    Keeps the number of questions in each quiz alongside it, and indexes
+    quizzes and flashcard sets by plays, so that pages of the catalogues can
+    be read in order without counting questions or sorting every row.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "ALTER TABLE Quiz ADD COLUMN question_count INTEGER NOT NULL DEFAULT 0;"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS Question_quiz_id_index ON Question (quiz_id);"
+    )
+    cur.execute(
+        "UPDATE Quiz SET question_count = "
+        "(SELECT COUNT(*) FROM Question WHERE Question.quiz_id = Quiz.quiz_id);"
+    )
+    # Pages are found by comparing plays, which doesn't work for NULL.
+    cur.execute("UPDATE Quiz SET plays = 0 WHERE plays IS NULL;")
+    cur.execute("UPDATE QuestionSets SET cards_played = 0 WHERE cards_played IS NULL;")
+    cur.execute("CREATE INDEX IF NOT EXISTS Quiz_plays_index ON Quiz (plays, quiz_id);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS Quiz_author_plays_index "
+        "ON Quiz (author, plays, quiz_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS QuestionSets_plays_index "
+        "ON QuestionSets (cards_played, set_id);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS QuestionSets_author_plays_index "
+        "ON QuestionSets (author, cards_played, set_id);"
+    )
+
+
+def _create_quiz_attempts(cur):
+    """
+    Stores each attempt at a quiz, with the order its questions and answers
+    were shown in, and keeps running totals of how quizzes are answered so
+    that their stats don't need to be recalculated from every attempt.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS QuizAttempt ("
+        "attempt_id INTEGER PRIMARY KEY, "
+        "quiz_id INTEGER NOT NULL, "
+        "username TEXT NOT NULL, "
+        "questions TEXT NOT NULL, "
+        "started DATETIME NOT NULL, "
+        "answers TEXT, "
+        "score INTEGER, "
+        "submitted DATETIME);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS QuizAttempt_user_index "
+        "ON QuizAttempt (username, quiz_id, submitted);"
+    )
+    # Plays from before attempts were stored weren't graded, so the graded
+    # attempts are counted separately.
+    cur.execute("ALTER TABLE Quiz ADD COLUMN attempt_count INTEGER NOT NULL DEFAULT 0;")
+    cur.execute("ALTER TABLE Quiz ADD COLUMN total_score INTEGER NOT NULL DEFAULT 0;")
+    cur.execute(
+        "ALTER TABLE Question ADD COLUMN correct_count INTEGER NOT NULL DEFAULT 0;"
+    )
+
+
+def _index_profile_posts(cur):
+    """
+    Indexes the posts on each profile by their ID, so that each page of a
+    profile's timeline is read in order, along with the comments and likes
+    looked up for the posts on the page.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS POSTS_username_index ON POSTS (username, postId);"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS Comments_post_index ON Comments (postId);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS UserLikes_user_post_index "
+        "ON UserLikes (username, postId);"
+    )
+
+
+def _canonicalise_connections(cur):
+    """
+    Allows only one connection between each pair of users, whichever of them
+    started it, so that the connection between two users can be read and
+    changed with a single statement. Invalid connections are rejected, and
+    close friends are removed once their users are no longer connected.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute("DELETE FROM Connection WHERE user1 = user2;")
+    # Where both users had a connection with each other, keeps blocks over
+    # connections, and connections over requests.
+    rank = (
+        "CASE {0}.connection_type WHEN 'block' THEN 3 "
+        "WHEN 'connected' THEN 2 ELSE 1 END"
+    )
+    cur.execute(
+        "DELETE FROM Connection WHERE EXISTS (SELECT 1 FROM Connection AS other "
+        "WHERE min(other.user1, other.user2) = min(Connection.user1, Connection.user2) "
+        "AND max(other.user1, other.user2) = max(Connection.user1, Connection.user2) "
+        "AND ({1} > {0} OR ({1} = {0} AND other.rowid < Connection.rowid)));".format(
+            rank.format("Connection"), rank.format("other")
+        )
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS Connection_pair_index "
+        "ON Connection (min(user1, user2), max(user1, user2));"
+    )
+    for action in ("INSERT", "UPDATE"):
+        cur.execute(
+            "CREATE TRIGGER IF NOT EXISTS Connection_check_{0} "
+            "BEFORE {1} ON Connection "
+            "WHEN NEW.user1 = NEW.user2 "
+            "OR NEW.connection_type NOT IN ('request', 'connected', 'block') "
+            "BEGIN SELECT RAISE(ABORT, 'Invalid connection'); END;".format(
+                action.lower(), action
+            )
+        )
+
+    close_friends = (
+        "DELETE FROM CloseFriend WHERE (user1 = OLD.user1 AND user2 = OLD.user2) "
+        "OR (user1 = OLD.user2 AND user2 = OLD.user1);"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS Connection_update_close_friends "
+        "AFTER UPDATE OF connection_type ON Connection "
+        "WHEN OLD.connection_type = 'connected' "
+        "AND NEW.connection_type != 'connected' "
+        "BEGIN " + close_friends + " END;"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS Connection_delete_close_friends "
+        "AFTER DELETE ON Connection WHEN OLD.connection_type = 'connected' "
+        "BEGIN " + close_friends + " END;"
+    )
+    cur.execute(
+        "DELETE FROM CloseFriend WHERE NOT EXISTS (SELECT 1 FROM Connection "
+        "WHERE min(user1, user2) = min(CloseFriend.user1, CloseFriend.user2) "
+        "AND max(user1, user2) = max(CloseFriend.user1, CloseFriend.user2) "
+        "AND connection_type = 'connected');"
+    )
+
+
+def _count_connections(cur):
+    """
+    Keeps a count of each user's connections, pending requests, close friends
+    and blocked users, so that they can be read without counting the rows.
+    The counts are changed by triggers in the same statement as the
+    connection, whichever way it is changed.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS UserConnectionCounts ("
+        "username TEXT PRIMARY KEY REFERENCES ACCOUNTS (username), "
+        "connections INTEGER NOT NULL DEFAULT 0, "
+        "incoming_requests INTEGER NOT NULL DEFAULT 0, "
+        "outgoing_requests INTEGER NOT NULL DEFAULT 0, "
+        "close_friends INTEGER NOT NULL DEFAULT 0, "
+        "blocked INTEGER NOT NULL DEFAULT 0);"
+    )
+    # Adds a row's counts to a user, or subtracts them with a sign of "-".
+    add_counts = (
+        "INSERT INTO UserConnectionCounts (username, connections, "
+        "incoming_requests, outgoing_requests, close_friends, blocked) "
+        "VALUES ({0}, {1}) ON CONFLICT (username) DO UPDATE SET "
+        "connections = connections + excluded.connections, "
+        "incoming_requests = incoming_requests + excluded.incoming_requests, "
+        "outgoing_requests = outgoing_requests + excluded.outgoing_requests, "
+        "close_friends = close_friends + excluded.close_friends, "
+        "blocked = blocked + excluded.blocked;"
+    )
+
+    def connection_counts(row, sign):
+        connected = "{}({}.connection_type = 'connected')".format(sign, row)
+        request = "{}({}.connection_type = 'request')".format(sign, row)
+        block = "{}({}.connection_type = 'block')".format(sign, row)
+        return add_counts.format(
+            row + ".user1", ", ".join([connected, "0", request, "0", block])
+        ) + add_counts.format(
+            row + ".user2", ", ".join([connected, request, "0", "0", "0"])
+        )
+
+    def close_friend_counts(row, sign):
+        return add_counts.format(row + ".user1", "0, 0, 0, {}1, 0".format(sign))
+
+    for table, counts in [
+        ("Connection", connection_counts),
+        ("CloseFriend", close_friend_counts),
+    ]:
+        cur.execute(
+            "CREATE TRIGGER IF NOT EXISTS {0}_insert_counts AFTER INSERT ON {0} "
+            "BEGIN {1} END;".format(table, counts("NEW", "+"))
+        )
+        cur.execute(
+            "CREATE TRIGGER IF NOT EXISTS {0}_delete_counts AFTER DELETE ON {0} "
+            "BEGIN {1} END;".format(table, counts("OLD", "-"))
+        )
+        cur.execute(
+            "CREATE TRIGGER IF NOT EXISTS {0}_update_counts AFTER UPDATE ON {0} "
+            "BEGIN {1} {2} END;".format(table, counts("OLD", "-"), counts("NEW", "+"))
+        )
+
+    cur.execute(
+        "INSERT OR REPLACE INTO UserConnectionCounts "
+        "SELECT username, SUM(connected), SUM(incoming), SUM(outgoing), "
+        "SUM(close), SUM(blocked) FROM ("
+        "SELECT user1 AS username, connection_type = 'connected' AS connected, "
+        "0 AS incoming, connection_type = 'request' AS outgoing, 0 AS close, "
+        "connection_type = 'block' AS blocked FROM Connection UNION ALL "
+        "SELECT user2, connection_type = 'connected', "
+        "connection_type = 'request', 0, 0, 0 FROM Connection UNION ALL "
+        "SELECT user1, 0, 0, 0, 1, 0 FROM CloseFriend) GROUP BY username;"
+    )
+
+
+def _add_user_clusters(cur):
+    """
+    Stores the community of connections which each user belongs to, as found
+    by utils/detect_communities.py, and indexes them by community so that the
+    members of a user's community can be found together.
+
+    Args:
+        cur: Cursor for the SQLite database.
+    """
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS UserCluster ("
+        "username TEXT PRIMARY KEY REFERENCES ACCOUNTS (username), "
+        "cluster_id INTEGER NOT NULL, computed_at REAL NOT NULL);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS UserCluster_cluster_index "
+        "ON UserCluster (cluster_id);"
+    )
+
+
+# Migrations are applied in order, and must never be reordered or removed.
+MIGRATIONS = [
+    _index_connection_user2,
+    _create_image_store,
+    _serve_avatars_as_media,
+    _create_login_throttle,
+    _index_account_email,
+    _create_flashcards,
+    _version_flashcards,
+    _index_catalogues,
+    _create_quiz_attempts,
+    _index_profile_posts,
+    _canonicalise_connections,
+    _count_connections,
+    _add_user_clusters,
+]
+
+
+def get_schema_version(cur) -> int:
+    """
+    Gets the version of the schema that the database is currently on.
+
+    Args:
+        cur: Cursor for the SQLite database.
+
+    Returns:
+        The number of migrations which have been applied to the database.
+    """
+    cur.execute("PRAGMA user_version;")
+    return cur.fetchone()[0]
+
+
+def apply_migrations(conn) -> int:
+    """
+    Applies any migrations which haven't yet been applied to the database.
+
+    Args:
+        conn: The connection to the database.
+
+    Returns:
+        The version of the schema after the migrations have been applied.
+    """
+    cur = conn.cursor()
+    version = get_schema_version(cur)
+    # The sqlite3 module only opens a transaction before inserts and updates,
+    # so each migration is run in one started explicitly. Otherwise, a
+    # migration which fails after changing the schema would be left half
+    # applied, without the version being bumped to skip it next time.
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            cur.execute("BEGIN;")
+            try:
+                migration(cur)
+                # PRAGMA statements can't use placeholders.
+                cur.execute("PRAGMA user_version = {};".format(int(number)))
+            except Exception:
+                cur.execute("ROLLBACK;")
+                raise
+            cur.execute("COMMIT;")
+    finally:
+        conn.isolation_level = isolation_level
+
+    return get_schema_version(cur)
@@ -4,20 +4,34 @@ Performs checks and actions to help the post system work effectively.
 import os
 import re
 import sqlite3
-import uuid
 from datetime import datetime
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import student_network.helpers.helper_achievements as helper_achievements
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
-import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_images as helper_images
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import request, session
-from PIL import Image
-from werkzeug.utils import secure_filename
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
+# The number of posts shown on a profile at a time.
+PROFILE_POSTS_PAGE_SIZE = 10
+# The privacy settings of the posts hidden from each tier of profile viewer.
+# Viewers who aren't connected only see public posts.
+HIDDEN_PRIVACIES = {
+    "owner": ("deleted",),
+    "close_friend": ("private", "deleted"),
+    "connection": ("private", "deleted", "close"),
+}
+# The label and icon shown for each privacy setting on a profile.
+PRIVACY_LABELS = {
+    "protected": ("Friends only", "user plus"),
+    "close": ("Close friends only", "handshake outline"),
+    "private": ("Private", "lock"),
+    "deleted": ("Deleted", "small trash alternate outline icon"),
+}
 
 
 def check_if_liked(cur, post_id: int, username: str) -> bool:
@@ -108,14 +122,6 @@ def fetch_posts(number: int, starting_id: int) -> Tuple[dict, str, bool]:
                     add = "..."
                 time = datetime.strptime(user_post[4], "%Y-%m-%d").strftime("%d-%m-%y")
 
-                # Get account type
-                cur.execute(
-                    "SELECT type FROM ACCOUNTS WHERE username=? ", (user_post[3],)
-                )
-
-                accounts = cur.fetchone()
-                account_type = accounts[0]
-
                 post_id = user_post[0]
 
                 cur.execute(
@@ -123,6 +129,12 @@ def fetch_posts(number: int, starting_id: int) -> Tuple[dict, str, bool]:
                 )
                 comments = cur.fetchall()
 
+                # Gets the author and commenter details in a single batch.
+                cards = helper_user_cards.get_user_cards(
+                    [user_post[3]] + [x[1] for x in comments]
+                )
+                account_type = cards[user_post[3]].account_type
+
                 comments = list(
                     map(
                         lambda x: (
@@ -131,7 +143,9 @@ def fetch_posts(number: int, starting_id: int) -> Tuple[dict, str, bool]:
                             x[2],
                             x[3],
                             x[4],
-                            helper_profile.get_profile_picture(x[1]),
+                            helper_images.get_variant_url(
+                                helper_user_cards.get_avatar(cards, x[1])
+                            ),
                         ),
                         comments,
                     )
@@ -156,7 +170,9 @@ def fetch_posts(number: int, starting_id: int) -> Tuple[dict, str, bool]:
                 all_posts["AllPosts"].append(
                     {
                         "postId": user_post[0],
-                        "profile_pic": helper_profile.get_profile_picture(user_post[3]),
+                        "profile_pic": helper_images.get_variant_url(
+                            cards[user_post[3]].avatar
+                        ),
                         "author": user_post[3],
                         "account_type": account_type,
                         "date_posted": time,
@@ -168,6 +184,10 @@ def fetch_posts(number: int, starting_id: int) -> Tuple[dict, str, bool]:
                         "liked": liked,
                         "comments": comments,
                         "images": images,
+                        "image_urls": [
+                            helper_images.get_post_image_urls(image[0])
+                            for image in images
+                        ],
                     }
                 )
                 i += 1
@@ -192,48 +212,6 @@ def update_comment_achievements(row: int, username: str):
         helper_achievements.apply_achievement(username, 21)
 
 
-def upload_image(file):
-    """
-    Uploads the image to the website.
-
-    Args:
-        file: The file uploaded by the user.
-
-    Returns:
-        The hashed file name.
-    """
-    file_name_hashed = ""
-    # Hashes the name of the file and resizes it.
-    if helper_general.is_allowed_photo_file(file.filename):
-        secure_filename(file.filename)
-        file_name_hashed = str(uuid.uuid4())
-        file_path = os.path.join("./static/images" + "//post_imgs", file_name_hashed)
-
-        img = Image.open(file)
-        fixed_height = 600
-        height_percent = fixed_height / float(img.size[1])
-        width_size = int((float(img.size[0]) * float(height_percent)))
-        width_size = min(width_size, 800)
-        img = img.resize((width_size, fixed_height))
-        img = img.convert("RGB")
-        img.save(file_path + ".jpg")
-    return file_name_hashed
-
-
-def delete_file(filename):
-    """
-    Deletes a file from post images
-
-    Args:
-        filename: Post image file name
-    """
-    if filename == "":
-        return
-
-    file_path = os.path.join("./static/images" + "//post_imgs", filename)
-    os.remove(file_path)
-
-
 def update_submission_achievements(cur):
     """
     Unlocks achievements for a user after they make a submission.
@@ -279,11 +257,121 @@ def get_account_type(username):
     Returns the type of an account for username
         username: The username to check the type for
     """
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
+    card = helper_user_cards.get_user_card(username)
+    if card:
+        return card.account_type
+
+
+def _get_privacy_condition(tier: str) -> Tuple[str, tuple]:
+    """
+    Gets the SQL condition for the posts visible to a tier of profile viewer.
+    """
+    if tier not in HIDDEN_PRIVACIES:
+        return "privacy='public'", ()
+    hidden = HIDDEN_PRIVACIES[tier]
+    return "privacy NOT IN ({})".format(", ".join("?" * len(hidden))), hidden
+
+
+def count_profile_posts(cur, username: str, tier: str) -> int:
+    """
+    Counts the posts on a user's profile which are visible to the viewer.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose posts are counted.
+        tier: The tier of the viewer, from get_profile_access.
+
+    Returns:
+        The number of visible posts.
+    """
+    condition, parameters = _get_privacy_condition(tier)
+    cur.execute(
+        "SELECT COUNT(*) FROM POSTS WHERE username=? AND " + condition + ";",
+        (username,) + parameters,
+    )
+    return cur.fetchone()[0]
+
+
+def get_profile_posts(
+    cur,
+    username: str,
+    tier: str,
+    before: Optional[int] = None,
+    limit: int = PROFILE_POSTS_PAGE_SIZE,
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Gets a page of the posts on a user's profile, newest first, with their
+    comment counts and whether the viewer liked them looked up for the whole
+    page at once.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose posts are shown.
+        tier: The tier of the viewer, from get_profile_access.
+        before: The ID of the last post on the previous page.
+        limit: The number of posts on the page.
+
+    Returns:
+        The details of each post, and the ID to get the next page before if
+        there is one.
+    """
+    condition, parameters = _get_privacy_condition(tier)
+    if before is not None:
+        condition += " AND postId < ?"
+        parameters += (before,)
+    # Fetches one extra post to find out whether there's another page.
+    cur.execute(
+        "SELECT postId, body, likes, date, privacy FROM POSTS "
+        "WHERE username=? AND " + condition + " ORDER BY postId DESC LIMIT ?;",
+        (username,) + parameters + (limit + 1,),
+    )
+    rows = cur.fetchall()
+    next_before = rows[limit - 1][0] if len(rows) > limit else None
+    rows = rows[:limit]
+    if not rows:
+        return [], None
+
+    post_ids = [row[0] for row in rows]
+    placeholders = ", ".join("?" * len(post_ids))
+    cur.execute(
+        "SELECT postId, COUNT(*) FROM Comments WHERE postId IN ({}) "
+        "GROUP BY postId;".format(placeholders),
+        post_ids,
+    )
+    comment_counts = dict(cur.fetchall())
+    liked = set()
+    if session.get("username"):
         cur.execute(
-            "SELECT type FROM ACCOUNTS WHERE username=?;",
-            (username,),
+            "SELECT postId FROM UserLikes WHERE username=? AND postId IN ({});".format(
+                placeholders
+            ),
+            [session["username"]] + post_ids,
         )
-
-        return cur.fetchone()
+        liked = {row[0] for row in cur.fetchall()}
+    card = helper_user_cards.get_user_card(username)
+    account_type = card.account_type if card else None
+
+    posts = []
+    for post_id, body, likes, date_posted, privacy in rows:
+        add = ""
+        if len(body) > 250:
+            add = "..."
+        label, icon = PRIVACY_LABELS.get(privacy, (str(privacy).capitalize(), "users"))
+        posts.append(
+            {
+                "postId": post_id,
+                "title": body[:250] + add,
+                "profile_pic": "https://via.placeholder.com/600",
+                "author": username,
+                "likes": likes,
+                "comments": comment_counts.get(post_id, 0),
+                "liked": post_id in liked,
+                "account_type": account_type,
+                "date_posted": datetime.strptime(date_posted, "%Y-%m-%d").strftime(
+                    "%d-%m-%y"
+                ),
+                "privacy": label,
+                "icon": icon,
+            }
+        )
+    return posts, next_before
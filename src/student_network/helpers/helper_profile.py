@@ -3,16 +3,36 @@ Performs checks and actions to help the profile system work effectively.
 """
 import os
 import sqlite3
-import uuid
 from datetime import date, datetime
-from typing import List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import student_network.helpers.helper_general as helper_general
-from PIL import Image
-from werkzeug.utils import secure_filename
+import student_network.helpers.helper_image_store as helper_image_store
+import student_network.helpers.helper_images as helper_images
+import student_network.helpers.helper_reference as helper_reference
+from PIL import UnidentifiedImageError
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
+# The columns of UserProfile which can be changed in the edit profile form.
+EDITABLE_COLUMNS = ("bio", "gender", "birthday", "profilepicture", "degree")
+# The table and column that each list on a profile is stored in.
+LIST_TABLES = {
+    "hobbies": ("UserHobby", "hobby"),
+    "interests": ("UserInterests", "interest"),
+}
+
+
+class ProfileChange(NamedTuple):
+    """
+    Describes an edit to a user's profile, which is published once it has been
+    committed so that anything holding the old details can update them.
+    """
+
+    username: str
+    # The names of the columns and lists which changed, such as "bio" or
+    # "hobbies".
+    fields: frozenset
 
 
 def calculate_age(born: datetime) -> int:
@@ -45,18 +65,15 @@ def get_degree(username: str) -> Tuple[int, str]:
         cur.execute("SELECT degree FROM UserProfile WHERE username=?;", (username,))
         degree_id = cur.fetchone()
         if degree_id:
-            cur.execute("SELECT degree FROM Degree WHERE degreeId=?;", (degree_id[0],))
-            degree = cur.fetchone()
-            return degree_id[0], degree[0]
+            return degree_id[0], helper_reference.get_degree_name(degree_id[0])
 
 
-def get_level(username: str) -> List[int]:
+def calculate_level(exp: int) -> List[int]:
     """
-    Gets the current user experience points, the experience points
-    for the next level and the user's current level from the database.
+    Calculates the level a user has reached from their experience points.
 
     Args:
-        username: The username of the user logged in.
+        exp: The total experience points of the user.
 
     Returns:
         The user's level, XP, and XP to reach the next level.
@@ -65,7 +82,6 @@ def get_level(username: str) -> List[int]:
     xp_next_level = 100
     xp_increase_per_level = 15
 
-    exp = helper_general.get_exp(username)
     while exp >= xp_next_level:
         level += 1
         exp -= xp_next_level
@@ -74,6 +90,20 @@ def get_level(username: str) -> List[int]:
     return [level, exp, xp_next_level]
 
 
+def get_level(username: str) -> List[int]:
+    """
+    Gets the current user experience points, the experience points
+    for the next level and the user's current level from the database.
+
+    Args:
+        username: The username of the user logged in.
+
+    Returns:
+        The user's level, XP, and XP to reach the next level.
+    """
+    return calculate_level(helper_general.get_exp(username))
+
+
 def get_profile_picture(username: str) -> str:
     """
     Gets the profile picture of a user.
@@ -186,17 +216,145 @@ def validate_profile_pic(file) -> Tuple[bool, List[str], str]:
     message = []
     file_name_hashed = ""
 
-    # Hashes the name of the file and resizes it.
+    # Crops the image to a square and saves it in each size it's served in,
+    # unless the same file has been uploaded before.
     if helper_general.is_allowed_photo_file(file.filename):
-        secure_filename(file.filename)
-        file_name_hashed = str(uuid.uuid4())
-        file_path = os.path.join("./static/images" + "//avatars", file_name_hashed)
-        img = Image.open(file)
-        img = img.resize((400, 400))
-        img = img.convert("RGB")
-        img.save(file_path + ".jpg")
+        try:
+            file_name_hashed = helper_image_store.store_avatar(file)
+        except UnidentifiedImageError:
+            valid = False
+            message.append("Your file must be an image.")
     elif file:
         valid = False
         message.append("Your file must be an image.")
 
     return valid, message, file_name_hashed
+
+
+def diff_items(current: list, new: list) -> Tuple[list, list]:
+    """
+    Works out which items need to be added to and removed from a list, such as
+    a user's hobbies, to turn it into a new one.
+
+    Args:
+        current: The items currently in the list.
+        new: The items the list should have, which may include duplicates and
+            blanks.
+
+    Returns:
+        The items to add, and the items to remove.
+    """
+    new = list(dict.fromkeys(item for item in new if item))
+    current_items, new_items = set(current), set(new)
+    added = [item for item in new if item not in current_items]
+    removed = [item for item in current if item not in new_items]
+    return added, removed
+
+
+def update_profile(
+    cur,
+    username: str,
+    details: Dict[str, str],
+    lists: Dict[str, list],
+    avatar: Optional[str] = None,
+) -> ProfileChange:
+    """
+    Saves the edit profile form, only writing the details, hobbies and
+    interests which have changed. Uses the caller's transaction, so the caller
+    must commit and then publish the change.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose profile is being edited.
+        details: The new value of each editable UserProfile column.
+        lists: The new hobbies and interests, by the name of the list.
+        avatar: The file name of the new profile picture, if one was uploaded.
+
+    Returns:
+        What changed on the profile.
+    """
+    cur.execute(
+        "SELECT {} FROM UserProfile WHERE username=?;".format(
+            ", ".join(EDITABLE_COLUMNS)
+        ),
+        (username,),
+    )
+    current = dict(zip(EDITABLE_COLUMNS, cur.fetchone()))
+    details = dict(details)
+    if avatar:
+        details["profilepicture"] = helper_images.get_avatar_url(avatar)
+    changed = {
+        column
+        for column, value in details.items()
+        if column in EDITABLE_COLUMNS and str(current[column]) != str(value)
+    }
+
+    if "profilepicture" in changed:
+        # Moves the reference from the old profile picture to the new one, so
+        # the old one can be deleted if it's unused.
+        old_avatar = helper_images.parse_image_url(current["profilepicture"])
+        if old_avatar is not None:
+            helper_image_store.remove_references(cur, "avatars", [old_avatar[1]])
+        helper_image_store.add_references(cur, "avatars", [avatar])
+    if changed:
+        columns = sorted(changed)
+        cur.execute(
+            "UPDATE UserProfile SET {} WHERE username=?;".format(
+                ", ".join(column + "=?" for column in columns)
+            ),
+            [details[column] for column in columns] + [username],
+        )
+
+    for name, items in lists.items():
+        table, column = LIST_TABLES[name]
+        cur.execute(
+            "SELECT {} FROM {} WHERE username=?;".format(column, table), (username,)
+        )
+        added, removed = diff_items([row[0] for row in cur.fetchall()], items)
+        cur.executemany(
+            "DELETE FROM {} WHERE username=? AND {}=?;".format(table, column),
+            [(username, item) for item in removed],
+        )
+        cur.executemany(
+            "INSERT INTO {} (username, {}) VALUES (?, ?);".format(table, column),
+            [(username, item) for item in added],
+        )
+        if added or removed:
+            changed.add(name)
+
+    return ProfileChange(username, frozenset(changed))
+
+
+def update_socials(cur, username: str, socials: Dict[str, str]) -> ProfileChange:
+    """
+    Saves the links to a user's social media profiles, only writing the ones
+    which have changed. Uses the caller's transaction, so the caller must
+    commit and then publish the change.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose socials are being edited.
+        socials: The new link for each social media site, which is blank to
+            remove it.
+
+    Returns:
+        What changed on the profile.
+    """
+    cur.execute("SELECT social, link FROM UserSocial WHERE username=?;", (username,))
+    current = dict(cur.fetchall())
+    removed = [(username, social) for social in current if not socials.get(social)]
+    saved = [
+        (username, social, link)
+        for social, link in socials.items()
+        if link and current.get(social) != link
+    ]
+    cur.executemany("DELETE FROM UserSocial WHERE username=? AND social=?;", removed)
+    cur.executemany(
+        "INSERT OR REPLACE INTO UserSocial (username, social, link) "
+        "VALUES (?, ?, ?);",
+        saved,
+    )
+
+    return ProfileChange(
+        username, frozenset({"socials"}) if removed or saved else frozenset()
+    )
@@ -0,0 +1,221 @@
+"""
+Gathers the details shown in the header of a profile page in a few batched
+queries, and caches them for each tier of viewer so that viewing a profile
+doesn't need to query every table the header is built from.
+"""
+
+import itertools
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+import student_network.helpers.helper_achievements as helper_achievements
+import student_network.helpers.helper_cache as helper_cache
+import student_network.helpers.helper_catalogue as helper_catalogue
+import student_network.helpers.helper_events as helper_events
+import student_network.helpers.helper_posts as helper_posts
+import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_reference as helper_reference
+
+# The tiers of viewer which snapshots are cached for, from get_profile_access.
+TIERS = ("owner", "close_friend", "connection", "public")
+# The number of achievements, quizzes and flashcard sets shown on a profile.
+ACHIEVEMENTS_SHOWN = 6
+CONTENT_SHOWN = 2
+
+profile_snapshot_cache = helper_cache.LRUCache(
+    "profile_snapshots", max_size=2048, ttl=300
+)
+# Whole profile pages rendered for logged out visitors, who all see the same
+# page. They're keyed by the profile's version, so that changing anything on
+# the profile stops older pages from being served.
+profile_page_cache = helper_cache.LRUCache("profile_pages", max_size=1024, ttl=300)
+_profile_versions = {}
+_next_version = itertools.count(1)
+
+
+class ProfileSnapshot(NamedTuple):
+    """
+    The details shown in the header of a profile page.
+    """
+
+    name: str
+    bio: str
+    gender: str
+    birthday: str
+    profile_picture: str
+    account_type: str
+    email: str
+    degree: str
+    hobbies: List[str]
+    interests: List[str]
+    socials: dict
+    flashcards: list
+    quizzes: list
+    achievements: list
+    level: int
+    current_xp: int
+    xp_next_level: int
+    total_posts: int
+
+
+def load_profile_snapshot(cur, username: str, tier: str) -> Optional[ProfileSnapshot]:
+    """
+    Reads the details shown in the header of a profile from the database.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The user whose profile is being viewed.
+        tier: The tier of the viewer, from get_profile_access.
+
+    Returns:
+        The details of the profile, or None if the user doesn't exist.
+    """
+    cur.execute(
+        "SELECT UserProfile.name, UserProfile.bio, UserProfile.gender, "
+        "UserProfile.birthday, UserProfile.profilepicture, ACCOUNTS.type, "
+        "ACCOUNTS.email, UserProfile.degree, IFNULL(UserLevel.experience, 0) "
+        "FROM UserProfile "
+        "LEFT JOIN ACCOUNTS ON ACCOUNTS.username = UserProfile.username "
+        "LEFT JOIN UserLevel ON UserLevel.username = UserProfile.username "
+        "WHERE UserProfile.username=?;",
+        (username,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    *details, degree_id, experience = row
+
+    # Gets the hobbies, interests and socials together, as each is small.
+    cur.execute(
+        "SELECT 'hobby', hobby, NULL FROM UserHobby WHERE username=? "
+        "UNION ALL SELECT 'interest', interest, NULL FROM UserInterests "
+        "WHERE username=? "
+        "UNION ALL SELECT 'social', social, link FROM UserSocial WHERE username=?;",
+        (username,) * 3,
+    )
+    hobbies, interests, socials = [], [], {}
+    for kind, value, link in cur.fetchall():
+        if kind == "hobby":
+            hobbies.append(value)
+        elif kind == "interest":
+            interests.append(value)
+        else:
+            socials[value] = link
+
+    # Gets the user's rarest achievements.
+    unlocked = helper_achievements.get_unlocked_achievements(cur, username)
+
+    flashcards, _ = helper_catalogue.get_sets(cur, username, limit=CONTENT_SHOWN)
+    quizzes, _ = helper_catalogue.get_quizzes(cur, username, limit=CONTENT_SHOWN)
+    level, current_xp, xp_next_level = helper_profile.calculate_level(int(experience))
+
+    return ProfileSnapshot(
+        *details,
+        degree=helper_reference.get_degree_name(degree_id),
+        hobbies=hobbies,
+        interests=interests,
+        socials=socials,
+        flashcards=flashcards,
+        quizzes=quizzes,
+        achievements=unlocked[:ACHIEVEMENTS_SHOWN],
+        level=level,
+        current_xp=current_xp,
+        xp_next_level=xp_next_level,
+        total_posts=helper_posts.count_profile_posts(cur, username, tier),
+    )
+
+
+def get_profile_snapshot(username: str, tier: str) -> Optional[ProfileSnapshot]:
+    """
+    Gets the details shown in the header of a profile, only querying the
+    database if they aren't already cached for the viewer's tier.
+
+    Args:
+        username: The user whose profile is being viewed.
+        tier: The tier of the viewer, from get_profile_access.
+
+    Returns:
+        The details of the profile, or None if the user doesn't exist.
+    """
+    snapshot = profile_snapshot_cache.get((username, tier))
+    if snapshot is None:
+        with sqlite3.connect("db.sqlite3") as conn:
+            snapshot = load_profile_snapshot(conn.cursor(), username, tier)
+        if snapshot is not None:
+            profile_snapshot_cache.set((username, tier), snapshot)
+
+    return snapshot
+
+
+def invalidate_profile_snapshot(username: str):
+    """
+    Removes the snapshots of a user's profile from the cache, and stops
+    cached pages of it being served, after anything in its header has changed.
+
+    Args:
+        username: The user whose profile changed.
+    """
+    for tier in TIERS:
+        profile_snapshot_cache.invalidate((username, tier))
+    bump_profile_version(username)
+
+
+def get_profile_version(username: str) -> int:
+    """
+    Gets the version of a user's profile, which changes whenever anything
+    shown on it does.
+
+    Args:
+        username: The user whose profile is being viewed.
+
+    Returns:
+        The version of the profile.
+    """
+    return _profile_versions.get(username, 0)
+
+
+def bump_profile_version(username: str):
+    """
+    Changes the version of a user's profile, such as after a post on it has
+    been liked or commented on, so that cached pages of it aren't served.
+
+    Args:
+        username: The user whose profile changed.
+    """
+    _profile_versions[username] = next(_next_version)
+
+
+def get_public_profile_page(username: str, version: int) -> Optional[str]:
+    """
+    Gets the page rendered for logged out visitors to a profile.
+
+    Args:
+        username: The user whose profile is being viewed.
+        version: The version of the profile, from get_profile_version.
+
+    Returns:
+        The rendered page, or None if it isn't cached for this version.
+    """
+    return profile_page_cache.get((username, "public", version))
+
+
+def set_public_profile_page(username: str, version: int, page: str):
+    """
+    Caches the page rendered for logged out visitors to a profile.
+
+    Args:
+        username: The user whose profile was viewed.
+        version: The version of the profile when it started being rendered.
+        page: The rendered page.
+    """
+    profile_page_cache.set((username, "public", version), page)
+
+
+def _on_profile_changed(change):
+    """
+    Forgets the snapshots of a profile once it has been edited.
+    """
+    invalidate_profile_snapshot(change.username)
+
+
+helper_events.subscribe(helper_events.PROFILE_CHANGED, _on_profile_changed)
@@ -0,0 +1,209 @@
+"""
+Creates student accounts in bulk, such as from a CSV file when a new intake
+starts, checking each student's details with the same rules as registering.
+"""
+
+import secrets
+import sqlite3
+from datetime import date
+
+import student_network.helpers.helper_hashing as helper_hashing
+import student_network.helpers.helper_login as helper_login
+
+# Each batch looks up its usernames and emails in one query, which SQLite
+# limits to 999 placeholders.
+BATCH_SIZE = 400
+
+
+def generate_password() -> str:
+    """
+    Generates a random password which meets the password requirements.
+
+    Returns:
+        The password.
+    """
+    return secrets.token_urlsafe(12) + str(secrets.randbelow(10))
+
+
+def validate_row(row: dict, degrees: dict) -> str:
+    """
+    Validates the details of a student, using the same rules as registering.
+    Unlike registering, the password can be left out to generate one.
+
+    Args:
+        row: The details of the student from the CSV file.
+        degrees: The ID of each degree by its name.
+
+    Returns:
+        The reason the details are invalid, or an empty string if they're
+        valid.
+    """
+    if not row["username"] or not row["name"] or not row["email"]:
+        return "Not all fields have been filled in!"
+    message = (
+        helper_login.get_username_errors(row["username"])
+        + helper_login.get_full_name_errors(row["name"])
+        + helper_login.get_email_errors(row["email"])
+    )
+    if row["degree"] not in degrees:
+        message.append("Degree does not exist!")
+    if row.get("password"):
+        message += helper_login.get_password_errors(row["password"])
+
+    return message[0] if message else ""
+
+
+def find_taken(cur, rows: list) -> dict:
+    """
+    Finds the rows whose username or email address is already registered.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        rows: The details of the students in the batch.
+
+    Returns:
+        The reason each taken row can't be created, by its row number.
+    """
+    usernames = [row["username"] for row in rows]
+    emails = [row["email"] for row in rows]
+    placeholders = ", ".join("?" * len(rows))
+    cur.execute(
+        "SELECT username, email FROM ACCOUNTS "
+        "WHERE username IN ({0}) OR email IN ({0});".format(placeholders),
+        usernames + emails,
+    )
+    taken_usernames, taken_emails = set(), set()
+    for username, email in cur.fetchall():
+        taken_usernames.add(username)
+        taken_emails.add(email)
+
+    taken = {}
+    for row in rows:
+        if row["username"] in taken_usernames:
+            taken[row["row"]] = "Username has already been registered!"
+        elif row["email"] in taken_emails:
+            taken[row["row"]] = "Email has already been registered!"
+    return taken
+
+
+def insert_accounts(cur, rows: list, degrees: dict):
+    """
+    Inserts the accounts, profiles, levels, hobbies and interests of a batch
+    of students.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        rows: The details of the students, including their hashed passwords.
+        degrees: The ID of each degree by its name.
+    """
+    cur.executemany(
+        "INSERT INTO ACCOUNTS (username, password, email, type) "
+        "VALUES (?, ?, ?, 'student');",
+        [(row["username"], row["hash"], row["email"]) for row in rows],
+    )
+    cur.executemany(
+        "INSERT INTO UserProfile (username, name, bio, gender, birthday, "
+        "profilepicture, degree) VALUES (?, ?, ?, ?, ?, ?, ?);",
+        [
+            (
+                row["username"],
+                row["name"],
+                "Change your bio in the settings.",
+                "Male",
+                date.today(),
+                "/static/images/default-pfp.jpg",
+                degrees[row["degree"]],
+            )
+            for row in rows
+        ],
+    )
+    cur.executemany(
+        "INSERT INTO UserLevel (username, experience) VALUES (?, 0);",
+        [(row["username"],) for row in rows],
+    )
+    cur.executemany(
+        "INSERT INTO UserHobby (username, hobby) VALUES (?, ?);",
+        [(row["username"], hobby) for row in rows for hobby in row["hobbies"]],
+    )
+    cur.executemany(
+        "INSERT INTO UserInterests (username, interest) VALUES (?, ?);",
+        [(row["username"], interest) for row in rows for interest in row["interests"]],
+    )
+
+
+def provision_batch(conn, executor, batch: list, degrees: dict, seen: set) -> list:
+    """
+    Validates a batch of students and creates the accounts of the valid ones.
+
+    Args:
+        conn: The connection to the database.
+        executor: The pool of processes to hash passwords in.
+        batch: The details of the students from the CSV file.
+        degrees: The ID of each degree by its name.
+        seen: The usernames and emails earlier in the file, which is updated.
+
+    Returns:
+        The result of each row, for the report.
+    """
+    results = {}
+    valid_rows = []
+    for row in batch:
+        error = validate_row(row, degrees)
+        if not error and (row["username"] in seen or row["email"] in seen):
+            error = "Username or email appears earlier in the file!"
+        if error:
+            results[row["row"]] = (row, "failed", error)
+            continue
+        seen.update((row["username"], row["email"]))
+        valid_rows.append(row)
+
+    cur = conn.cursor()
+    if valid_rows:
+        taken = find_taken(cur, valid_rows)
+        for row in valid_rows:
+            if row["row"] in taken:
+                results[row["row"]] = (row, "failed", taken[row["row"]])
+        valid_rows = [row for row in valid_rows if row["row"] not in taken]
+
+    for row in valid_rows:
+        if not row.get("password"):
+            row["password"] = generate_password()
+            row["generated"] = True
+    hashes = helper_hashing.hash_passwords(
+        executor, [row["password"] for row in valid_rows]
+    )
+    for row, hashed_password in zip(valid_rows, hashes):
+        row["hash"] = hashed_password
+
+    try:
+        insert_accounts(cur, valid_rows, degrees)
+        conn.commit()
+        created = [(row, "created", "") for row in valid_rows]
+    except sqlite3.IntegrityError:
+        # Falls back to creating each account on its own, so that only the
+        # rows which conflict are reported as failed.
+        conn.rollback()
+        created = []
+        for row in valid_rows:
+            try:
+                insert_accounts(cur, [row], degrees)
+                conn.commit()
+                created.append((row, "created", ""))
+            except sqlite3.IntegrityError as error:
+                conn.rollback()
+                created.append((row, "failed", str(error)))
+    for row, status, error in created:
+        results[row["row"]] = (row, status, error)
+
+    return [
+        {
+            "row": number,
+            "username": row["username"],
+            "status": status,
+            "error": error,
+            "password": (
+                row["password"] if status == "created" and row.get("generated") else ""
+            ),
+        }
+        for number, (row, status, error) in sorted(results.items())
+    ]
@@ -1,16 +1,26 @@
 """
 Performs checks and actions to help quizzes work effectively.
 """
+import json
 import os
+import random
+import re
 import sqlite3
-from datetime import date
-from random import sample, choice
-from typing import Tuple, List
+from datetime import date, datetime
+from typing import Dict, Tuple, List, Optional
 
+import student_network.helpers.helper_achievements as helper_achievements
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
 from flask import request, session
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "db.sqlite3")
+# The number of wrong answers given alongside the correct one.
+DISTRACTOR_COUNT = 3
+# When ranking wrong answers by similarity, the number of random candidates
+# considered for each one that is given.
+SIMILARITY_CANDIDATES = 4
+TOKEN_PATTERN = re.compile(r"\w+")
 
 
 def add_quiz(author, date_created, questions, answers, quiz_name):
@@ -28,8 +38,9 @@ def add_quiz(author, date_created, questions, answers, quiz_name):
         cur = conn.cursor()
         # Inserts the quiz details into the database.
         cur.execute(
-            "INSERT INTO Quiz (quiz_name, date_created, author) VALUES (?, ?, ?);",
-            (quiz_name, date_created, author),
+            "INSERT INTO Quiz (quiz_name, date_created, author, question_count) "
+            "VALUES (?, ?, ?, ?);",
+            (quiz_name, date_created, author, len(questions)),
         )
         # Gets the quiz ID of the quiz which has just been created.
         cur.execute(
@@ -57,37 +68,225 @@ def add_quiz(author, date_created, questions, answers, quiz_name):
                 ),
             )
         conn.commit()
+    helper_profile_snapshot.invalidate_profile_snapshot(author)
 
 
-def get_quiz_details(cur, quiz_id: int) -> Tuple[list, list, str, list, str]:
+def get_quiz(cur, quiz_id: int) -> Optional[Tuple[str, str, int]]:
     """
-    Gets the details for the quiz being taken.
+    Gets the details of a quiz.
 
     Args:
         cur: Cursor for the SQLite database.
-        quiz_id: The ID of the quiz being taken.
+        quiz_id: The ID of the quiz.
 
     Returns:
-        Answer options, questions, author, details, and name of the quiz.
+        The name, author and number of questions of the quiz, or None if it
+        doesn't exist.
     """
-    cur.execute("SELECT * FROM Quiz WHERE quiz_id=?;", (quiz_id,))
-    quiz_details = cur.fetchone()
-    quiz_name = quiz_details[1]
-    quiz_author = quiz_details[3]
-    # Gets a list of questions and answers to pass to the web page.
-    cur.execute("SELECT * FROM Question WHERE quiz_id=?;", (quiz_id,))
-    questions_raw = cur.fetchall()
-    questions = []
-    answers = []
-    for question in questions_raw:
-        questions.append(question[2])
-        answers.append(
-            sample(
-                [question[3], question[4], question[5], question[6]],
-                4,
-            )
+    cur.execute(
+        "SELECT quiz_name, author, question_count FROM Quiz WHERE quiz_id=?;",
+        (quiz_id,),
+    )
+    return cur.fetchone()
+
+
+def get_questions(cur, quiz_id: int) -> Dict[int, Tuple[str, List[str]]]:
+    """
+    Gets the questions in a quiz.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        quiz_id: The ID of the quiz.
+
+    Returns:
+        The question and answer options of each question by its ID, in the
+        order they were written, with the correct answer first.
+    """
+    cur.execute(
+        "SELECT question_id, question, answer_1, answer_2, answer_3, answer_4 "
+        "FROM Question WHERE quiz_id=? ORDER BY question_id;",
+        (quiz_id,),
+    )
+    return {row[0]: (row[1], list(row[2:])) for row in cur.fetchall()}
+
+
+def start_attempt(
+    cur, quiz_id: int, username: str, questions: dict, rng=random
+) -> Tuple[int, list]:
+    """
+    Starts an attempt at a quiz, fixing the order that the answer options of
+    each question are shown in. An attempt which hasn't been submitted yet is
+    carried on with instead, so reloading the quiz doesn't reorder it, unless
+    the quiz's questions have changed since.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        quiz_id: The ID of the quiz.
+        username: The user taking the quiz.
+        questions: The questions returned by get_questions.
+        rng: The random number generator to shuffle the options with.
+
+    Returns:
+        The ID of the attempt, and the ID of each question in the order they
+        are shown, with the order its options are shown in.
+    """
+    cur.execute(
+        "SELECT attempt_id, questions FROM QuizAttempt "
+        "WHERE username=? AND quiz_id=? AND submitted IS NULL "
+        "ORDER BY attempt_id DESC LIMIT 1;",
+        (username, quiz_id),
+    )
+    row = cur.fetchone()
+    if row is not None:
+        order = json.loads(row[1])
+        if sorted(question_id for question_id, _ in order) == sorted(questions):
+            return row[0], order
+
+    order = [
+        [question_id, rng.sample(range(len(options)), len(options))]
+        for question_id, (_, options) in questions.items()
+    ]
+    cur.execute(
+        "INSERT INTO QuizAttempt (quiz_id, username, questions, started) "
+        "VALUES (?, ?, ?, ?);",
+        (quiz_id, username, json.dumps(order), datetime.now()),
+    )
+    return cur.lastrowid, order
+
+
+def get_attempt_questions(questions: dict, order: list) -> Tuple[list, list]:
+    """
+    Gets the questions of an attempt as they're shown to the user.
+
+    Args:
+        questions: The questions returned by get_questions.
+        order: The order of the questions and options in the attempt.
+
+    Returns:
+        The text of each question, and its answer options in order.
+    """
+    texts, options = [], []
+    for question_id, permutation in order:
+        question, answers = questions[question_id]
+        texts.append(question)
+        options.append([answers[i] for i in permutation])
+    return texts, options
+
+
+def parse_choices(form, question_count: int) -> Optional[List[int]]:
+    """
+    Gets the option chosen for each question of an attempt.
+
+    Args:
+        form: The submitted form, with the position of the chosen option for
+            each question as userAnswer0, userAnswer1 and so on.
+        question_count: The number of questions in the attempt.
+
+    Returns:
+        The position of the option chosen for each question, or None if any
+        questions haven't been answered.
+    """
+    choices = []
+    for i in range(question_count):
+        choice = form.get("userAnswer" + str(i), "")
+        if choice not in ("0", "1", "2", "3"):
+            return None
+        choices.append(int(choice))
+    return choices
+
+
+def grade_attempt(cur, attempt_id: int, username: str, choices: list) -> Optional[dict]:
+    """
+    Grades an attempt against the order its options were shown in, and
+    records the result along with the quiz's plays, the author's experience
+    and any achievements unlocked. Should be run in a transaction started
+    with BEGIN IMMEDIATE, so that an attempt can't be submitted twice.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        attempt_id: The ID of the attempt.
+        username: The user submitting the attempt.
+        choices: The position of the option chosen for each question.
+
+    Returns:
+        The question, chosen answer, correct answer and whether it was
+        correct for each question, the score, the quiz's average score as a
+        percentage, and the users who unlocked achievements, or None if the
+        attempt doesn't belong to the user, was already submitted, or is no
+        longer valid as the quiz has changed since it was started.
+    """
+    cur.execute(
+        "SELECT quiz_id, questions FROM QuizAttempt "
+        "WHERE attempt_id=? AND username=? AND submitted IS NULL;",
+        (attempt_id, username),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    quiz_id, order = row[0], json.loads(row[1])
+    if len(choices) != len(order):
+        return None
+    quiz_details = get_quiz(cur, quiz_id)
+    questions = get_questions(cur, quiz_id)
+    if quiz_details is None or any(
+        question_id not in questions for question_id, _ in order
+    ):
+        return None
+    _, author, _ = quiz_details
+
+    feedback = []
+    correct_questions = []
+    for (question_id, permutation), choice in zip(order, choices):
+        question, answers = questions[question_id]
+        correct = permutation[choice] == 0
+        feedback.append([question, answers[permutation[choice]], answers[0], correct])
+        if correct:
+            correct_questions.append((question_id,))
+    score = len(correct_questions)
+
+    cur.execute(
+        "UPDATE QuizAttempt SET answers=?, score=?, submitted=? WHERE attempt_id=?;",
+        (json.dumps(choices), score, datetime.now(), attempt_id),
+    )
+    cur.execute(
+        "UPDATE Quiz SET plays = plays + 1, attempt_count = attempt_count + 1, "
+        "total_score = total_score + ? WHERE quiz_id=?;",
+        (score, quiz_id),
+    )
+    cur.executemany(
+        "UPDATE Question SET correct_count = correct_count + 1 WHERE question_id=?;",
+        correct_questions,
+    )
+    # 1 exp earned for the author of the quiz
+    if author != username:
+        cur.execute(
+            "INSERT OR IGNORE INTO UserLevel (username, experience) VALUES (?, 0);",
+            (author,),
+        )
+        cur.execute(
+            "UPDATE UserLevel SET experience = experience + 1 WHERE username=?;",
+            (author,),
         )
-    return answers, questions, quiz_author, quiz_details, quiz_name
+    unlocked = helper_achievements.update_quiz_achievements(
+        cur, username, author, score, len(order)
+    )
+
+    cur.execute(
+        "SELECT total_score, attempt_count * question_count FROM Quiz "
+        "WHERE quiz_id=?;",
+        (quiz_id,),
+    )
+    total_score, total_questions = cur.fetchone()
+    average = round(100 * total_score / total_questions) if total_questions else 0
+
+    return {
+        "quiz_id": quiz_id,
+        "author": author,
+        "feedback": feedback,
+        "score": score,
+        "average": average,
+        "unlocked": unlocked,
+    }
 
 
 def save_quiz_details() -> Tuple[date, str, str, list, list]:
@@ -122,35 +321,154 @@ def save_quiz_details() -> Tuple[date, str, str, list, list]:
     return date_created, author, quiz_name, questions, answers
 
 
-def generate_answers_from_set(set_id):
+def sample_indices(
+    rng: random.Random, population: int, count: int, exclude: Optional[int] = None
+) -> List[int]:
+    """
+    Picks distinct indices at random without building a list of every index,
+    by shuffling only as much of the range as is needed and remembering the
+    positions which have been swapped.
+
+    Args:
+        rng: The random number generator to use.
+        population: The number of indices to pick from.
+        count: The number of indices to pick.
+        exclude: An index which mustn't be picked.
+
+    Returns:
+        The picked indices, or all of them if there aren't enough.
+    """
+    size = population - 1 if exclude is not None else population
+    swapped = {}
+    picked = []
+    for i in range(min(count, size)):
+        j = rng.randrange(i, size)
+        index = swapped.get(j, j)
+        swapped[j] = swapped.get(i, i)
+        # Skips over the excluded index by shifting the ones after it.
+        if exclude is not None and index >= exclude:
+            index += 1
+        picked.append(index)
+    return picked
+
+
+def get_similarity(answer: str, answer_tokens: set, other: str, other_tokens: set):
+    """
+    Scores how alike two answers look, by how close their lengths are and how
+    many words they share. Similar wrong answers are harder to rule out.
+
+    Returns:
+        The similarity, from 0 to 1.
+    """
+    length_ratio = min(len(answer), len(other)) / max(len(answer), len(other), 1)
+    all_tokens = answer_tokens | other_tokens
+    shared_ratio = (
+        len(answer_tokens & other_tokens) / len(all_tokens) if all_tokens else 0
+    )
+    return (length_ratio + shared_ratio) / 2
+
+
+def generate_distractors(
+    answers: List[str],
+    seed: Optional[int] = None,
+    rank_by_similarity: bool = False,
+    count: int = DISTRACTOR_COUNT,
+) -> List[List[str]]:
+    """
+    Picks wrong answers for each question from the answers to the others.
+    The wrong answers for a question are all different from each other and
+    from its answer, and picking them takes time proportional to the number
+    of wrong answers rather than the number of questions.
+
+    Args:
+        answers: The correct answer to each question.
+        seed: The seed for the random number generator, so that the same
+            wrong answers are picked each time.
+        rank_by_similarity: Whether to prefer wrong answers which look like
+            the correct answer.
+        count: The number of wrong answers to pick for each question.
+
+    Returns:
+        The wrong answers for each question, which are fewer than the count
+        if there aren't enough different answers.
+    """
+    rng = random.Random(seed)
+    # Blank answers wouldn't make sensible options.
+    options = [answer for answer in dict.fromkeys(answers) if answer.strip()]
+    option_indices = {option: i for i, option in enumerate(options)}
+    tokens = {}
+
+    def get_tokens(option: str) -> set:
+        if option not in tokens:
+            tokens[option] = set(TOKEN_PATTERN.findall(option.lower()))
+        return tokens[option]
+
+    distractors = []
+    for answer in answers:
+        exclude = option_indices.get(answer)
+        if not rank_by_similarity:
+            picked = sample_indices(rng, len(options), count, exclude)
+            distractors.append([options[i] for i in picked])
+            continue
+
+        candidates = [
+            options[i]
+            for i in sample_indices(
+                rng, len(options), count * SIMILARITY_CANDIDATES, exclude
+            )
+        ]
+        answer_tokens = get_tokens(answer)
+        candidates.sort(
+            key=lambda option: get_similarity(
+                answer, answer_tokens, option, get_tokens(option)
+            ),
+            reverse=True,
+        )
+        distractors.append(candidates[:count])
+
+    return distractors
+
+
+def generate_answers_from_set(
+    set_id, seed: Optional[int] = None, rank_by_similarity: bool = False
+):
+    """
+    Makes a multiple choice question from each card in a flashcard set, using
+    the answers to the other cards as the wrong answers.
+
+    Args:
+        set_id: The ID of the flashcard set.
+        seed: The seed for picking the wrong answers.
+        rank_by_similarity: Whether to prefer wrong answers which look like
+            the correct answer.
+
+    Returns:
+        Date created, author, set name, questions, and answer options with
+        the correct answer first.
+    """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM QuestionSets WHERE set_id=?;", (set_id,))
+        cur.execute(
+            "SELECT set_id, set_name, date_created, author FROM QuestionSets "
+            "WHERE set_id=?;",
+            (set_id,),
+        )
         set_details = cur.fetchone()
 
-        if set_details:
-            if set_details[4]:
-                questions = set_details[4].split("|")
-            else:
-                questions = []
-            if set_details[5]:
-                answers = set_details[5].split("|")
-            else:
-                answers = []
-        else:
-            questions, answers = [], []
+        cur.execute(
+            "SELECT question, answer FROM Flashcard WHERE set_id=? ORDER BY position;",
+            (set_id,),
+        )
+        cards = cur.fetchall()
+        questions = [question for question, _ in cards]
+        answers = [answer for _, answer in cards]
 
-        mc_answers = [[x] for x in answers]
-        for i, answer in enumerate(mc_answers):
-            for _ in range(3):
-                add = answer[0]
-                count = 0
-                while add in answer and count < len(answers):
-                    add = choice(answers)
-                    count += 1
-                mc_answers[i].append(add)
+    distractors = generate_distractors(answers, seed, rank_by_similarity)
+    mc_answers = [
+        [answer] + wrong_answers for answer, wrong_answers in zip(answers, distractors)
+    ]
 
-        return (set_details[2], set_details[3], set_details[1], questions, mc_answers)
+    return (set_details[2], set_details[3], set_details[1], questions, mc_answers)
 
 
 def validate_quiz(
@@ -235,6 +553,7 @@ def delete_quiz(quiz_id):
             conn.commit()
             cur.execute("DELETE FROM Quiz WHERE quiz_id=?;", (quiz_id,))
             conn.commit()
+            helper_profile_snapshot.invalidate_profile_snapshot(author)
         else:
             session["error"] = ["You cannot delete another user's quiz"]
 
@@ -246,37 +565,9 @@ def get_question_count(cur, quiz_id):
     Args:
         quiz_id: ID of the quiz to count
     """
-    cur.execute("SELECT question FROM Question WHERE quiz_id=?;", (quiz_id,))
-    set_details = cur.fetchall()
-
-    if set_details[0] is None:
+    cur.execute("SELECT question_count FROM Quiz WHERE quiz_id=?;", (quiz_id,))
+    quiz_details = cur.fetchone()
+    if quiz_details is None:
         return 0
 
-    return len(set_details)
-
-
-def get_user_quizzes(username: str) -> list:
-    """
-    Get the quizzes of a given user
-
-    Args:
-        username: username to get quizzes from
-
-    Returns:
-        list of quizzes belonging to the user
-    """
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT quiz_id, date_created, author, quiz_name, plays "
-            "FROM Quiz WHERE author=?;",
-            (username,),
-        )
-        row = cur.fetchall()
-        quiz_posts = sorted(row, key=lambda x: x[4], reverse=True)
-        quiz_posts = [list(x) for x in quiz_posts]
-
-        for i, quiz in enumerate(quiz_posts):
-            quiz_posts[i].append(get_question_count(cur, quiz[0]))
-
-    return quiz_posts
+    return quiz_details[0]
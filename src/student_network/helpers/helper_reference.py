@@ -0,0 +1,142 @@
+"""
+Holds the reference tables which only change when the site is deployed, such
+as achievements and degrees, in memory so that they don't need to be read from
+the database on every page.
+"""
+
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+
+class Achievement(NamedTuple):
+    """
+    An achievement which users can unlock. The fields are in the order that
+    templates expect achievements in.
+    """
+
+    description: str
+    icon: str
+    rarity: str
+    xp_value: int
+    name: str
+    achievement_id: int
+
+
+class ReferenceData(NamedTuple):
+    """
+    A read-only copy of the reference tables. A new copy is made each time
+    they're reloaded, so a copy never changes once it has been handed out.
+    """
+
+    version: int
+    loaded_at: float
+    achievements: Mapping[int, Achievement]
+    degrees: Mapping[int, str]
+
+
+# The number of seconds a copy is used for before the tables are read again.
+# Reloading only affects the worker process which handles the request, so this
+# is how long other workers can take to pick up changes.
+MAX_AGE = 10 * 60
+
+_reference_data = None
+_version = 0
+_lock = threading.RLock()
+
+
+def load_reference_data(cur, version: int) -> ReferenceData:
+    """
+    Reads the reference tables from the database.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        version: The version number to stamp the copy with.
+
+    Returns:
+        The reference tables.
+    """
+    cur.execute(
+        "SELECT achievement_ID, description, icon, rarity, xp_value, "
+        "achievement_name FROM Achievements;"
+    )
+    achievements = {
+        achievement_id: Achievement(
+            description, icon, rarity, xp_value, name, achievement_id
+        )
+        for achievement_id, description, icon, rarity, xp_value, name in cur
+    }
+
+    cur.execute("SELECT degreeId, degree FROM Degree ORDER BY degreeId;")
+    degrees = dict(cur.fetchall())
+
+    return ReferenceData(
+        version, time.time(), MappingProxyType(achievements), MappingProxyType(degrees)
+    )
+
+
+def reload_reference_data() -> ReferenceData:
+    """
+    Reads the reference tables again, such as after a deployment has changed
+    them, and swaps them in for every request handled afterwards by this
+    worker process. Other workers read them again once their copy is older
+    than MAX_AGE.
+
+    Returns:
+        The new copy of the reference tables.
+    """
+    global _reference_data, _version
+    with _lock:
+        with sqlite3.connect("db.sqlite3") as conn:
+            reference_data = load_reference_data(conn.cursor(), _version + 1)
+        _version = reference_data.version
+        _reference_data = reference_data
+
+    return reference_data
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Gets the current copy of the reference tables, reading them if they
+    haven't been read yet or the copy is older than MAX_AGE.
+
+    Returns:
+        The reference tables.
+    """
+    reference_data = _reference_data
+    if reference_data is None or time.time() - reference_data.loaded_at > MAX_AGE:
+        with _lock:
+            # Another thread may have read them while this one was waiting.
+            reference_data = _reference_data
+            if (
+                reference_data is None
+                or time.time() - reference_data.loaded_at > MAX_AGE
+            ):
+                reference_data = reload_reference_data()
+
+    return reference_data
+
+
+def get_achievements() -> Mapping[int, Achievement]:
+    """
+    Gets every achievement which can be unlocked.
+
+    Returns:
+        Each achievement by its ID.
+    """
+    return get_reference_data().achievements
+
+
+def get_degree_name(degree_id: int) -> Optional[str]:
+    """
+    Gets the name of a degree.
+
+    Args:
+        degree_id: The ID of the degree.
+
+    Returns:
+        The name of the degree, or None if it doesn't exist.
+    """
+    return get_reference_data().degrees.get(degree_id)
@@ -0,0 +1,246 @@
+"""
+Limits how often logins can be attempted for each username and from each
+client address, so that credential stuffing is turned away before any
+passwords are hashed.
+"""
+
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from typing import Tuple, Union
+
+import student_network.helpers.helper_cache as helper_cache
+
+# Whether the limits are stored in the database, so that they're shared
+# between every worker process rather than kept by each one.
+PERSIST_THROTTLE = os.environ.get("LOGIN_THROTTLE_PERSIST") == "1"
+# Each username can be tried 5 times at once, and then once a minute.
+USERNAME_ATTEMPTS = 5
+USERNAME_WINDOW = 5 * 60
+# Each client address can try 20 times at once, and then every 15 seconds.
+ADDRESS_ATTEMPTS = 20
+ADDRESS_WINDOW = 5 * 60
+# The number of limits held in memory before full ones are discarded.
+MAX_BUCKETS = 100_000
+# The number of attempts between discarding full limits from the database.
+PRUNE_INTERVAL = 1000
+
+# Remembers recently failed logins, so that retrying the same wrong password
+# fails without hashing it again. Entries are keyed by an HMAC using a key
+# which only exists in memory, so the passwords can't be recovered from them.
+failed_login_cache = helper_cache.LRUCache("failed_logins", max_size=10000, ttl=300)
+_failed_login_key = os.urandom(32)
+
+
+class TokenBucketLimiter:
+    """
+    Limits attempts using a token bucket for each key. Each attempt takes a
+    token, and tokens are refilled evenly over the window, so a full bucket
+    allows a burst of attempts followed by a steady rate.
+    """
+
+    def __init__(self, name: str, attempts: int, window: float, persist: bool):
+        """
+        Args:
+            name: The name of the limiter, which prefixes its stored keys.
+            attempts: The number of attempts allowed in a burst.
+            window: The number of seconds for a whole bucket to refill.
+            persist: Whether to store the buckets in the database.
+        """
+        self.name = name
+        self.attempts = attempts
+        self.window = window
+        self.refill_rate = attempts / window
+        self.persist = persist
+        self._buckets = {}
+        self._updates = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        """
+        Gets the number of tokens in a bucket after refilling it.
+        """
+        return min(self.attempts, tokens + (now - updated) * self.refill_rate)
+
+    def _update(self, key: str, change: float) -> Tuple[bool, float]:
+        """
+        Adds tokens to or takes tokens from a bucket, unless it would be left
+        with fewer than none.
+
+        Returns:
+            Whether the tokens were taken, and the number of tokens left.
+        """
+        now = time.time()
+        if self.persist:
+            with sqlite3.connect("db.sqlite3") as conn:
+                cur = conn.cursor()
+                # Stops other processes changing the bucket at the same time.
+                cur.execute("BEGIN IMMEDIATE;")
+                cur.execute(
+                    "SELECT tokens, updated FROM LoginThrottle WHERE key=?;",
+                    ("{}:{}".format(self.name, key),),
+                )
+                row = cur.fetchone()
+                tokens = self._refill(*row, now) if row else self.attempts
+                allowed = tokens + change >= 0
+                if allowed:
+                    tokens = min(self.attempts, tokens + change)
+                cur.execute(
+                    "INSERT OR REPLACE INTO LoginThrottle (key, tokens, updated) "
+                    "VALUES (?, ?, ?);",
+                    ("{}:{}".format(self.name, key), tokens, now),
+                )
+                with self._lock:
+                    self._updates += 1
+                    prune = self._updates % PRUNE_INTERVAL == 0
+                if prune:
+                    # Buckets which haven't been used for a whole window have
+                    # refilled, so they're the same as new ones.
+                    cur.execute(
+                        "DELETE FROM LoginThrottle WHERE key LIKE ? AND updated < ?;",
+                        (self.name + ":%", now - self.window),
+                    )
+                conn.commit()
+            return allowed, tokens
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = self._refill(*bucket, now) if bucket else self.attempts
+            allowed = tokens + change >= 0
+            if allowed:
+                tokens = min(self.attempts, tokens + change)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MAX_BUCKETS:
+                self._discard_full_buckets(now)
+        return allowed, tokens
+
+    def _discard_full_buckets(self, now: float):
+        """
+        Forgets buckets which have refilled, as they're the same as new ones.
+        Must be called while holding the lock.
+        """
+        for key, bucket in list(self._buckets.items()):
+            if self._refill(*bucket, now) >= self.attempts:
+                del self._buckets[key]
+
+    def try_attempt(self, key: str) -> Tuple[bool, int]:
+        """
+        Takes a token for an attempt, if there are any left.
+
+        Args:
+            key: The key to limit attempts by.
+
+        Returns:
+            Whether the attempt is allowed, and if not, the number of seconds
+            until it would be.
+        """
+        allowed, tokens = self._update(key, -1)
+        if allowed:
+            return True, 0
+        return False, int((1 - tokens) / self.refill_rate) + 1
+
+    def refund(self, key: str):
+        """
+        Gives back the token taken for an attempt, such as after a successful
+        login.
+
+        Args:
+            key: The key that the attempt was limited by.
+        """
+        self._update(key, 1)
+
+
+username_limiter = TokenBucketLimiter(
+    "username", USERNAME_ATTEMPTS, USERNAME_WINDOW, PERSIST_THROTTLE
+)
+address_limiter = TokenBucketLimiter(
+    "address", ADDRESS_ATTEMPTS, ADDRESS_WINDOW, PERSIST_THROTTLE
+)
+
+
+def try_login_attempt(username: str, address: str) -> Tuple[bool, int]:
+    """
+    Takes an attempt from the limits for both the username and the client
+    address, before any password is checked.
+
+    Args:
+        username: The username being logged in to.
+        address: The address of the client.
+
+    Returns:
+        Whether the attempt is allowed, and if not, the number of seconds
+        until it would be.
+    """
+    allowed, retry_after = address_limiter.try_attempt(address)
+    if not allowed:
+        return False, retry_after
+    allowed, retry_after = username_limiter.try_attempt(username)
+    if not allowed:
+        # The attempt isn't made, so it doesn't count against the address.
+        address_limiter.refund(address)
+        return False, retry_after
+    return True, 0
+
+
+def refund_login_attempt(username: str, address: str):
+    """
+    Gives back the attempts taken for a login which succeeded.
+
+    Args:
+        username: The username which was logged in to.
+        address: The address of the client.
+    """
+    username_limiter.refund(username)
+    address_limiter.refund(address)
+
+
+def _get_failed_login_key(
+    username: str, password: str, hashed_password: Union[str, bytes]
+) -> str:
+    """
+    Gets the key which a failed login is remembered by. The stored hash is
+    included so that changing the password forgets previous failures.
+    """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode("utf-8")
+    message = b"\0".join(
+        (username.encode("utf-8"), password.encode("utf-8"), hashed_password)
+    )
+    return hmac.new(_failed_login_key, message, hashlib.sha256).hexdigest()
+
+
+def has_recently_failed(
+    username: str, password: str, hashed_password: Union[str, bytes]
+) -> bool:
+    """
+    Checks whether the same password was recently tried and found to be wrong.
+
+    Args:
+        username: The username being logged in to.
+        password: The password input by the user.
+        hashed_password: The hash stored for the user.
+
+    Returns:
+        Whether the login is already known to fail.
+    """
+    key = _get_failed_login_key(username, password, hashed_password)
+    return failed_login_cache.get(key, False)
+
+
+def record_failed_login(
+    username: str, password: str, hashed_password: Union[str, bytes]
+):
+    """
+    Remembers that a password was wrong, so that retrying it fails quickly.
+
+    Args:
+        username: The username being logged in to.
+        password: The password input by the user.
+        hashed_password: The hash stored for the user.
+    """
+    failed_login_cache.set(
+        _get_failed_login_key(username, password, hashed_password), True
+    )
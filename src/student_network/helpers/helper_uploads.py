@@ -0,0 +1,232 @@
+"""
+Processes images attached to posts in a pool of worker processes, so that
+decoding and resizing large images doesn't hold up other requests.
+"""
+
+import io
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_image_store as helper_image_store
+import student_network.helpers.helper_images as helper_images
+from PIL import Image
+
+# The number of worker processes which resize images.
+MAX_WORKERS = 2
+# The number of images which can be waiting or being processed at once, after
+# which uploads are rejected until the queue has cleared.
+MAX_QUEUED_JOBS = 16
+# The largest image which will be processed, in pixels.
+MAX_PIXELS = 25_000_000
+# The number of finished images whose status is remembered.
+MAX_FINISHED_JOBS = 1024
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+# The status of each image which has been queued, by the ID of its upload.
+_jobs = {}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Gets the pool of worker processes, starting it if it isn't running yet.
+
+    Returns:
+        The pool of worker processes.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _executor
+
+
+def _process_post_image(data: bytes) -> str:
+    """
+    Saves an image in each size it's served in. This runs in a worker process.
+
+    Args:
+        data: The contents of the uploaded file.
+
+    Returns:
+        The name the image was saved under.
+    """
+    return helper_images.process_post_image(io.BytesIO(data))
+
+
+def _finish_job(upload_id: str, upload_hash: str, future):
+    """
+    Records the outcome of processing an image once the worker has finished.
+
+    Args:
+        upload_id: The ID the upload was given when it was queued.
+        upload_hash: The hash of the uploaded file.
+        future: The future for the worker's result.
+    """
+    global _pending
+    name = None
+    try:
+        if future.exception() is None:
+            saved_name = future.result()
+            # Remembers the file, so that uploading it again skips processing.
+            with sqlite3.connect("db.sqlite3") as conn:
+                cur = conn.cursor()
+                helper_image_store.record_upload(
+                    cur, "post_imgs", upload_hash, saved_name
+                )
+                conn.commit()
+            name = saved_name
+    except sqlite3.Error:
+        # The image is reported as failed, and is left for garbage collection.
+        pass
+    finally:
+        # Always frees up the place in the queue, even if recording failed.
+        with _lock:
+            _pending -= 1
+            # Cancelled images may already have been forgotten. They're left
+            # for garbage collection, as an identical image may be used
+            # elsewhere.
+            job = _jobs.get(upload_id)
+            if job is not None and name is None:
+                job["status"] = "failed"
+            elif job is not None and job["status"] != "cancelled":
+                job["status"] = "done"
+                job["name"] = name
+
+
+def _forget_finished_jobs():
+    """
+    Forgets the status of the oldest finished images, so that the record of
+    jobs doesn't grow forever. Must be called while holding the lock.
+    """
+    finished = [
+        upload_id for upload_id, job in _jobs.items() if job["status"] != "processing"
+    ]
+    for upload_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[upload_id]
+
+
+def validate_upload(file, data: bytes) -> Tuple[bool, str]:
+    """
+    Checks that an uploaded file is an image which isn't too large to process,
+    by reading only its header.
+
+    Args:
+        file: The file uploaded by the user.
+        data: The contents of the uploaded file.
+
+    Returns:
+        Whether the file can be processed, and the error message if not.
+    """
+    if not helper_general.is_allowed_photo_file(file.filename):
+        return False, "Your file must be an image."
+    try:
+        width, height = Image.open(io.BytesIO(data)).size
+    except (OSError, Image.DecompressionBombError):
+        return False, "Your file must be an image."
+    if width * height > MAX_PIXELS:
+        return False, "Your image must not exceed {} megapixels.".format(
+            MAX_PIXELS // 1_000_000
+        )
+
+    return True, ""
+
+
+def queue_post_image(file) -> Tuple[Optional[str], str, bool]:
+    """
+    Queues an image attached to a post to be processed by a worker, returning
+    an ID for the upload straight away. Files which have been uploaded before
+    aren't processed again, and their image name is returned instead.
+
+    Args:
+        file: The file uploaded by the user.
+
+    Returns:
+        The ID of the upload, any error message, and whether the queue was
+        full.
+    """
+    data = file.read()
+    valid, message = validate_upload(file, data)
+    if not valid:
+        return None, message, False
+
+    upload_hash = helper_image_store.hash_upload(data)
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        name = helper_image_store.find_upload(cur, "post_imgs", upload_hash)
+        if name is not None:
+            helper_image_store.record_upload(cur, "post_imgs", upload_hash, name)
+            conn.commit()
+            return name, "", False
+
+    global _pending, _executor
+    upload_id = str(uuid.uuid4())
+    with _lock:
+        if _pending >= MAX_QUEUED_JOBS:
+            return None, "Too many images are being uploaded, try again soon.", True
+        _pending += 1
+        _jobs[upload_id] = {"status": "processing", "name": None}
+        _forget_finished_jobs()
+
+    try:
+        future = _get_executor().submit(_process_post_image, data)
+    except (BrokenProcessPool, RuntimeError):
+        # A worker has died, such as from running out of memory, so the pool
+        # can't be used again and a new one is started for the next upload.
+        with _lock:
+            _pending -= 1
+            del _jobs[upload_id]
+            _executor = None
+        return None, "Too many images are being uploaded, try again soon.", True
+    future.add_done_callback(lambda done: _finish_job(upload_id, upload_hash, done))
+    return upload_id, "", False
+
+
+def get_status(upload_id: str) -> dict:
+    """
+    Gets the status of an image which was queued for processing.
+
+    Args:
+        upload_id: The ID of the upload, or the name of the image if it had
+            already been saved.
+
+    Returns:
+        Whether the image is "processing", "done", "failed", or "cancelled",
+        and the name it was saved under once it's done.
+    """
+    with _lock:
+        job = _jobs.get(upload_id)
+        if job is not None:
+            return dict(job)
+
+    # Images which had already been saved are done straight away.
+    if helper_images.is_content_hash(upload_id) and helper_images.image_exists(
+        "post_imgs", upload_id
+    ):
+        return {"status": "done", "name": upload_id}
+    return {"status": "failed", "name": None}
+
+
+def cancel(upload_id: str) -> bool:
+    """
+    Cancels processing an image, if it's still being processed.
+
+    Args:
+        upload_id: The ID of the upload.
+
+    Returns:
+        Whether the image was still being processed.
+    """
+    with _lock:
+        job = _jobs.get(upload_id)
+        if job is not None and job["status"] == "processing":
+            job["status"] = "cancelled"
+            return True
+
+    return False
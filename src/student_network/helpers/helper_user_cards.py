@@ -0,0 +1,132 @@
+"""
+Provides the details shown alongside a user wherever they appear on the site,
+such as in comments, search results, chat rooms and the leaderboard.
+"""
+
+import sqlite3
+from typing import NamedTuple, Optional
+
+import student_network.helpers.helper_cache as helper_cache
+import student_network.helpers.helper_events as helper_events
+import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
+import student_network.helpers.helper_reference as helper_reference
+
+# SQLite limits the number of placeholders which can be used in a query.
+BATCH_SIZE = 500
+# The columns of UserProfile which are shown on a user's card.
+CARD_COLUMNS = frozenset({"name", "profilepicture", "degree"})
+
+user_card_cache = helper_cache.LRUCache("user_cards", max_size=4096, ttl=300)
+
+
+class UserCard(NamedTuple):
+    """
+    The details shown alongside a user.
+    """
+
+    avatar: str
+    name: str
+    degree: str
+    account_type: str
+    level: int
+
+
+def get_user_cards(usernames) -> dict:
+    """
+    Gets the cards for a batch of users, only querying the database for the
+    users who aren't already cached.
+
+    Args:
+        usernames: The usernames of the users to get the cards of.
+
+    Returns:
+        A dictionary of each username which exists to its user card.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    cards = user_card_cache.get_many(usernames)
+    missing = [username for username in usernames if username not in cards]
+    if missing:
+        loaded = {}
+        with sqlite3.connect("db.sqlite3") as conn:
+            cur = conn.cursor()
+            for i in range(0, len(missing), BATCH_SIZE):
+                batch = missing[i : i + BATCH_SIZE]
+                cur.execute(
+                    "SELECT ACCOUNTS.username, UserProfile.profilepicture, "
+                    "UserProfile.name, UserProfile.degree, ACCOUNTS.type, "
+                    "IFNULL(UserLevel.experience, 0) FROM ACCOUNTS "
+                    "LEFT JOIN UserProfile "
+                    "ON UserProfile.username = ACCOUNTS.username "
+                    "LEFT JOIN UserLevel ON UserLevel.username = ACCOUNTS.username "
+                    "WHERE ACCOUNTS.username IN ({});".format(
+                        ", ".join("?" * len(batch))
+                    ),
+                    batch,
+                )
+                for username, avatar, name, degree_id, account_type, exp in cur:
+                    loaded[username] = UserCard(
+                        avatar,
+                        name,
+                        helper_reference.get_degree_name(degree_id),
+                        account_type,
+                        helper_profile.calculate_level(int(exp))[0],
+                    )
+        user_card_cache.set_many(loaded)
+        cards.update(loaded)
+
+    return cards
+
+
+def get_user_card(username: str) -> Optional[UserCard]:
+    """
+    Gets the card for a single user.
+
+    Args:
+        username: The username of the user to get the card of.
+
+    Returns:
+        The user card, or None if the user doesn't exist.
+    """
+    return get_user_cards([username]).get(username)
+
+
+def get_avatar(cards: dict, username: str) -> Optional[str]:
+    """
+    Gets the profile picture of a user from a batch of user cards.
+
+    Args:
+        cards: The user cards returned by get_user_cards.
+        username: The username of the user.
+
+    Returns:
+        The profile picture of the user, or None if they don't exist.
+    """
+    card = cards.get(username)
+    if card:
+        return card.avatar
+
+
+def invalidate_user_card(username: str):
+    """
+    Removes a user's card and profile snapshots from the cache after their
+    details have changed.
+
+    Args:
+        username: The username of the user whose details changed.
+    """
+    user_card_cache.invalidate(username)
+    # Everything on the card is also shown in the header of their profile.
+    helper_profile_snapshot.invalidate_profile_snapshot(username)
+
+
+def _on_profile_changed(change):
+    """
+    Forgets a user's card once their profile has been edited, if anything on
+    the card changed.
+    """
+    if change.fields & CARD_COLUMNS:
+        user_card_cache.invalidate(change.username)
+
+
+helper_events.subscribe(helper_events.PROFILE_CHANGED, _on_profile_changed)
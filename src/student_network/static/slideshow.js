@@ -9,13 +9,22 @@ class Slideshow {
     var html = `<div class="slideshow-container fade-left">`;
 
     for (var i = 0; i < images.length; i++) {
+      // Images are either a URL, or the URLs of their feed size as JPEG and
+      // WebP along with their full size, which is only loaded when opened.
+      var image = images[i];
+      if (typeof image === "string") {
+        image = { src: image, full: image };
+      }
+      var webpSource = image.webp
+        ? `<source srcset="${image.webp}" type="image/webp">`
+        : "";
       html += `<div class="slide-img fade fade-right">
                             <div class="numbertext">${i + 1} / ${
         images.length
       }</div>
-                            <img onclick="OpenModal('${images[i]}');" src="${
-        images[i]
-      }" style="width:100%">
+                            <picture>${webpSource}<img onclick="OpenModal('${
+        image.full
+      }');" src="${image.src}" loading="lazy" style="width:100%"></picture>
                             <div class="caption-text">${captions[i]}</div>
                         </div>`;
     }
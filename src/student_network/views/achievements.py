@@ -7,7 +7,9 @@ import sqlite3
 import student_network.helpers.helper_achievements as helper_achievements
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_images as helper_images
 import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import Blueprint, render_template, request, session
 
 achievements_blueprint = Blueprint(
@@ -78,14 +80,18 @@ def leaderboard() -> object:
             )
 
             top_users = top_users[0 : min(25, len(top_users))]
+            # Gets the details of each user on the leaderboard in one batch.
+            cards = helper_user_cards.get_user_cards([x[0] for x in top_users])
             top_users = list(
                 map(
                     lambda x: (
                         x[0],
                         x[1],
-                        helper_profile.get_profile_picture(x[0]),
-                        helper_profile.get_level(x[0]),
-                        helper_profile.get_degree(x[0])[1],
+                        helper_images.get_variant_url(
+                            helper_user_cards.get_avatar(cards, x[0])
+                        ),
+                        helper_profile.calculate_level(x[1]),
+                        cards[x[0]].degree if x[0] in cards else None,
                     ),
                     top_users,
                 )
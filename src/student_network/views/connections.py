@@ -3,12 +3,12 @@ Handles the view for user connections and related functionality.
 """
 
 import sqlite3
-from datetime import date
 
 import student_network.helpers.helper_achievements as helper_achievements
 import student_network.helpers.helper_connections as helper_connections
+import student_network.helpers.helper_events as helper_events
 import student_network.helpers.helper_general as helper_general
-import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import Blueprint, redirect, render_template, request, session
 
 connections_blueprint = Blueprint(
@@ -19,38 +19,23 @@ connections_blueprint = Blueprint(
 @connections_blueprint.route("/close_connection/<username>", methods=["GET", "POST"])
 def close_connection(username: str) -> object:
     """
-    Sends a connect request to another user on the network.
+    Adds a connection as a close friend.
 
     Args:
-        username: The username of the person to request a connection with.
+        username: The username of the connection to add as a close friend.
 
     Returns:
-        Redirection to the profile of the user they want to connect with.
+        Redirection to the profile of the close friend.
     """
     if session["username"] != username:
         with sqlite3.connect("db.sqlite3") as conn:
             cur = conn.cursor()
-            cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-            if cur.fetchone():
-                conn_type = helper_connections.get_connection_type(username)
-                if conn_type == "connected":
-                    cur.execute(
-                        "SELECT * FROM CloseFriend WHERE (user1=? AND user2=?);",
-                        (session["username"], username),
-                    )
-                    if cur.fetchone() is None:
-                        # Gets user from database using username.
-                        cur.execute(
-                            "INSERT INTO CloseFriend (user1, user2) VALUES (?,?);",
-                            (
-                                session["username"],
-                                username,
-                            ),
-                        )
-                        conn.commit()
-                        session["add"] = True
-
-                        helper_achievements.update_close_connection_achievements(cur)
+            if helper_connections.add_close_friend(cur, session["username"], username):
+                conn.commit()
+                session["add"] = True
+
+                helper_achievements.update_close_connection_achievements(cur)
+    else:
         session["add"] = "You can't connect with yourself!"
 
     return redirect("/profile/" + username)
@@ -70,42 +55,19 @@ def connect_request(username: str) -> object:
     if session["username"] != username:
         with sqlite3.connect("db.sqlite3") as conn:
             cur = conn.cursor()
-            cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-            if cur.fetchone():
-                cur.execute(
-                    "SELECT * FROM Connection WHERE (user1=? AND user2=?) OR "
-                    "(user1=? AND user2=?);",
-                    (username, session["username"], session["username"], username),
+            if helper_connections.request_connection(
+                cur, session["username"], username
+            ):
+                session["add"] = True
+
+                # Award achievement ID 17 - Getting social if necessary
+                unlocked = helper_achievements.award_achievement(
+                    cur, session["username"], 17
                 )
-                if cur.fetchone() is None:
-                    # Gets user from database using username.
-                    cur.execute(
-                        "INSERT INTO Connection (user1, user2, "
-                        "connection_type) VALUES (?,?,?);",
-                        (
-                            session["username"],
-                            username,
-                            "request",
-                        ),
-                    )
-                    conn.commit()
-                    session["add"] = True
-
-                    # Award achievement ID 17 - Getting social if necessary
-                    cur.execute(
-                        "SELECT * FROM CompleteAchievements "
-                        "WHERE (username=? AND achievement_ID=?);",
-                        (session["username"], 17),
-                    )
-                    if cur.fetchone() is None:
-                        cur.execute(
-                            "INSERT INTO CompleteAchievements "
-                            "(username, achievement_ID, date_completed) "
-                            "VALUES (?,?,?);",
-                            (session["username"], 17, date.today()),
-                        )
-                        conn.commit()
-
+                conn.commit()
+                if unlocked:
+                    helper_achievements.announce_achievement(session["username"])
+    else:
         session["add"] = "You can't connect with yourself!"
 
     return redirect(session["prev-page"])
@@ -124,15 +86,8 @@ def unblock_user(username: str) -> object:
     """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-        if cur.fetchone():
-            if helper_connections.get_connection_type(username) == "block":
-                if username != session["username"]:
-                    cur.execute(
-                        "DELETE FROM Connection WHERE (user1=? AND user2=?);",
-                        (session["username"], username),
-                    )
-                    conn.commit()
+        helper_connections.unblock_connection(cur, session["username"], username)
+        conn.commit()
     return redirect(session["prev-page"])
 
 
@@ -168,31 +123,14 @@ def accept_connection_request(username: str) -> object:
     if session["username"] != username:
         with sqlite3.connect("db.sqlite3") as conn:
             cur = conn.cursor()
-            cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-            if cur.fetchone():
-                row = cur.execute(
-                    "SELECT * FROM Connection WHERE (user1=? AND user2=?) OR "
-                    "(user1=? AND user2=?);",
-                    (username, session["username"], session["username"], username),
+            if helper_connections.accept_connection(cur, session["username"], username):
+                conn.commit()
+                session["add"] = True
+                helper_events.publish(
+                    helper_events.CONNECTION_CHANGED, (session["username"], username)
                 )
-                if row:
-                    # Gets user from database using username.
-                    cur.execute(
-                        "UPDATE Connection SET connection_type = ? "
-                        "WHERE (user1=? AND user2=?) OR (user1=? AND "
-                        "user2=?);",
-                        (
-                            "connected",
-                            username,
-                            session["username"],
-                            session["username"],
-                            username,
-                        ),
-                    )
-                    conn.commit()
-                    session["add"] = True
-
-                    helper_achievements.update_connection_achievements(cur, username)
+
+                helper_achievements.update_connection_achievements(cur, username)
     else:
         session["add"] = "You can't connect with yourself!"
 
@@ -210,54 +148,35 @@ def block_user(username: str) -> object:
     Returns:
         Redirection to the profile page of the user who has been blocked.
     """
-    deleted = helper_connections.delete_connection(username)
-    if deleted:
-        if username != session["username"]:
-            with sqlite3.connect("db.sqlite3") as conn:
-                cur = conn.cursor()
-                # Gets user from database using username.
-                cur.execute(
-                    "INSERT INTO Connection (user1, user2, "
-                    "connection_type) VALUES (?,?,?);",
-                    (
-                        session["username"],
-                        username,
-                        "block",
-                    ),
-                )
-                conn.commit()
+    if username != session["username"]:
+        with sqlite3.connect("db.sqlite3") as conn:
+            cur = conn.cursor()
+            blocked = helper_connections.block_connection(
+                cur, session["username"], username
+            )
+            conn.commit()
+        if blocked:
+            helper_events.publish(
+                helper_events.CONNECTION_CHANGED, (session["username"], username)
+            )
     return redirect("/profile/" + username)
 
 
 @connections_blueprint.route("/remove_close_friend/<username>")
 def remove_close_friend(username: str) -> object:
     """
-    Removes a connection with the given user.
+    Removes the given user from the user's close friends.
 
     Args:
-        username: The user they want to remove the connection with.
+        username: The close friend to remove.
 
     Returns:
         Redirection to the previous page the user was on.
     """
-    # Checks that the user isn't trying to remove a connection with
-    # themselves.
-    if username != session["username"]:
-        with sqlite3.connect("db.sqlite3") as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM Accounts WHERE username=?;", (username,))
-            # Searches for the connection in the database.
-        if helper_connections.get_connection_type(username) == "connected":
-            cur.execute(
-                "SELECT * FROM CloseFriend WHERE (user1=? AND user2=?);",
-                (session["username"], username),
-            )
-            if cur.fetchone():
-                cur.execute(
-                    "DELETE FROM CloseFriend WHERE (user1=? AND user2=?);",
-                    (session["username"], username),
-                )
-                conn.commit()
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        helper_connections.remove_close_friend(cur, session["username"], username)
+        conn.commit()
 
     return redirect(session["prev-page"])
 
@@ -273,7 +192,10 @@ def remove_connection(username: str) -> object:
     Returns:
         Redirection to the previous page the user was on.
     """
-    helper_connections.delete_connection(username)
+    if helper_connections.delete_connection(username):
+        helper_events.publish(
+            helper_events.CONNECTION_CHANGED, (session["username"], username)
+        )
     return redirect(session["prev-page"])
 
 
@@ -343,20 +265,22 @@ def show_connect_requests() -> object:
         recommended_connections = helper_connections.get_recommended_connections(
             session["username"]
         )
+        cards = helper_user_cards.get_user_cards(
+            [mutual[0] for mutual in recommended_connections]
+        )
         mutual_avatars = []
         for mutual in recommended_connections:
-            mutual_avatars.append(helper_profile.get_profile_picture(mutual[0]))
+            mutual_avatars.append(helper_user_cards.get_avatar(cards, mutual[0]))
 
         # Lists usernames of all connected people.
         connections = connections1 + connections2
         # Adds a close friend to the list, and sorts by close friends first.
+        relationships = helper_connections.get_relationships(
+            cur, session["username"], [x[0] for x in connections]
+        )
         connections = list(
             map(
-                lambda x: (
-                    x[0],
-                    x[1],
-                    helper_connections.is_close_friend(session["username"], x[0]),
-                ),
+                lambda x: (x[0], x[1], relationships[x[0]].close_friend),
                 connections,
             )
         )
@@ -4,9 +4,11 @@ Handles the view for flashcards and related functionality.
 import sqlite3
 
 import student_network.helpers.helper_achievements as helper_achievements
+import student_network.helpers.helper_catalogue as helper_catalogue
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
 import student_network.helpers.helper_flashcards as helper_flashcards
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
 from flask import Blueprint, json, redirect, render_template, request, session, jsonify
 
 
@@ -25,15 +27,9 @@ def flashcards() -> object:
     """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute(
-            "SELECT set_id, date_created, author, set_name, cards_played FROM QuestionSets"
+        set_posts, next_page = helper_catalogue.get_sets(
+            cur, after=request.args.get("after")
         )
-        row = cur.fetchall()
-        set_posts = list(sorted(row, key=lambda x: x[4], reverse=True))
-        set_posts = [list(x) for x in set_posts]
-
-        for i, card_set in enumerate(set_posts):
-            set_posts[i].append(helper_flashcards.get_question_count(cur, card_set[0]))
 
     # Displays any error messages.
     if "error" in session:
@@ -43,6 +39,7 @@ def flashcards() -> object:
             "flashcards_view.html",
             requestCount=helper_connections.get_connection_request_count(),
             sets=set_posts,
+            next_page=next_page,
             errors=errors,
             personal=False,
             username=session["username"],
@@ -53,6 +50,7 @@ def flashcards() -> object:
             "flashcards_view.html",
             requestCount=helper_connections.get_connection_request_count(),
             sets=set_posts,
+            next_page=next_page,
             personal=False,
             username=session["username"],
             notifications=helper_general.get_notifications(),
@@ -70,7 +68,11 @@ def flashcards_user(username: str) -> object:
     Returns:
         The web page of flashcards created by this user.
     """
-    set_posts = helper_flashcards.get_user_cards(username)
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        set_posts, next_page = helper_catalogue.get_sets(
+            cur, username, after=request.args.get("after")
+        )
 
     # Displays any error messages.
     if "error" in session:
@@ -80,6 +82,7 @@ def flashcards_user(username: str) -> object:
             "flashcards_view.html",
             requestCount=helper_connections.get_connection_request_count(),
             sets=set_posts,
+            next_page=next_page,
             errors=errors,
             personal=True,
             username=session["username"],
@@ -90,6 +93,7 @@ def flashcards_user(username: str) -> object:
             "flashcards_view.html",
             requestCount=helper_connections.get_connection_request_count(),
             sets=set_posts,
+            next_page=next_page,
             personal=True,
             username=session["username"],
             notifications=helper_general.get_notifications(),
@@ -111,8 +115,7 @@ def flashcards_edit(set_id: int) -> object:
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
 
-        cur.execute("SELECT author FROM QuestionSets WHERE set_id=?;", (set_id,))
-        author = cur.fetchone()[0]
+        author = helper_flashcards.get_set_author(cur, set_id)
         if author != session["username"]:
             return redirect("/flashcards/set/" + str(set_id))
 
@@ -125,7 +128,7 @@ def flashcards_edit(set_id: int) -> object:
         return render_template(
             "flashcards_edit.html",
             requestCount=helper_connections.get_connection_request_count(),
-            questions=card_set[3],
+            cards=card_set[3],
             set_name=card_set[0],
             set_id=set_id,
             errors=errors,
@@ -137,7 +140,7 @@ def flashcards_edit(set_id: int) -> object:
         return render_template(
             "flashcards_edit.html",
             requestCount=helper_connections.get_connection_request_count(),
-            questions=card_set[3],
+            cards=card_set[3],
             set_name=card_set[0],
             set_id=set_id,
             set_author=card_set[2],
@@ -169,7 +172,7 @@ def flashcard_set(set_id: int) -> object:
         return render_template(
             "flashcards_set.html",
             requestCount=helper_connections.get_connection_request_count(),
-            questions=card_set[3],
+            cards=card_set[3],
             set_name=card_set[0],
             set_id=set_id,
             errors=errors,
@@ -181,7 +184,7 @@ def flashcard_set(set_id: int) -> object:
         return render_template(
             "flashcards_set.html",
             requestCount=helper_connections.get_connection_request_count(),
-            questions=card_set[3],
+            cards=card_set[3],
             set_name=card_set[0],
             set_id=set_id,
             set_author=card_set[2],
@@ -242,21 +245,22 @@ def flashcards_delete(set_id) -> object:
 
 
 @flashcards_blueprint.route(
-    "/flashcards/delete/<set_id>/<index>", methods=["GET", "POST"]
+    "/flashcards/delete/<set_id>/<int:card_id>", methods=["GET", "POST"]
 )
-def flashcards_delete_question(set_id: int, index: str) -> object:
+def flashcards_delete_question(set_id: int, card_id: int) -> object:
     """
     Delete a flashcard question.
 
     Args:
         set_id: The ID of the flashcards.
+        card_id: The ID of the card to delete.
 
     Returns:
         The web page of flashcards list.
     """
 
     helper_flashcards.save_set(set_id)
-    helper_flashcards.delete_question(set_id, int(index))
+    helper_flashcards.delete_question(set_id, card_id)
 
     return redirect("/flashcards/edit/" + str(set_id))
 
@@ -280,6 +284,58 @@ def flashcards_save(set_id: int) -> object:
     return redirect("/flashcards/edit/" + str(set_id))
 
 
+@flashcards_blueprint.route("/flashcards/cards/<set_id>", methods=["POST"])
+def flashcards_save_cards(set_id: int) -> object:
+    """
+    Saves the cards which have been changed, added or removed in the editor,
+    as long as the changed and removed cards haven't been changed elsewhere
+    since the editor loaded them.
+
+    Args:
+        set_id: The ID of the flashcards.
+
+    Returns:
+        The new versions of the saved cards, or the cards which conflict.
+    """
+    try:
+        changes = helper_flashcards.parse_card_changes(request.get_json(silent=True))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        # Stops other saves changing the cards between checking their
+        # versions and writing them.
+        cur.execute("BEGIN IMMEDIATE;")
+        author = helper_flashcards.get_set_author(cur, set_id)
+        if author != session.get("username"):
+            conn.rollback()
+            if author is None:
+                return jsonify({"error": "Flashcard set does not exist"}), 404
+            return (
+                jsonify({"error": "You cannot edit another user's flashcard set"}),
+                403,
+            )
+        try:
+            result = helper_flashcards.apply_card_changes(cur, set_id, changes)
+        except helper_flashcards.CardConflictError as error:
+            conn.rollback()
+            return (
+                jsonify(
+                    {
+                        "error": "Some cards have been changed elsewhere",
+                        "conflicts": error.conflicts,
+                    }
+                ),
+                409,
+            )
+        conn.commit()
+    if changes["set_name"] is not None:
+        helper_profile_snapshot.invalidate_profile_snapshot(author)
+
+    return jsonify(result)
+
+
 @flashcards_blueprint.route("/flashcards/play/start/<set_id>", methods=["GET", "POST"])
 def flashcards_start_set(set_id: int) -> object:
     """
@@ -317,11 +373,11 @@ def flashcards_play(set_id: int) -> object:
             set_name,
             _,
             set_author,
-            questions,
+            cards,
             plays,
         ) = helper_flashcards.get_set_details(cur, set_id)
 
-        question_list = questions.items()
+        question_list = [(question, answer) for _, question, answer, _ in cards]
 
     helper_achievements.update_flashcard_achievements(set_author, plays)
 
@@ -331,7 +387,7 @@ def flashcards_play(set_id: int) -> object:
             requestCount=helper_connections.get_connection_request_count(),
             set_name=set_name,
             set_id=set_id,
-            question_list=dict(question_list),
+            question_list=question_list,
             question_count=len(question_list),
             set_author=set_author,
             username=session["username"],
@@ -6,10 +6,11 @@ import sqlite3
 from datetime import date
 from string import capwords
 
-import bcrypt
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_hashing as helper_hashing
 import student_network.helpers.helper_login as helper_login
+import student_network.helpers.helper_throttle as helper_throttle
 from flask import Blueprint, redirect, render_template, request, session
 
 login_blueprint = Blueprint(
@@ -96,7 +97,18 @@ def login_submit() -> object:
          Redirection depending on whether login was successful or not.
     """
     username = request.form["username_input"].lower()
-    password = request.form["psw_input"].encode("utf-8")
+    password = request.form["psw_input"]
+    # The client's own address when behind a trusted proxy, see app.py.
+    address = request.remote_addr
+
+    # Turns away excess attempts before looking up or hashing anything.
+    allowed, retry_after = helper_throttle.try_login_attempt(username, address)
+    if not allowed:
+        return (
+            render_template("login.html", errors=["throttled"]),
+            429,
+            {"Retry-After": str(retry_after)},
+        )
 
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
@@ -112,8 +124,26 @@ def login_submit() -> object:
         else:
             session["error"] = ["login"]
             return redirect("/login")
-        if hashed_password:
-            if bcrypt.checkpw(password, hashed_password):
+        # Fails straight away if the same password was recently wrong.
+        if hashed_password and not helper_throttle.has_recently_failed(
+            username, password, hashed_password
+        ):
+            try:
+                correct = helper_hashing.check_password(password, hashed_password)
+            except helper_hashing.HashingBusyError:
+                # Asks the user to try again shortly, rather than queueing
+                # behind everyone else who is logging in.
+                helper_throttle.refund_login_attempt(username, address)
+                return (
+                    render_template("login.html", errors=["busy"]),
+                    503,
+                    {"Retry-After": str(helper_hashing.RETRY_AFTER)},
+                )
+            if correct:
+                helper_throttle.refund_login_attempt(username, address)
+                if helper_hashing.needs_rehash(hashed_password):
+                    rehash_password(cur, username, password)
+                    conn.commit()
                 session["username"] = username
                 session["prev-page"] = request.url
                 if account_type == "admin":
@@ -123,6 +153,7 @@ def login_submit() -> object:
                     session["admin"] = False
                     return redirect("/profile")
             else:
+                helper_throttle.record_failed_login(username, password, hashed_password)
                 session["error"] = ["login"]
                 return redirect("/login")
         else:
@@ -130,6 +161,27 @@ def login_submit() -> object:
             return redirect("/login")
 
 
+def rehash_password(cur, username: str, password: str):
+    """
+    Hashes a user's password again with the configured bcrypt cost, after it
+    has been checked against a hash with a different cost. This is skipped if
+    the server is busy, as it can be done the next time they log in.
+
+    Args:
+        cur: Cursor for the SQLite database.
+        username: The username of the user.
+        password: The password which the user logged in with.
+    """
+    try:
+        hashed_password = helper_hashing.hash_password(password)
+    except helper_hashing.HashingBusyError:
+        return
+    cur.execute(
+        "UPDATE ACCOUNTS SET password=? WHERE username=?;",
+        (hashed_password, username),
+    )
+
+
 @login_blueprint.route("/register", methods=["GET"])
 def register_page() -> object:
     """
@@ -189,7 +241,20 @@ def register_submit() -> object:
         )
         # Registers the user if the details are valid.
         if valid is True:
-            hash_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+            try:
+                hash_password = helper_hashing.hash_password(password)
+            except helper_hashing.HashingBusyError:
+                return (
+                    render_template(
+                        "register.html",
+                        notifications=[],
+                        errors=["The server is busy, please try again shortly."],
+                        details=[username, full_name, email],
+                        requestCount=helper_connections.get_connection_request_count(),
+                    ),
+                    503,
+                    {"Retry-After": str(helper_hashing.RETRY_AFTER)},
+                )
             cur.execute(
                 "INSERT INTO Accounts (username, password, email, type) "
                 "VALUES (?, ?, ?, ?);",
@@ -215,6 +280,7 @@ def register_submit() -> object:
             )
             helper_general.check_level_exists(username, conn)
             conn.commit()
+            helper_login.check_deliverability_later(username, email)
 
             session["notifications"] = ["register"]
             session["username"] = username
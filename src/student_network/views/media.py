@@ -0,0 +1,79 @@
+"""
+Serves images uploaded by users. Their URLs never change once an image has
+been saved, so browsers are told to cache them indefinitely instead of
+checking for a newer version every time a page is rendered.
+"""
+
+import mimetypes
+import os
+import re
+
+import student_network.helpers.helper_images as helper_images
+from flask import Blueprint, Response, abort, current_app, request, send_file
+
+media_blueprint = Blueprint(
+    "media", __name__, static_folder="static", template_folder="templates"
+)
+
+# One year, which is the longest that caches are expected to honour.
+MEDIA_MAX_AGE = 365 * 24 * 60 * 60
+# Images named by their hash are split into subdirectories by its start,
+# whereas older images were named by a UUID.
+MEDIA_FILE_PATTERN = re.compile(
+    r"(?:[0-9a-f]{2}/[0-9a-f]{2}/)?[0-9a-f-]+(?:_[a-z]+)?\.(?:jpg|webp)"
+)
+
+
+def get_etag(file_name: str) -> str:
+    """
+    Gets the strong ETag of an uploaded image. Files are never overwritten
+    with different contents, so their name identifies the exact bytes sent.
+    This includes images uploaded before the image pipeline, whose smaller
+    sizes are generated alongside the original without rewriting it.
+
+    Args:
+        file_name: The path of the file within the directory for its kind.
+
+    Returns:
+        The ETag of the file.
+    """
+    return file_name.replace("/", "")
+
+
+@media_blueprint.route("/media/<kind>/<path:file_name>", methods=["GET"])
+def media(kind: str, file_name: str) -> object:
+    """
+    Sends an uploaded image, handing the transfer off to the web server in
+    front of the application where one has been configured to do so.
+
+    Returns:
+        The image, or an empty response telling the web server which file to
+        send.
+    """
+    if kind not in helper_images.KINDS or not MEDIA_FILE_PATTERN.fullmatch(file_name):
+        abort(404)
+
+    accel_redirect = current_app.config.get("MEDIA_ACCEL_REDIRECT")
+    if accel_redirect:
+        # nginx serves the file from an internal location, keeping the
+        # headers set here.
+        response = Response(mimetype=mimetypes.guess_type(file_name)[0])
+        response.headers["X-Accel-Redirect"] = "{}/{}/{}".format(
+            accel_redirect.rstrip("/"), kind, file_name
+        )
+        response.cache_control.public = True
+        response.cache_control.max_age = MEDIA_MAX_AGE
+        response.cache_control.immutable = True
+        response.set_etag(get_etag(file_name))
+        return response.make_conditional(request)
+
+    file_path = os.path.join(helper_images.IMAGES_DIR, kind, file_name)
+    if not os.path.isfile(file_path):
+        abort(404)
+    # Handles If-None-Match and Range requests, and sends the file using
+    # X-Sendfile instead if USE_X_SENDFILE is enabled.
+    response = send_file(
+        file_path, conditional=True, etag=get_etag(file_name), max_age=MEDIA_MAX_AGE
+    )
+    response.cache_control.immutable = True
+    return response
@@ -9,9 +9,13 @@ from datetime import datetime
 import student_network.helpers.helper_achievements as helper_achievements
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_image_store as helper_image_store
+import student_network.helpers.helper_images as helper_images
 import student_network.helpers.helper_login as helper_login
 import student_network.helpers.helper_posts as helper_posts
-import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
+import student_network.helpers.helper_uploads as helper_uploads
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import Blueprint, jsonify, redirect, render_template, request, session
 
 posts_blueprint = Blueprint(
@@ -131,10 +135,16 @@ def post(post_id: int) -> object:
             cur.execute(
                 "SELECT contentUrl from PostContent WHERE postId=?;", (post_id,)
             )
-            images = cur.fetchall()
+            images = [
+                helper_images.get_post_image_urls(image[0]) for image in cur.fetchall()
+            ]
 
             cur.execute("SELECT * FROM Comments WHERE postId=?;", (post_id,))
             row = cur.fetchall()
+            # Gets the author and commenter details in a single batch.
+            cards = helper_user_cards.get_user_cards(
+                [username] + [comment[1] for comment in row]
+            )
             if len(row) == 0:
                 session["prev-page"] = request.url
                 return render_template(
@@ -152,7 +162,7 @@ def post(post_id: int) -> object:
                     comments=None,
                     requestCount=helper_connections.get_connection_request_count(),
                     allUsernames=helper_general.get_all_usernames(),
-                    avatar=helper_profile.get_profile_picture(username),
+                    avatar=helper_user_cards.get_avatar(cards, username),
                     content=content,
                     notifications=helper_general.get_notifications(),
                 )
@@ -166,7 +176,7 @@ def post(post_id: int) -> object:
                         "date": helper_general.display_short_notification_age(
                             (datetime.now() - time).total_seconds()
                         ),
-                        "profilePic": helper_profile.get_profile_picture(comment[1]),
+                        "profilePic": helper_user_cards.get_avatar(cards, comment[1]),
                     }
                 )
             session["prev-page"] = request.url
@@ -185,7 +195,7 @@ def post(post_id: int) -> object:
                 comments=comments,
                 requestCount=helper_connections.get_connection_request_count(),
                 allUsernames=helper_general.get_all_usernames(),
-                avatar=helper_profile.get_profile_picture(username),
+                avatar=helper_user_cards.get_avatar(cards, username),
                 content=content,
                 notifications=helper_general.get_notifications(),
             )
@@ -289,15 +299,23 @@ def search_query() -> dict:
         usernames = cur.fetchall()
         # Sorts results alphabetically.
         usernames.sort(key=lambda x: x[0])  # [(username, degree)]
-        # Adds a profile picture to each user.
+        # Adds a profile picture and degree to each user in a single batch.
+        cards = helper_user_cards.get_user_cards([x[0] for x in usernames])
+        # Adds how each user relates to the searcher in a single batch.
+        relationships = {}
+        if session.get("username"):
+            relationships = helper_connections.get_relationships(
+                cur, session["username"], [x[0] for x in usernames]
+            )
         usernames = list(
             map(
                 lambda x: (
                     x[0],
                     x[1],
                     x[2],
-                    helper_profile.get_profile_picture(x[0]),
-                    helper_profile.get_degree(x[0])[1],
+                    helper_images.get_variant_url(cards[x[0]].avatar),
+                    cards[x[0]].degree,
+                    *helper_connections.get_relationship_badge(relationships.get(x[0])),
                 ),
                 usernames,
             )
@@ -344,17 +362,21 @@ def submit_post() -> object:
             )
 
             if len(all_file_names) > 0:
-                for fileName in all_file_names_split:
-                    cur.execute(
-                        "INSERT INTO PostContent (postId, contentUrl) "
-                        "VALUES (?, ?);",
-                        (
-                            row_id,
-                            fileName,
-                        ),
-                    )
+                # Only attaches images which have finished being saved.
+                file_names = [
+                    file_name
+                    for file_name in all_file_names_split
+                    if helper_images.is_content_hash(file_name)
+                    and helper_images.image_exists("post_imgs", file_name)
+                ]
+                cur.executemany(
+                    "INSERT INTO PostContent (postId, contentUrl) VALUES (?, ?);",
+                    [(row_id, file_name) for file_name in file_names],
+                )
+                helper_image_store.add_references(cur, "post_imgs", file_names)
 
             conn.commit()
+            helper_profile_snapshot.invalidate_profile_snapshot(session["username"])
             usernames_tagged = re.findall(r"@(\w+)", post_body)
             for username in usernames_tagged:
                 helper_general.new_notification_username(
@@ -416,13 +438,16 @@ def like_post() -> object:
                     (post_id, session["username"]),
                 )
                 conn.commit()
+                # The author's level is shown on their user card.
+                helper_user_cards.invalidate_user_card(username)
 
             helper_achievements.update_post_achievements(cur, likes, username)
         else:
             # Gets number of current likes.
-            cur.execute("SELECT likes FROM POSTS WHERE postId=?;", (post_id,))
+            cur.execute("SELECT likes, username FROM POSTS WHERE postId=?;", (post_id,))
             row = cur.fetchone()
             likes = row[0] - 1
+            username = row[1]
 
             cur.execute(
                 "UPDATE POSTS SET likes=? WHERE postId=? ;",
@@ -438,6 +463,8 @@ def like_post() -> object:
                 (post_id, session["username"]),
             )
             conn.commit()
+    # The number of likes is shown on the author's profile.
+    helper_profile_snapshot.bump_profile_version(username)
 
     return redirect("/post_page/" + post_id)
 
@@ -473,6 +500,7 @@ def submit_comment() -> object:
             )
             row = cur.fetchone()[0]
 
+            helper_profile_snapshot.bump_profile_version(username)
             helper_posts.update_comment_achievements(row, username)
 
             # we haven't commented on our own post
@@ -500,16 +528,27 @@ def delete_post() -> object:
 
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("SELECT postId FROM POSTS WHERE postId=?;", (post_id,))
+        cur.execute(
+            "SELECT postId, privacy, username FROM POSTS WHERE postId=?;", (post_id,)
+        )
         row = cur.fetchone()
         # check the post exists in database
         if row[0] is None:
             message.append("Error: this post does not exist")
-        else:
+        elif row[1] != "deleted":
             cur.execute(
                 "UPDATE POSTS SET privacy=? WHERE postId=?;", ("deleted", post_id)
             )
+            # Releases the post's images so that they can be deleted if unused.
+            cur.execute(
+                "SELECT contentUrl FROM PostContent WHERE postId=?;", (post_id,)
+            )
+            helper_image_store.remove_references(
+                cur, "post_imgs", [image[0] for image in cur.fetchall()]
+            )
             conn.commit()
+            # The post count is shown on its author's profile.
+            helper_profile_snapshot.invalidate_profile_snapshot(row[2])
 
     message.append("Post has been deleted successfully.")
     session["prev-page"] = request.url
@@ -552,6 +591,10 @@ def delete_comment() -> object:
         else:
             cur.execute("DELETE FROM Comments WHERE commentId =? ", (comment_id,))
             conn.commit()
+            cur.execute("SELECT username FROM POSTS WHERE postId=?;", (post_id,))
+            row = cur.fetchone()
+            if row:
+                helper_profile_snapshot.bump_profile_version(row[0])
 
     return redirect("post_page/" + post_id)
 
@@ -559,8 +602,8 @@ def delete_comment() -> object:
 @posts_blueprint.route("/upload_file", methods=["POST"])
 def upload_file():
     """
-    An API that sends the files using a form, they are then saved here
-    and a list of names of the files is returned
+    An API that sends the files using a form, they are then queued to be
+    processed and a list of names of the files is returned straight away
     """
     max_file_upload = 10
     file_names = []
@@ -568,7 +611,14 @@ def upload_file():
         for file_name in request.files:
             file = request.files[file_name]
 
-            file_name = helper_posts.upload_image(file)
+            file_name, message, queue_full = helper_uploads.queue_post_image(file)
+            if file_name is None:
+                # Cancels the files already queued from this request.
+                for queued_name in file_names:
+                    helper_uploads.cancel(queued_name)
+                if queue_full:
+                    return jsonify({"error": message}), 503, {"Retry-After": "5"}
+                return jsonify({"error": message}), 400
             file_names.append(file_name)
 
             max_file_upload -= 1
@@ -578,6 +628,15 @@ def upload_file():
     return jsonify(file_names)
 
 
+@posts_blueprint.route("/upload_status/<file_name>", methods=["GET"])
+def upload_status(file_name: str):
+    """
+    An API call to check whether an uploaded file has finished processing
+    """
+    file_name = file_name.replace(".", "").replace("/", "")
+    return jsonify(helper_uploads.get_status(file_name))
+
+
 @posts_blueprint.route("/delete_file", methods=["POST"])
 def delete_file():
     """
@@ -585,9 +644,10 @@ def delete_file():
     """
     file_name = request.args.get("filename")
     # try and prevent escaping this path
-    file_name.replace(".", "")
-    file_name.replace("/", "")
-    helper_posts.delete_file(file_name + ".jpg")
+    file_name = file_name.replace(".", "").replace("/", "")
+    # The image itself is deleted by garbage collection if it's unused, as an
+    # identical image may be attached to other posts.
+    helper_uploads.cancel(file_name)
     return "200"
 
 
@@ -7,13 +7,15 @@ from datetime import datetime
 
 import student_network.helpers.helper_achievements as helper_achievements
 import student_network.helpers.helper_connections as helper_connections
+import student_network.helpers.helper_events as helper_events
 import student_network.helpers.helper_general as helper_general
+import student_network.helpers.helper_graph as helper_graph
 import student_network.helpers.helper_login as helper_login
 import student_network.helpers.helper_profile as helper_profile
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
+import student_network.helpers.helper_reference as helper_reference
 import student_network.helpers.helper_posts as helper_posts
-import student_network.helpers.helper_flashcards as helper_flashcards
-import student_network.helpers.helper_quizzes as helper_quizzes
-from flask import Blueprint, redirect, render_template, request, session
+from flask import Blueprint, jsonify, redirect, render_template, request, session
 
 profile_blueprint = Blueprint(
     "profile", __name__, static_folder="static", template_folder="templates"
@@ -48,252 +50,67 @@ def profile(username: str) -> object:
         The updated web page based on whether the details provided were valid,
         and the profile page user's privacy settings.
     """
-    email = ""
-    conn_type = ""
-    hobbies = []
-    interests = []
     message = []
 
     if "register_details" in session:
         session.pop("register_details", None)
 
+    # Logged out visitors all see the same page, which is served from memory
+    # if nothing on the profile has changed since it was last rendered.
+    if not session.get("username"):
+        version = helper_profile_snapshot.get_profile_version(username)
+        page = helper_profile_snapshot.get_public_profile_page(username, version)
+        if page is not None:
+            session["prev-page"] = request.url
+            return page
+
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        # Gets user from database using username.
-        cur.execute(
-            "SELECT name, bio, gender, birthday, profilepicture, privacy FROM "
-            "UserProfile WHERE username=?;",
-            (username,),
+        cur.execute("SELECT privacy FROM UserProfile WHERE username=?;", (username,))
+        row = cur.fetchone()
+    if row is None:
+        message.append("The username " + username + " does not exist.")
+        message.append(" Please ensure you have entered the name correctly.")
+        session["prev-page"] = request.url
+        session["error"] = message
+        return render_template(
+            "error.html",
+            message=message,
+            requestCount=helper_connections.get_connection_request_count(),
+            notifications=helper_general.get_notifications(),
         )
-        row = cur.fetchall()
-        if len(row) == 0:
-            message.append("The username " + username + " does not exist.")
-            message.append(" Please ensure you have entered the name correctly.")
-            session["prev-page"] = request.url
-            session["error"] = message
-            return render_template(
-                "error.html",
-                message=message,
-                requestCount=helper_connections.get_connection_request_count(),
-                notifications=helper_general.get_notifications(),
-            )
-        else:
-            data = row[0]
-            name, bio, gender, birthday, profile_picture, privacy = (
-                data[0],
-                data[1],
-                data[2],
-                data[3],
-                data[4],
-                data[5],
-            )
+    privacy = row[0]
 
-    # If the user is logged in, specific features can then be displayed.
+    # Works out which posts the user can see based on their connection.
+    tier, conn_type, error = helper_connections.get_profile_access(username, privacy)
+    if tier is None:
+        message.append(error)
+        session["prev-page"] = request.url
+        return render_template(
+            "error.html",
+            message=message,
+            requestCount=helper_connections.get_connection_request_count(),
+            notifications=helper_general.get_notifications(),
+        )
     if session.get("username"):
-        if username == session["username"]:
-            # Gets the user's posts regardless of post settings if user is the
-            # owner of the profile.
-            cur.execute(
-                "SELECT * FROM POSTS WHERE username=? AND privacy!='deleted'",
-                (username,),
-            )
-            sort_posts = cur.fetchall()
-        else:
-            # Gets the connection type between the profile owner and the user.
-            their_close_friend = helper_connections.is_close_friend(
-                username, session["username"]
-            )
-            your_close_friend = helper_connections.is_close_friend(
-                session["username"], username
-            )
-            if not your_close_friend:
-                conn_type = helper_connections.get_connection_type(username)
-                if conn_type == "blocked":
-                    message.append(
-                        "Unable to view this profile since "
-                        + username
-                        + " has blocked you."
-                    )
-                    session["prev-page"] = request.url
-                    return render_template(
-                        "error.html",
-                        message=message,
-                        requestCount=helper_connections.get_connection_request_count(),
-                        notifications=helper_general.get_notifications(),
-                    )
-                elif privacy in ("close_friends", "private"):
-                    message.append("This profile is private")
-                    session["prev-page"] = request.url
-                    return render_template(
-                        "error.html",
-                        message=message,
-                        requestCount=helper_connections.get_connection_request_count(),
-                        notifications=helper_general.get_notifications(),
-                    )
-            else:
-                conn_type = "close_friend"
-                if privacy == "private":
-                    message.append("This profile is private.")
-                    session["prev-page"] = request.url
-                    return render_template(
-                        "error.html",
-                        message=message,
-                        requestCount=helper_connections.get_connection_request_count(),
-                        notifications=helper_general.get_notifications(),
-                    )
+        helper_achievements.update_profile_achievements(username)
 
-            session["prev-page"] = request.url
-            connections = helper_general.get_all_connections(username)
-            count = 0
-            for connection in connections:
-                connections[count] = connection[0]
-                count += 1
-            if session["username"] in connections:
-                # check if user trying to view profile is a close friend
-                if their_close_friend:
-                    cur.execute(
-                        "SELECT * "
-                        "FROM POSTS WHERE username=? "
-                        "AND privacy not in "
-                        "('private', 'deleted');",
-                        (username,),
-                    )
-                    sort_posts = cur.fetchall()
-                else:
-                    cur.execute(
-                        "SELECT * "
-                        "FROM POSTS WHERE username=? "
-                        "AND privacy not in "
-                        "('private', 'deleted', 'close');",
-                        (username,),
-                    )
-                    sort_posts = cur.fetchall()
-            else:
-                cur.execute(
-                    "SELECT * FROM POSTS WHERE username=? AND privacy=='public' ",
-                    (username,),
-                )
-                sort_posts = cur.fetchall()
+    # Gets everything shown in the header, which is cached for each tier.
+    snapshot = helper_profile_snapshot.get_profile_snapshot(username, tier)
 
-        helper_achievements.update_profile_achievements(username)
-    else:
-        # Only public posts can be viewed when not logged in
-        cur.execute(
-            "SELECT * FROM POSTS WHERE username=? AND privacy='public'", (username,)
-        )
-        sort_posts = cur.fetchall()
-
-    # Sort reverse chronologically
-    sort_posts.sort(key=lambda x: x[0], reverse=True)
-
-    user_posts = {"UserPosts": []}
-
-    for user_post in sort_posts:
-        add = ""
-        if len(user_post[1]) > 250:
-            add = "..."
-
-        if user_post[5] == "protected":
-            privacy = "Friends only"
-            icon = "user plus"
-        elif user_post[5] == "close":
-            privacy = "Close friends only"
-            icon = "handshake outline"
-        elif user_post[5] == "private":
-            privacy = "Private"
-            icon = "lock"
-        elif user_post[5] == "deleted":
-            privacy = "Deleted"
-            icon = "small trash alternate outline icon"
-        else:
-            privacy = str(user_post[5]).capitalize()
-            icon = "users"
-
-        # Get number of comments
-        cur.execute("SELECT * FROM comments WHERE postId=?", (user_post[0],))
-        comment_count = len(cur.fetchall())
-
-        liked = helper_posts.check_if_liked(cur, user_post[0], session["username"])
-
-        time = datetime.strptime(user_post[4], "%Y-%m-%d").strftime("%d-%m-%y")
-        user_posts["UserPosts"].append(
-            {
-                "postId": user_post[0],
-                "title": (user_post[1])[:250] + add,
-                "profile_pic": "https://via.placeholder.com/600",
-                "author": user_post[3],
-                "likes": user_post[2],
-                "comments": comment_count,
-                "liked": liked,
-                "account_type": helper_posts.get_account_type(user_post[3]),
-                "date_posted": time,
-                "privacy": privacy,
-                "icon": icon,
-            }
+    # Only the first page of posts is shown, and the rest are loaded as the
+    # user scrolls.
+    with sqlite3.connect("db.sqlite3") as conn:
+        posts, next_posts = helper_posts.get_profile_posts(
+            conn.cursor(), username, tier
         )
-
-    # Gets total (visible) post count
-    total_posts = len(user_posts["UserPosts"])
-
-    # Gets account type.
-    cur.execute("SELECT type FROM ACCOUNTS WHERE username=?;", (username,))
-    row = cur.fetchall()
-    account_type = row[0][0]
-
-    # Gets users degree.
-    cur.execute(
-        "SELECT degree FROM  "
-        "Degree WHERE degreeId = (SELECT degree "
-        "FROM UserProfile WHERE username=?);",
-        (username,),
-    )
-    row = cur.fetchone()
-    degree = row[0]
-
-    # Gets the user's hobbies.
-    cur.execute("SELECT hobby FROM UserHobby WHERE username=?;", (username,))
-    row = cur.fetchall()
-    if len(row) > 0:
-        hobbies = row
-
-    # Gets the user's interests.
-    cur.execute("SELECT interest FROM UserInterests WHERE username=?;", (username,))
-    row = cur.fetchall()
-    if len(row) > 0:
-        interests = row
-
-    # Gets the user's email
-    cur.execute("SELECT email from ACCOUNTS WHERE username=?;", (username,))
-    row = cur.fetchall()
-    if len(row) > 0:
-        email = row[0][0]
-
-    # Gets socials of the user
-    socials = helper_profile.read_socials(username)
-
-    # Gets flashcard sets made by the user
-    flashcards = helper_flashcards.get_user_cards(username)[:2]
-
-    # Gets quizzes made by the user
-    quizzes = helper_quizzes.get_user_quizzes(username)[:2]
-
-    # Gets the user's six rarest achievements.
-    unlocked_achievements, _ = helper_achievements.get_achievements(username)
-    first_six = unlocked_achievements[0 : min(6, len(unlocked_achievements))]
+    user_posts = {"UserPosts": posts}
 
     # Calculates the user's age based on their date of birth.
-    datetime_object = datetime.strptime(birthday, "%Y-%m-%d")
+    datetime_object = datetime.strptime(snapshot.birthday, "%Y-%m-%d")
     age = helper_profile.calculate_age(datetime_object)
 
-    # get user level
-    helper_general.check_level_exists(username, conn)
-
-    level_data = helper_profile.get_level(username)
-    level = level_data[0]
-    current_xp = level_data[1]
-    xp_next_level = level_data[2]
-
-    percentage_level = 100 * float(current_xp) / float(xp_next_level)
+    percentage_level = 100 * float(snapshot.current_xp) / float(snapshot.xp_next_level)
     progress_color = "green"
     if percentage_level < 75:
         progress_color = "orange"
@@ -303,65 +120,109 @@ def profile(username: str) -> object:
         progress_color = "red"
 
     if session.get("username"):
+        # Shows how the viewer is connected to users they aren't connected to.
+        connection_path = None
+        if conn_type in (None, "request", "incoming"):
+            connection_path = helper_graph.find_connection_path(
+                session["username"], username
+            )
+
         session["prev-page"] = request.url
         return render_template(
             "profile.html",
             username=username,
-            name=name,
-            bio=bio,
-            gender=gender,
-            birthday=birthday,
-            profile_picture=profile_picture,
+            name=snapshot.name,
+            bio=snapshot.bio,
+            gender=snapshot.gender,
+            birthday=snapshot.birthday,
+            profile_picture=snapshot.profile_picture,
             age=age,
-            hobbies=hobbies,
-            account_type=account_type,
-            interests=interests,
-            degree=degree,
-            email=email,
-            socials=socials,
-            flashcards=flashcards,
-            quizzes=quizzes,
+            hobbies=snapshot.hobbies,
+            account_type=snapshot.account_type,
+            interests=snapshot.interests,
+            degree=snapshot.degree,
+            email=snapshot.email,
+            socials=snapshot.socials,
+            flashcards=snapshot.flashcards,
+            quizzes=snapshot.quizzes,
             posts=user_posts,
-            total_posts=total_posts,
+            next_posts=next_posts,
+            total_posts=snapshot.total_posts,
             type=conn_type,
-            unlocked_achievements=first_six,
+            connection_path=connection_path,
+            unlocked_achievements=snapshot.achievements,
             allUsernames=helper_general.get_all_usernames(),
             requestCount=helper_connections.get_connection_request_count(),
-            level=level,
-            current_xp=int(current_xp),
-            xp_next_level=int(xp_next_level),
+            level=snapshot.level,
+            current_xp=int(snapshot.current_xp),
+            xp_next_level=int(snapshot.xp_next_level),
             progress_color=progress_color,
             notifications=helper_general.get_notifications(),
         )
     else:
         session["prev-page"] = request.url
-        return render_template(
+        page = render_template(
             "profile.html",
             username=username,
-            name=name,
-            bio=bio,
-            gender=gender,
-            birthday=birthday,
-            profile_picture=profile_picture,
+            name=snapshot.name,
+            bio=snapshot.bio,
+            gender=snapshot.gender,
+            birthday=snapshot.birthday,
+            profile_picture=snapshot.profile_picture,
             age=age,
-            hobbies=hobbies,
-            account_type=account_type,
-            interests=interests,
-            socials=socials,
-            flashcards=flashcards,
-            quizzes=quizzes,
-            degree=degree,
-            email=email,
+            hobbies=snapshot.hobbies,
+            account_type=snapshot.account_type,
+            interests=snapshot.interests,
+            socials=snapshot.socials,
+            flashcards=snapshot.flashcards,
+            quizzes=snapshot.quizzes,
+            degree=snapshot.degree,
+            email=snapshot.email,
             posts=user_posts,
-            total_posts=total_posts,
-            type="none",
-            unlocked_achievements=first_six,
-            level=level,
-            current_xp=int(current_xp),
-            xp_next_level=int(xp_next_level),
+            next_posts=next_posts,
+            total_posts=snapshot.total_posts,
+            type=conn_type,
+            unlocked_achievements=snapshot.achievements,
+            level=snapshot.level,
+            current_xp=int(snapshot.current_xp),
+            xp_next_level=int(snapshot.xp_next_level),
             progress_color=progress_color,
             notifications=helper_general.get_notifications(),
         )
+        helper_profile_snapshot.set_public_profile_page(username, version, page)
+        return page
+
+
+@profile_blueprint.route("/profile/<username>/posts", methods=["GET"])
+def profile_posts(username: str) -> object:
+    """
+    Gets the next page of posts on a user's profile, for loading more as the
+    user scrolls.
+
+    Args:
+        username: The user whose posts to get.
+
+    Returns:
+        The details of each post, and the ID to get the next page before.
+    """
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT privacy FROM UserProfile WHERE username=?;", (username,))
+        row = cur.fetchone()
+        if row is None:
+            return (
+                jsonify({"error": "The username " + username + " does not exist."}),
+                404,
+            )
+        tier, _, error = helper_connections.get_profile_access(username, row[0])
+        if tier is None:
+            return jsonify({"error": error}), 403
+
+        posts, next_posts = helper_posts.get_profile_posts(
+            cur, username, tier, request.args.get("before", type=int)
+        )
+
+    return jsonify({"posts": posts, "next": next_posts})
 
 
 @profile_blueprint.route("/edit-profile", methods=["GET", "POST"])
@@ -399,12 +260,8 @@ def edit_profile() -> object:
         interests = cur.fetchall()
 
         # gets all possible degrees
-        cur.execute(
-            "SELECT * FROM Degree",
-        )
-        degree_list = cur.fetchall()
-        for item in degree_list:
-            degrees["degrees"].append({"degreeId": item[0], "degree": item[1]})
+        for degree_id, name in helper_reference.get_reference_data().degrees.items():
+            degrees["degrees"].append({"degreeId": degree_id, "degree": name})
 
     socials = helper_profile.read_socials(session["username"])
 
@@ -448,119 +305,57 @@ def edit_profile() -> object:
         hobbies = [hobby.lower() for hobby in hobbies_unformatted]
         interests_unformatted = interests_input.split(",")
         interests = [interest.lower() for interest in interests_unformatted]
-        # Connects to the database to perform validation.
-        with sqlite3.connect("db.sqlite3") as conn:
-            cur = conn.cursor()
-
-            # Validates user profile details and uploaded image.
-            valid, message = helper_profile.validate_edit_profile(
-                bio, gender, dob, hobbies, interests
-            )
-            if valid:
-                file = request.files["file"]
-                (
-                    valid,
-                    message,
+        # Validates user profile details and uploaded image.
+        valid, message = helper_profile.validate_edit_profile(
+            bio, gender, dob, hobbies, interests
+        )
+        file_name_hashed = ""
+        if valid:
+            file = request.files["file"]
+            (
+                valid,
+                message,
+                file_name_hashed,
+            ) = helper_profile.validate_profile_pic(file)
+            if valid and file_name_hashed:
+                # Award achievement ID 18 - Show yourself if necessary
+                helper_achievements.apply_achievement(username, 18)
+
+        # Updates the user profile if details are valid.
+        if valid:
+            with sqlite3.connect("db.sqlite3") as conn:
+                cur = conn.cursor()
+                # Saves every change at once, so that the profile is never
+                # seen half edited.
+                cur.execute("BEGIN IMMEDIATE;")
+                change = helper_profile.update_profile(
+                    cur,
+                    username,
+                    {"bio": bio, "gender": gender, "birthday": dob, "degree": degree},
+                    {"hobbies": hobbies, "interests": interests},
                     file_name_hashed,
-                ) = helper_profile.validate_profile_pic(file)
-                if valid and file_name_hashed:
-                    # Award achievement ID 18 - Show yourself if necessary
-                    helper_achievements.apply_achievement(username, 18)
-
-            # Updates the user profile if details are valid.
-            if valid:
-                # Updates the bio, gender, and birthday.
-                if file_name_hashed:
-                    cur.execute(
-                        "UPDATE UserProfile SET bio=?, gender=?, birthday=?, "
-                        "profilepicture=?, degree=? WHERE username=?;",
-                        (
-                            bio,
-                            gender,
-                            dob,
-                            "/static/images/avatars/" + file_name_hashed + ".jpg",
-                            degree,
-                            username,
-                        ),
-                    )
-                    conn.commit()
-
-                    helper_achievements.update_profile_achievements(username)
-
-                else:
-                    cur.execute(
-                        "UPDATE UserProfile SET bio=?, gender=?, birthday=?, "
-                        "degree=? WHERE username=?;",
-                        (
-                            bio,
-                            gender,
-                            dob,
-                            degree,
-                            username,
-                        ),
-                    )
-
-                # Inserts new hobbies and interests into the database if the
-                # user made a new input.
-
-                cur.execute("DELETE FROM UserHobby WHERE username=?;", (username,))
-                cur.execute("DELETE FROM UserInterests WHERE username=?;", (username,))
-                if hobbies != [""]:
-                    for hobby in hobbies:
-                        cur.execute(
-                            "SELECT hobby FROM UserHobby WHERE "
-                            "username=? AND hobby=?;",
-                            (
-                                username,
-                                hobby,
-                            ),
-                        )
-                        if cur.fetchone() is None:
-                            cur.execute(
-                                "INSERT INTO UserHobby (username, "
-                                "hobby) VALUES (?, ?);",
-                                (
-                                    username,
-                                    hobby,
-                                ),
-                            )
-                if interests != [""]:
-                    for interest in interests:
-                        cur.execute(
-                            "SELECT interest FROM UserInterests WHERE "
-                            "username=? AND interest=?;",
-                            (
-                                username,
-                                interest,
-                            ),
-                        )
-                        if cur.fetchone() is None:
-                            cur.execute(
-                                "INSERT INTO UserInterests "
-                                "(username, interest) VALUES (?, ?);",
-                                (
-                                    username,
-                                    interest,
-                                ),
-                            )
-
-                conn.commit()
-                return redirect("/profile")
-            # Displays error message(s) stating why their details are invalid.
-            else:
-                session["error"] = message
-                return render_template(
-                    "settings.html",
-                    errors=message,
-                    requestCount=helper_connections.get_connection_request_count(),
-                    allUsernames=helper_general.get_all_usernames(),
-                    degrees=degrees,
-                    degree=degree,
-                    date=dob,
-                    bio=bio,
-                    privacy=privacy,
-                    notifications=helper_general.get_notifications(),
                 )
+                conn.commit()
+            if change.fields:
+                helper_events.publish(helper_events.PROFILE_CHANGED, change)
+            if file_name_hashed:
+                helper_achievements.update_profile_achievements(username)
+            return redirect("/profile")
+        # Displays error message(s) stating why their details are invalid.
+        else:
+            session["error"] = message
+            return render_template(
+                "settings.html",
+                errors=message,
+                requestCount=helper_connections.get_connection_request_count(),
+                allUsernames=helper_general.get_all_usernames(),
+                degrees=degrees,
+                degree=degree,
+                date=dob,
+                bio=bio,
+                privacy=privacy,
+                notifications=helper_general.get_notifications(),
+            )
 
 
 @profile_blueprint.route("/profile_privacy", methods=["POST"])
@@ -602,13 +397,10 @@ def edit_socials() -> object:
     }
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("DELETE FROM UserSocial WHERE username=?;", (session["username"],))
-        for key, value in socials.items():
-            if value != "":
-                cur.execute(
-                    "INSERT INTO UserSocial (username, social, link) "
-                    "VALUES (?, ?, ?);",
-                    (session["username"], key, value),
-                )
+        cur.execute("BEGIN IMMEDIATE;")
+        change = helper_profile.update_socials(cur, session["username"], socials)
+        conn.commit()
+    if change.fields:
+        helper_events.publish(helper_events.PROFILE_CHANGED, change)
 
     return redirect("/profile")
@@ -4,10 +4,12 @@ Handles the view for quizzes and related functionality.
 import sqlite3
 
 import student_network.helpers.helper_achievements as helper_achievements
+import student_network.helpers.helper_catalogue as helper_catalogue
 import student_network.helpers.helper_connections as helper_connections
 import student_network.helpers.helper_general as helper_general
 import student_network.helpers.helper_login as helper_login
 import student_network.helpers.helper_quizzes as helper_quizzes
+import student_network.helpers.helper_user_cards as helper_user_cards
 from flask import Blueprint, redirect, render_template, request, session
 
 quizzes_blueprint = Blueprint(
@@ -52,7 +54,12 @@ def create_quiz_from_set(set_id: int):
         quiz_name,
         questions,
         answers,
-    ) = helper_quizzes.generate_answers_from_set(set_id)
+    ) = helper_quizzes.generate_answers_from_set(set_id, rank_by_similarity=True)
+    if any(len(options) < 4 for options in answers):
+        session["error"] = [
+            "A quiz needs at least four different answers in the flashcard set!"
+        ]
+        return redirect("/quizzes")
 
     out = helper_quizzes.make_quiz(quiz_name, questions, answers, author, date_created)
     if out == False:
@@ -75,75 +82,80 @@ def quiz(quiz_id: int) -> object:
         The web page for answering the questions, or feedback for your answers.
     """
 
-    # Gets the quiz details from the database.
-    with sqlite3.connect("db.sqlite3") as conn:
-        cur = conn.cursor()
-        (
-            answers,
-            questions,
-            quiz_author,
-            quiz_details,
-            quiz_name,
-        ) = helper_quizzes.get_quiz_details(cur, quiz_id)
-
     if request.method == "GET":
+        with sqlite3.connect("db.sqlite3") as conn:
+            cur = conn.cursor()
+            quiz_details = helper_quizzes.get_quiz(cur, quiz_id)
+            if quiz_details is None:
+                session["error"] = ["Quiz does not exist"]
+                return redirect("/quizzes")
+            quiz_name, quiz_author, _ = quiz_details
+            questions = helper_quizzes.get_questions(cur, quiz_id)
+            attempt_id, order = helper_quizzes.start_attempt(
+                cur, quiz_id, session["username"], questions
+            )
+            conn.commit()
+        questions, answers = helper_quizzes.get_attempt_questions(questions, order)
+
         return render_template(
             "quiz.html",
             requestCount=helper_connections.get_connection_request_count(),
             quiz_name=quiz_name,
             quiz_id=quiz_id,
+            attempt_id=attempt_id,
             questions=questions,
             answers=answers,
             quiz_author=quiz_author,
             notifications=helper_general.get_notifications(),
         )
     elif request.method == "POST":
-        score = 0
+        attempt_id = request.form.get("attempt_id", type=int)
+        with sqlite3.connect("db.sqlite3") as conn:
+            cur = conn.cursor()
+            quiz_details = helper_quizzes.get_quiz(cur, quiz_id)
+            question_count = quiz_details[2] if quiz_details else 0
         # Gets the answers selected by the user.
-        user_answers = []
-        for num in range(len(questions)):
-            user_answers.append(request.form.get("userAnswer" + str(num)))
+        choices = helper_quizzes.parse_choices(request.form, question_count)
 
         # Displays an error message if they have not answered all questions.
-        if any(user_answers) == "":
-            session["error"] = "You have not answered all the questions!"
+        if choices is None:
+            session["error"] = ["You have not answered all the questions!"]
             return redirect(session["prev-page"])
-        else:
-            # 1 exp earned for the author of the quiz
-            if quiz_author != session["username"]:
-                helper_general.check_level_exists(quiz_author, conn)
-                helper_general.one_exp(cur, quiz_author)
-                helper_achievements.update_quiz_achievements(score, True)
-                conn.commit()
-            # Provides feedback to the user on how they performed on each question.
-            question_feedback = []
-            cur.execute("SELECT * FROM Question WHERE quiz_id=?;", (quiz_id,))
-            questions_raw = cur.fetchall()
-            for i in range(len(questions_raw)):
-                correct_answer = questions_raw[i][3]
-                correct = user_answers[i] == correct_answer
-                question_feedback.append(
-                    [questions[i], user_answers[i], correct_answer]
-                )
-                if correct:
-                    score += 1
-            helper_achievements.update_quiz_achievements(score)
-            # Updates the number of times a quiz has been played.
-            cur.execute(
-                "UPDATE Quiz SET plays = plays + 1 WHERE quiz_id=?;", (quiz_id,)
+
+        with sqlite3.connect("db.sqlite3") as conn:
+            cur = conn.cursor()
+            # Stops the same attempt being graded twice at once.
+            cur.execute("BEGIN IMMEDIATE;")
+            result = helper_quizzes.grade_attempt(
+                cur, attempt_id, session["username"], choices
             )
+            if result is None:
+                conn.rollback()
+                session["error"] = [
+                    "This quiz attempt is no longer valid, as it has already "
+                    "been submitted or the quiz has changed!"
+                ]
+                return redirect("/quizzes")
             conn.commit()
 
-            percentage = round(100 * score / len(questions_raw))
+        # The author's level is shown on their user card.
+        helper_user_cards.invalidate_user_card(result["author"])
+        for username in result["unlocked"]:
+            helper_achievements.announce_achievement(username)
 
-            return render_template(
-                "quiz_results.html",
-                question_feedback=question_feedback,
-                requestCount=helper_connections.get_connection_request_count(),
-                score=score,
-                percentage=percentage,
-                notifications=helper_general.get_notifications(),
-            )
+        score = result["score"]
+        question_feedback = result["feedback"]
+        percentage = round(100 * score / len(question_feedback))
+
+        return render_template(
+            "quiz_results.html",
+            question_feedback=question_feedback,
+            requestCount=helper_connections.get_connection_request_count(),
+            score=score,
+            percentage=percentage,
+            average=result["average"],
+            notifications=helper_general.get_notifications(),
+        )
 
 
 @quizzes_blueprint.route("/quizzes", methods=["GET"])
@@ -156,13 +168,9 @@ def quizzes() -> object:
     """
     with sqlite3.connect("db.sqlite3") as conn:
         cur = conn.cursor()
-        cur.execute("SELECT quiz_id, date_created, author, quiz_name, plays FROM Quiz")
-        row = cur.fetchall()
-        quiz_posts = sorted(row, key=lambda x: x[4], reverse=True)
-        quiz_posts = [list(x) for x in quiz_posts]
-
-        for i, quiz in enumerate(quiz_posts):
-            quiz_posts[i].append(helper_quizzes.get_question_count(cur, quiz[0]))
+        quiz_posts, next_page = helper_catalogue.get_quizzes(
+            cur, after=request.args.get("after")
+        )
 
     # Displays any error messages.
     if "error" in session:
@@ -172,6 +180,7 @@ def quizzes() -> object:
             "quizzes.html",
             requestCount=helper_connections.get_connection_request_count(),
             quizzes=quiz_posts,
+            next_page=next_page,
             errors=errors,
             personal=False,
             username=session["username"],
@@ -182,6 +191,7 @@ def quizzes() -> object:
             "quizzes.html",
             requestCount=helper_connections.get_connection_request_count(),
             quizzes=quiz_posts,
+            next_page=next_page,
             personal=False,
             username=session["username"],
             notifications=helper_general.get_notifications(),
@@ -196,7 +206,11 @@ def quizzes_user(username: str) -> object:
     Returns:
         The web page of quizzes created.
     """
-    quiz_posts = helper_quizzes.get_user_quizzes(username)
+    with sqlite3.connect("db.sqlite3") as conn:
+        cur = conn.cursor()
+        quiz_posts, next_page = helper_catalogue.get_quizzes(
+            cur, username, after=request.args.get("after")
+        )
 
     # Displays any error messages.
     if "error" in session:
@@ -206,6 +220,7 @@ def quizzes_user(username: str) -> object:
             "quizzes.html",
             requestCount=helper_connections.get_connection_request_count(),
             quizzes=quiz_posts,
+            next_page=next_page,
             errors=errors,
             personal=True,
             username=username,
@@ -216,6 +231,7 @@ def quizzes_user(username: str) -> object:
             "quizzes.html",
             requestCount=helper_connections.get_connection_request_count(),
             quizzes=quiz_posts,
+            next_page=next_page,
             personal=True,
             username=username,
             notifications=helper_general.get_notifications(),
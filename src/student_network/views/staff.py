@@ -4,8 +4,13 @@ Handles the view for staff administration tools and related functionality.
 
 import sqlite3
 
+import student_network.helpers.helper_cache as helper_cache
 import student_network.helpers.helper_connections as helper_connections
-from flask import Blueprint, redirect, render_template, session
+import student_network.helpers.helper_graph as helper_graph
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
+import student_network.helpers.helper_reference as helper_reference
+import student_network.helpers.helper_user_cards as helper_user_cards
+from flask import Blueprint, jsonify, redirect, render_template, session
 
 staff_blueprint = Blueprint(
     "staff", __name__, static_folder="static", template_folder="templates"
@@ -39,9 +44,14 @@ def show_staff_requests() -> object:
                 for elem in row:
                     requests.append(elem[0])
 
+            # Summarises the communities of connections found by the last run
+            # of utils/detect_communities.py.
+            clusters = helper_graph.get_cluster_report(cur)
+
             return render_template(
                 "admin.html",
                 requests=requests,
+                clusters=clusters,
                 requestCount=helper_connections.get_connection_request_count(),
             )
     else:
@@ -68,6 +78,7 @@ def accept_staff(username: str):
         cur.execute(
             "UPDATE ACCOUNTS SET type=? WHERE username=? ;", ("staff", username)
         )
+    helper_user_cards.invalidate_user_card(username)
     return redirect("/admin")
 
 
@@ -87,4 +98,51 @@ def reject_staff(username: str):
         cur.execute(
             "UPDATE ACCOUNTS SET type=? WHERE username=? ;", ("student", username)
         )
+    helper_user_cards.invalidate_user_card(username)
     return redirect("/admin")
+
+
+@staff_blueprint.route("/admin/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    Reports how effective each of the in-memory caches has been.
+
+    Returns:
+        JSON list of statistics for each cache, including its hit rate.
+    """
+    if not session.get("admin"):
+        return render_template(
+            "error.html",
+            message=["You are not logged in to an admin account"],
+            requestCount=helper_connections.get_connection_request_count(),
+        )
+
+    return jsonify(helper_cache.get_cache_stats())
+
+
+@staff_blueprint.route("/admin/reload_reference_data", methods=["POST"])
+def reload_reference_data():
+    """
+    Reads the achievements and degrees again after they've been changed by a
+    deployment, without restarting the application. Only the worker process
+    handling the request reads them straight away, and other workers read them
+    within helper_reference.MAX_AGE, as do their cached user cards and profiles
+    once those expire.
+
+    Returns:
+        JSON of the version of the reference data now in use.
+    """
+    if not session.get("admin"):
+        return render_template(
+            "error.html",
+            message=["You are not logged in to an admin account"],
+            requestCount=helper_connections.get_connection_request_count(),
+        )
+
+    reference_data = helper_reference.reload_reference_data()
+    # Cached user cards and profiles include degree and achievement details.
+    helper_user_cards.user_card_cache.clear()
+    helper_profile_snapshot.profile_snapshot_cache.clear()
+    return jsonify(
+        {"version": reference_data.version, "loaded_at": reference_data.loaded_at}
+    )
@@ -0,0 +1,36 @@
+import student_network.helpers.helper_cache as helper_cache
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Tests that the least recently used entry is evicted when the cache is full.
+    """
+    cache = helper_cache.LRUCache("test_evicts", max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_cache_expires_entries():
+    """
+    Tests that entries are no longer returned once they have expired.
+    """
+    cache = helper_cache.LRUCache("test_expires", max_size=2, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_cache_stats():
+    """
+    Tests that hits, misses and invalidations are reflected in the statistics.
+    """
+    cache = helper_cache.LRUCache("test_stats", max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.invalidate("a")
+    cache.get("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,45 @@
+import sqlite3
+
+import student_network.helpers.helper_catalogue as helper_catalogue
+
+
+def test_catalogue_pages():
+    """
+    Tests that pages follow on from each other in order of plays.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE Quiz (quiz_id INTEGER PRIMARY KEY, quiz_name TEXT, "
+        "date_created DATE, author TEXT, plays INTEGER, question_count INTEGER);"
+    )
+    cur.executemany(
+        "INSERT INTO Quiz VALUES (?, 'quiz', '2021-03-01', ?, ?, 4);",
+        [(i, "student1" if i % 2 else "student2", i % 3) for i in range(1, 8)],
+    )
+
+    ids = []
+    after = None
+    while True:
+        quizzes, after = helper_catalogue.get_quizzes(cur, after=after, limit=3)
+        ids.extend(quiz[0] for quiz in quizzes)
+        if after is None:
+            break
+    assert ids == [5, 2, 7, 4, 1, 6, 3]
+
+    quizzes, after = helper_catalogue.get_quizzes(cur, "student2", limit=3)
+    assert [quiz[0] for quiz in quizzes] == [2, 4, 6]
+    assert after is None
+    assert quizzes[0][5] == 4
+
+
+def test_decode_cursor():
+    """
+    Tests that invalid cursors give the first page.
+    """
+    assert helper_catalogue.decode_cursor(helper_catalogue.encode_cursor(3, 12)) == (
+        3,
+        12,
+    )
+    for cursor in (None, "", "abc", "1-2-3"):
+        assert helper_catalogue.decode_cursor(cursor) is None
@@ -0,0 +1,260 @@
+import sqlite3
+
+import pytest
+import student_network.helpers.helper_connections as helper_connections
+import student_network.helpers.helper_migrations as helper_migrations
+
+
+def create_connections():
+    """
+    Creates a database with three users and no connections between them.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE ACCOUNTS (username VARCHAR PRIMARY KEY);")
+    cur.execute(
+        "CREATE TABLE Connection (user1 TEXT, user2 TEXT, connection_type TEXT, "
+        "PRIMARY KEY (user1, user2));"
+    )
+    cur.execute(
+        "CREATE TABLE CloseFriend (user1 TEXT, user2 TEXT, "
+        "PRIMARY KEY (user1, user2));"
+    )
+    cur.executemany(
+        "INSERT INTO ACCOUNTS VALUES (?);", [("alice",), ("bob",), ("carol",)]
+    )
+    helper_migrations._canonicalise_connections(cur)
+    helper_migrations._count_connections(cur)
+    return cur
+
+
+def test_connection_request_accepted():
+    """
+    Tests that a request can only be accepted by the user it was sent to.
+    """
+    cur = create_connections()
+    assert helper_connections.request_connection(cur, "bob", "alice")
+    assert not helper_connections.request_connection(cur, "alice", "bob")
+    assert helper_connections.read_connection_type(cur, "bob", "alice") == "request"
+    assert helper_connections.read_connection_type(cur, "alice", "bob") == "incoming"
+
+    assert not helper_connections.accept_connection(cur, "bob", "alice")
+    assert helper_connections.accept_connection(cur, "alice", "bob")
+    assert helper_connections.read_connection_type(cur, "alice", "bob") == "connected"
+    assert helper_connections.read_connection_type(cur, "bob", "alice") == "connected"
+    assert not helper_connections.request_connection(cur, "bob", "dave")
+
+
+def test_block_replaces_connection():
+    """
+    Tests that blocking a connection leaves a single block, and removes any
+    close friends between the users.
+    """
+    cur = create_connections()
+    helper_connections.request_connection(cur, "alice", "bob")
+    helper_connections.accept_connection(cur, "bob", "alice")
+    assert helper_connections.add_close_friend(cur, "alice", "bob")
+    assert not helper_connections.add_close_friend(cur, "alice", "carol")
+
+    assert helper_connections.block_connection(cur, "bob", "alice")
+    cur.execute("SELECT user1, user2, connection_type FROM Connection;")
+    assert cur.fetchall() == [("bob", "alice", "block")]
+    cur.execute("SELECT * FROM CloseFriend;")
+    assert cur.fetchall() == []
+    assert helper_connections.read_connection_type(cur, "alice", "bob") == "blocked"
+
+    # The blocked user can't remove the block or send a request.
+    assert not helper_connections.remove_connection(cur, "alice", "bob")
+    assert not helper_connections.unblock_connection(cur, "alice", "bob")
+    assert not helper_connections.request_connection(cur, "alice", "bob")
+    assert helper_connections.unblock_connection(cur, "bob", "alice")
+    assert helper_connections.read_connection_type(cur, "alice", "bob") is None
+
+
+def test_block_back_keeps_block():
+    """
+    Tests that a blocked user can't remove the block on them by blocking the
+    other user back and then unblocking them.
+    """
+    cur = create_connections()
+    assert helper_connections.block_connection(cur, "bob", "alice")
+    assert not helper_connections.block_connection(cur, "alice", "bob")
+    assert not helper_connections.unblock_connection(cur, "alice", "bob")
+    assert not helper_connections.request_connection(cur, "alice", "bob")
+    cur.execute("SELECT user1, user2, connection_type FROM Connection;")
+    assert cur.fetchall() == [("bob", "alice", "block")]
+    assert helper_connections.read_connection_type(cur, "alice", "bob") == "blocked"
+
+
+def test_remove_connection():
+    """
+    Tests that removing a connection also removes close friends.
+    """
+    cur = create_connections()
+    helper_connections.request_connection(cur, "carol", "alice")
+    helper_connections.accept_connection(cur, "alice", "carol")
+    helper_connections.add_close_friend(cur, "carol", "alice")
+    helper_connections.add_close_friend(cur, "alice", "carol")
+    assert helper_connections.remove_close_friend(cur, "alice", "carol")
+    assert not helper_connections.remove_close_friend(cur, "alice", "carol")
+
+    assert helper_connections.remove_connection(cur, "alice", "carol")
+    cur.execute("SELECT COUNT(*) FROM Connection;")
+    assert cur.fetchone()[0] == 0
+    cur.execute("SELECT COUNT(*) FROM CloseFriend;")
+    assert cur.fetchone()[0] == 0
+
+
+def test_invalid_connections_rejected():
+    """
+    Tests that duplicate pairs, connections with oneself and unknown types
+    can't be stored.
+    """
+    cur = create_connections()
+    helper_connections.request_connection(cur, "alice", "bob")
+    for row in [
+        ("bob", "alice", "request"),
+        ("carol", "carol", "request"),
+        ("alice", "carol", "friend"),
+    ]:
+        with pytest.raises(sqlite3.IntegrityError):
+            cur.execute("INSERT INTO Connection VALUES (?, ?, ?);", row)
+
+
+def test_connection_counts_follow_transitions():
+    """
+    Tests that the kept counts change with each transition, and always match
+    the connections.
+    """
+    cur = create_connections()
+    counts = helper_connections.get_connection_counts
+    helper_connections.request_connection(cur, "alice", "bob")
+    helper_connections.request_connection(cur, "carol", "alice")
+    assert counts(cur, "alice") == (0, 1, 1, 0, 0)
+    assert counts(cur, "bob") == (0, 1, 0, 0, 0)
+
+    helper_connections.accept_connection(cur, "bob", "alice")
+    helper_connections.add_close_friend(cur, "alice", "bob")
+    assert counts(cur, "alice") == (1, 1, 0, 1, 0)
+    assert counts(cur, "bob") == (1, 0, 0, 0, 0)
+
+    helper_connections.block_connection(cur, "bob", "alice")
+    helper_connections.block_connection(cur, "alice", "carol")
+    assert counts(cur, "alice") == (0, 0, 0, 0, 1)
+    assert counts(cur, "bob") == (0, 0, 0, 0, 1)
+    assert counts(cur, "carol") == (0, 0, 0, 0, 0)
+    assert helper_connections.repair_connection_counts(cur) == []
+
+
+def test_repair_connection_counts():
+    """
+    Tests that incorrect counts are found, and only replaced when asked.
+    """
+    cur = create_connections()
+    helper_connections.request_connection(cur, "alice", "bob")
+    cur.execute("UPDATE UserConnectionCounts SET incoming_requests=5;")
+
+    mismatches = helper_connections.repair_connection_counts(cur, repair=False)
+    assert [username for username, _, _ in mismatches] == ["alice", "bob"]
+    assert mismatches[1][1:] == ((0, 5, 0, 0, 0), (0, 1, 0, 0, 0))
+    assert helper_connections.get_connection_counts(cur, "bob").incoming_requests == 5
+
+    helper_connections.repair_connection_counts(cur)
+    assert helper_connections.get_connection_counts(cur, "bob").incoming_requests == 1
+    assert helper_connections.get_connection_counts(cur, "alice") == (0, 0, 1, 0, 0)
+
+
+def test_get_relationships():
+    """
+    Tests that each user's relationship with the viewer is found in one
+    batch, from the viewer's point of view.
+    """
+    cur = create_connections()
+    cur.execute("INSERT INTO ACCOUNTS VALUES ('dave');")
+    helper_connections.request_connection(cur, "alice", "bob")
+    helper_connections.accept_connection(cur, "bob", "alice")
+    helper_connections.request_connection(cur, "alice", "carol")
+    helper_connections.accept_connection(cur, "carol", "alice")
+    helper_connections.request_connection(cur, "bob", "carol")
+    helper_connections.accept_connection(cur, "carol", "bob")
+    helper_connections.add_close_friend(cur, "carol", "bob")
+    helper_connections.request_connection(cur, "dave", "bob")
+
+    relationships = helper_connections.get_relationships(
+        cur, "bob", ["alice", "carol", "dave", "bob", "erin"]
+    )
+    assert relationships == {
+        "alice": ("connected", False, False, 1),
+        "carol": ("connected", False, True, 1),
+        "dave": ("incoming", False, False, 0),
+        "erin": (None, False, False, 0),
+    }
+    assert helper_connections.get_relationship_badge(relationships["dave"]) == (
+        "Wants to connect",
+        0,
+    )
+
+    helper_connections.block_connection(cur, "alice", "bob")
+    relationship = helper_connections.get_relationships(cur, "bob", ["alice"])["alice"]
+    assert relationship.connection_type == "blocked"
+    assert helper_connections.get_relationship_badge(relationship) == ("", 0)
+
+
+def test_get_shared_hobbies_and_interests():
+    """
+    Tests that hobbies and interests in common are found separately.
+    """
+    cur = create_connections()
+    cur.execute("CREATE TABLE UserHobby (username, hobby);")
+    cur.execute("CREATE TABLE UserInterests (username, interest);")
+    cur.executemany(
+        "INSERT INTO UserHobby VALUES (?, ?);",
+        [("alice", "chess"), ("alice", "golf"), ("bob", "golf"), ("carol", "go")],
+    )
+    cur.executemany(
+        "INSERT INTO UserInterests VALUES (?, ?);",
+        [("alice", "maths"), ("carol", "maths"), ("bob", "art")],
+    )
+    shared = helper_connections.get_shared_hobbies_and_interests
+    assert shared(cur, "alice", "bob") == (True, False)
+    assert shared(cur, "alice", "carol") == (False, True)
+    assert shared(cur, "bob", "carol") == (False, False)
+    assert shared(cur, "alice", "dave") == (False, False)
+
+
+def test_get_connection_degree_counts():
+    """
+    Tests that only accepted connections are counted, and that connections
+    without a known degree aren't counted as studying a different one.
+    """
+    cur = create_connections()
+    cur.execute("INSERT INTO ACCOUNTS VALUES ('dave');")
+    cur.execute("CREATE TABLE UserProfile (username, degree);")
+    cur.executemany(
+        "INSERT INTO UserProfile VALUES (?, ?);",
+        [("alice", 1), ("bob", 1), ("carol", 2)],
+    )
+    for user1, user2 in [("alice", "bob"), ("carol", "alice"), ("alice", "dave")]:
+        helper_connections.request_connection(cur, user1, user2)
+        helper_connections.accept_connection(cur, user2, user1)
+    helper_connections.request_connection(cur, "bob", "carol")
+
+    counts = helper_connections.get_connection_degree_counts(
+        cur, ["alice", "bob", "carol", "erin"]
+    )
+    assert counts == {"alice": (3, 1), "bob": (1, 0), "carol": (1, 1), "erin": (0, 0)}
+
+
+def test_same_cluster_ranks_higher():
+    """
+    Tests that being in the same community adds to the score of users who are
+    already similar, without changing the reason shown.
+    """
+    scores = helper_connections.calculate_similarity(
+        {}, {"chess": ["alice", "bob"]}, {}, ["carol"], {"bob", "carol", "dave"}
+    )
+    assert scores == {
+        "alice": [0, 5, 0, 0, 0],
+        "bob": [0, 5, 0, 0, helper_connections.CLUSTER_SCORE],
+        "carol": [0, 0, 0, 5, helper_connections.CLUSTER_SCORE],
+    }
@@ -0,0 +1,143 @@
+import sqlite3
+
+import pytest
+import student_network.helpers.helper_flashcards as helper_flashcards
+import student_network.helpers.helper_migrations as helper_migrations
+
+
+def create_old_sets() -> sqlite3.Connection:
+    """
+    Creates an in-memory database with flashcard sets stored the old way.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE QuestionSets (set_id INTEGER PRIMARY KEY AUTOINCREMENT "
+        "NOT NULL, set_name TEXT DEFAULT Unnamed, date_created DATE, author TEXT, "
+        "questions TEXT, answers TEXT, cards_played INTEGER DEFAULT (0));"
+    )
+    conn.executemany(
+        "INSERT INTO QuestionSets (set_id, author, questions, answers) "
+        "VALUES (?, 'student1', ?, ?);",
+        [(1, "q1|q2|q3", "a1|a2|a3"), (2, None, None), (3, "q1|q2", "a1")],
+    )
+    return conn
+
+
+def test_create_flashcards_migration():
+    """
+    Tests that cards are split out of the old columns in order.
+    """
+    conn = create_old_sets()
+    cur = conn.cursor()
+    helper_migrations._create_flashcards(cur)
+    helper_migrations._version_flashcards(cur)
+
+    assert [card[:3] for card in helper_flashcards.get_cards(cur, 1)] == [
+        (1, "q1", "a1"),
+        (2, "q2", "a2"),
+        (3, "q3", "a3"),
+    ]
+    assert helper_flashcards.get_cards(cur, 2) == []
+    # Questions without an answer are given an empty one.
+    assert [card[1:3] for card in helper_flashcards.get_cards(cur, 3)] == [
+        ("q1", "a1"),
+        ("q2", ""),
+    ]
+    assert [helper_flashcards.get_question_count(cur, x) for x in (1, 2, 3)] == [
+        3,
+        0,
+        2,
+    ]
+
+
+def test_insert_and_remove_cards():
+    """
+    Tests that adding and deleting cards keeps their order and the count.
+    """
+    conn = create_old_sets()
+    cur = conn.cursor()
+    helper_migrations._create_flashcards(cur)
+    helper_migrations._version_flashcards(cur)
+
+    assert helper_flashcards.remove_card(cur, 1, 2)
+    assert not helper_flashcards.remove_card(cur, 2, 1)
+    card_id = helper_flashcards.insert_card(cur, 1, "q4", "a4")
+    assert helper_flashcards.update_card(cur, 1, 1, "new q1", "new a1")
+
+    assert helper_flashcards.get_cards(cur, 1) == [
+        (1, "new q1", "new a1", 1),
+        (3, "q3", "a3", 0),
+        (card_id, "q4", "a4", 0),
+    ]
+    assert helper_flashcards.get_question_count(cur, 1) == 3
+
+
+def test_apply_card_changes():
+    """
+    Tests that changes from the editor are applied when the versions match.
+    """
+    conn = create_old_sets()
+    cur = conn.cursor()
+    helper_migrations._create_flashcards(cur)
+    helper_migrations._version_flashcards(cur)
+
+    changes = helper_flashcards.parse_card_changes(
+        {
+            "set_name": "Renamed",
+            "changed": [{"id": 1, "version": 0, "question": "new q1", "answer": "a1"}],
+            "added": [{"question": "q4", "answer": "a4"}],
+            "removed": [{"id": 2, "version": 0}],
+        }
+    )
+    result = helper_flashcards.apply_card_changes(cur, 1, changes)
+
+    assert result["changed"] == [{"id": 1, "version": 1}]
+    assert result["card_count"] == 3
+    card_id = result["added"][0]["id"]
+    assert helper_flashcards.get_cards(cur, 1) == [
+        (1, "new q1", "a1", 1),
+        (3, "q3", "a3", 0),
+        (card_id, "q4", "a4", 0),
+    ]
+    assert helper_flashcards.get_set_details(cur, 1)[0] == "Renamed"
+
+
+def test_apply_card_changes_conflict():
+    """
+    Tests that stale and deleted cards are reported instead of overwritten.
+    """
+    conn = create_old_sets()
+    cur = conn.cursor()
+    helper_migrations._create_flashcards(cur)
+    helper_migrations._version_flashcards(cur)
+    helper_flashcards.update_card(cur, 1, 1, "other q1", "other a1")
+
+    changes = helper_flashcards.parse_card_changes(
+        {
+            "changed": [{"id": 1, "version": 0, "question": "new q1", "answer": "a1"}],
+            "removed": [{"id": 4, "version": 0}],
+        }
+    )
+    with pytest.raises(helper_flashcards.CardConflictError) as error:
+        helper_flashcards.apply_card_changes(cur, 1, changes)
+    assert error.value.conflicts == [
+        {"id": 1, "question": "other q1", "answer": "other a1", "version": 1},
+        {"id": 4, "deleted": True},
+    ]
+
+
+def test_parse_card_changes_invalid():
+    """
+    Tests that malformed changes are rejected.
+    """
+    for data in (
+        [],
+        {"changed": {"id": 1}},
+        {"changed": [{"id": 1, "question": "q", "answer": "a"}]},
+        {"added": [{"question": "q"}]},
+        {"added": ["q"]},
+        {"added": [["q", "a"]]},
+        {"removed": [{"id": 1, "version": 0}, {"id": 1, "version": 0}]},
+    ):
+        with pytest.raises(ValueError):
+            helper_flashcards.parse_card_changes(data)
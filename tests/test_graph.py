@@ -0,0 +1,130 @@
+import sqlite3
+
+import student_network.helpers.helper_graph as helper_graph
+
+# A line of connections, a - b - c - d - e, with a second route from b to d
+# through x.
+EDGES = [
+    ("a", "b"),
+    ("c", "b"),
+    ("c", "d"),
+    ("d", "e"),
+    ("b", "x"),
+    ("x", "d"),
+]
+
+
+def test_graph_index():
+    """
+    Tests that each user's connections are found in both directions.
+    """
+    graph = helper_graph.ConnectionGraph.from_edges(EDGES)
+    neighbours = {
+        username: sorted(
+            graph.usernames[i] for i in graph.get_neighbours(graph.indexes[username])
+        )
+        for username in graph.usernames
+    }
+    assert neighbours == {
+        "a": ["b"],
+        "b": ["a", "c", "x"],
+        "c": ["b", "d"],
+        "d": ["c", "e", "x"],
+        "e": ["d"],
+        "x": ["b", "d"],
+    }
+
+
+def test_shortest_path():
+    """
+    Tests that a shortest path is found within the hop limit.
+    """
+    graph = helper_graph.ConnectionGraph.from_edges(EDGES)
+    assert graph.shortest_path("a", "a") == ["a"]
+    assert graph.shortest_path("a", "b") == ["a", "b"]
+    assert graph.shortest_path("a", "d") in (["a", "b", "c", "d"], ["a", "b", "x", "d"])
+    assert graph.shortest_path("c", "x") in (["c", "b", "x"], ["c", "d", "x"])
+    assert graph.shortest_path("a", "e") is None
+    assert graph.shortest_path("a", "e", max_hops=4) is not None
+    assert graph.shortest_path("a", "f") is None
+
+
+def test_shortest_path_limits():
+    """
+    Tests that excluded users are avoided, and that searches which visit too
+    many users give up.
+    """
+    graph = helper_graph.ConnectionGraph.from_edges(EDGES)
+    assert graph.shortest_path("a", "d", excluded=["x"]) == ["a", "b", "c", "d"]
+    assert graph.shortest_path("a", "d", excluded=["c", "x"]) is None
+    assert graph.shortest_path("a", "d", max_visited=3) is None
+
+
+def test_load_graph():
+    """
+    Tests that only users who have accepted each other's request are
+    connected in the index.
+    """
+    cur = sqlite3.connect(":memory:").cursor()
+    cur.execute("CREATE TABLE Connection (user1, user2, connection_type);")
+    cur.executemany(
+        "INSERT INTO Connection VALUES (?, ?, ?);",
+        [
+            ("a", "b", "connected"),
+            ("b", "c", "connected"),
+            ("c", "d", "request"),
+            ("a", "e", "block"),
+            ("e", "c", "connected"),
+        ],
+    )
+    graph = helper_graph.load_graph(cur)
+    assert graph.shortest_path("a", "c") == ["a", "b", "c"]
+    assert graph.shortest_path("a", "d") is None
+    assert helper_graph.get_blocked_with(cur, "e") == ["a"]
+
+
+def test_propagate_labels():
+    """
+    Tests that two groups joined by a single connection are found as separate
+    communities, numbered from the largest.
+    """
+    edges = [
+        (a, b)
+        for group in (["a", "b", "c", "d"], ["w", "x", "y"])
+        for i, a in enumerate(group)
+        for b in group[i + 1 :]
+    ]
+    graph = helper_graph.ConnectionGraph.from_edges(edges + [("d", "w")])
+    labels, rounds = helper_graph.propagate_labels(graph)
+    clusters = dict(zip(graph.usernames, labels))
+    assert {clusters[x] for x in "abcd"} == {0}
+    assert {clusters[x] for x in "wxy"} == {1}
+    assert rounds <= helper_graph.MAX_LABEL_ROUNDS
+
+
+def test_cluster_report(monkeypatch):
+    """
+    Tests that saved communities are summarised with their most common degree.
+    """
+    cur = sqlite3.connect(":memory:").cursor()
+    cur.execute("CREATE TABLE UserProfile (username, degree);")
+    cur.execute("CREATE TABLE UserCluster (username, cluster_id, computed_at);")
+    cur.executemany(
+        "INSERT INTO UserProfile VALUES (?, ?);",
+        [("a", 1), ("b", 2), ("c", 2), ("x", 1)],
+    )
+    monkeypatch.setattr(helper_graph.helper_reference, "get_degree_name", str)
+    graph = helper_graph.ConnectionGraph.from_edges(
+        [("a", "b"), ("b", "c"), ("x", "y")]
+    )
+    helper_graph.save_clusters(
+        cur, graph, [0 if x in "abc" else 1 for x in graph.usernames]
+    )
+
+    assert helper_graph.get_cluster_members(cur, "a", ["c", "x", "z", "c"]) == {"c"}
+    assert helper_graph.get_cluster_members(cur, "z", ["a", "b"]) == set()
+    report = helper_graph.get_cluster_report(cur, limit=1)
+    assert (report.cluster_count, report.clustered_users) == (2, 5)
+    assert report.largest == [
+        helper_graph.ClusterSummary(0, 3, "2", 2 / 3, ["a", "b", "c"])
+    ]
@@ -0,0 +1,22 @@
+import bcrypt
+import student_network.helpers.helper_hashing as helper_hashing
+
+
+def test_hash_and_check_password():
+    """
+    Tests that passwords hashed by the worker processes can be checked.
+    """
+    hashed_password = helper_hashing.hash_password("goodpw123")
+    assert helper_hashing.check_password("goodpw123", hashed_password)
+    assert not helper_hashing.check_password("badpw123", hashed_password)
+    assert not helper_hashing.needs_rehash(hashed_password)
+
+
+def test_needs_rehash():
+    """
+    Tests that hashes made with a different cost are marked to be replaced.
+    """
+    hashed_password = bcrypt.hashpw(b"goodpw123", bcrypt.gensalt(4))
+    assert helper_hashing.get_rounds(hashed_password) == 4
+    assert helper_hashing.needs_rehash(hashed_password)
+    assert helper_hashing.needs_rehash(hashed_password.decode("utf-8"))
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import time
+
+import pytest
+import student_network.helpers.helper_image_store as helper_image_store
+import student_network.helpers.helper_images as helper_images
+
+UNUSED = "a" * 64
+RECENT = "b" * 64
+USED = "c" * 64
+# Long enough ago to be past the grace period.
+OLD = time.time() - 2 * helper_image_store.GARBAGE_GRACE_PERIOD
+
+
+def save_files(kind: str, name: str, modified: float = OLD) -> list:
+    """
+    Creates an empty file for each size and format of an image.
+    """
+    file_paths = helper_images.get_image_files(kind, name)
+    for file_path in file_paths:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        open(file_path, "wb").close()
+        os.utime(file_path, (modified, modified))
+    return file_paths
+
+
+@pytest.fixture
+def conn(monkeypatch, tmp_path):
+    """
+    Tracks images in an empty database, saving them to a temporary directory.
+    """
+    monkeypatch.setattr(helper_images, "IMAGES_DIR", str(tmp_path))
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE Image (kind, name, referenceCount INTEGER NOT NULL DEFAULT 0, "
+        "uploaded INTEGER NOT NULL, PRIMARY KEY (kind, name));"
+    )
+    conn.execute(
+        "CREATE TABLE ImageUpload (kind, uploadHash, name, "
+        "PRIMARY KEY (kind, uploadHash));"
+    )
+    return conn
+
+
+def test_find_upload(conn):
+    """
+    Tests that a file uploaded before is only found once its image exists.
+    """
+    cur = conn.cursor()
+    upload_hash = helper_image_store.hash_upload(b"image")
+    helper_image_store.record_upload(cur, "post_imgs", upload_hash, UNUSED)
+    assert helper_image_store.find_upload(cur, "post_imgs", upload_hash) is None
+    save_files("post_imgs", UNUSED)
+    assert helper_image_store.find_upload(cur, "post_imgs", upload_hash) == UNUSED
+    assert helper_image_store.find_upload(cur, "avatars", upload_hash) is None
+
+
+def test_references(conn):
+    """
+    Tests that each use of an image is counted, and the count never goes
+    below zero.
+    """
+    cur = conn.cursor()
+    helper_image_store.add_references(cur, "post_imgs", [USED, USED, UNUSED])
+    helper_image_store.remove_references(cur, "post_imgs", [UNUSED, UNUSED, USED])
+    cur.execute("SELECT name, referenceCount FROM Image ORDER BY name;")
+    assert cur.fetchall() == [(UNUSED, 0), (USED, 1)]
+
+
+def create_garbage(conn) -> dict:
+    """
+    Saves an image which is no longer used, one which is unused but was
+    uploaded recently, one which is used, and untracked old and new files.
+    """
+    cur = conn.cursor()
+    unused_files = save_files("post_imgs", UNUSED)
+    helper_image_store.record_upload(cur, "post_imgs", "hash", UNUSED)
+    helper_image_store.add_references(cur, "post_imgs", [UNUSED])
+    helper_image_store.remove_references(cur, "post_imgs", [UNUSED])
+    cur.execute("UPDATE Image SET uploaded=? WHERE name=?;", (OLD, UNUSED))
+
+    save_files("post_imgs", RECENT)
+    helper_image_store.record_upload(cur, "post_imgs", "recent", RECENT)
+    save_files("avatars", USED)
+    helper_image_store.record_upload(cur, "avatars", "used", USED)
+    helper_image_store.add_references(cur, "avatars", [USED])
+    cur.execute("UPDATE Image SET uploaded=? WHERE name=?;", (OLD, USED))
+
+    old_files = save_files("avatars", "old")
+    new_files = save_files("avatars", "new", modified=time.time())
+    conn.commit()
+    return {"unused": unused_files, "old": old_files, "new": new_files}
+
+
+def test_collect_garbage_lists(conn):
+    """
+    Tests that unused files are only listed unless they're to be deleted.
+    """
+    files = create_garbage(conn)
+    unused = helper_image_store.collect_garbage(conn)
+    assert sorted(unused) == sorted(files["unused"] + files["old"])
+    assert all(os.path.exists(file_path) for file_path in unused)
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM Image;")
+    assert cur.fetchone()[0] == 3
+
+
+def test_collect_garbage_deletes(conn, tmp_path):
+    """
+    Tests that every file of an unused image past the grace period is
+    deleted along with its records and empty directories, and that other
+    images and new untracked files are kept.
+    """
+    files = create_garbage(conn)
+    unused = helper_image_store.collect_garbage(conn, delete=True)
+    assert sorted(unused) == sorted(files["unused"] + files["old"])
+    assert not any(os.path.exists(file_path) for file_path in unused)
+    # The shard directories the unused image was saved in are removed.
+    assert not os.path.exists(tmp_path / "post_imgs" / "aa")
+
+    assert helper_images.image_exists("post_imgs", RECENT)
+    assert helper_images.image_exists("avatars", USED)
+    assert all(os.path.exists(file_path) for file_path in files["new"])
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM Image ORDER BY name;")
+    assert cur.fetchall() == [(RECENT,), (USED,)]
+    cur.execute("SELECT uploadHash FROM ImageUpload ORDER BY uploadHash;")
+    assert cur.fetchall() == [("recent",), ("used",)]
@@ -0,0 +1,69 @@
+import student_network.helpers.helper_images as helper_images
+
+
+def test_get_variant_url(monkeypatch):
+    """
+    Tests that smaller sizes are only requested for images uploaded by users.
+    """
+    monkeypatch.setattr(helper_images, "image_exists", lambda kind, name: True)
+    avatar = "/media/avatars/abc.jpg"
+    assert helper_images.get_variant_url(avatar) == "/media/avatars/abc_thumb.jpg"
+    assert helper_images.get_variant_url(avatar, "full", "webp") == (
+        "/media/avatars/abc.webp"
+    )
+    # Profile pictures saved before media URLs were used are still recognised.
+    legacy_avatar = "/static/images/avatars/abc.jpg"
+    assert helper_images.get_variant_url(legacy_avatar) == (
+        "/media/avatars/abc_thumb.jpg"
+    )
+    default = "/static/images/default-pfp.jpg"
+    assert helper_images.get_variant_url(default) == default
+    assert helper_images.get_variant_url(None) is None
+
+
+def test_get_post_image_urls(monkeypatch):
+    """
+    Tests that post images are shown at their feed size, linking to full size.
+    """
+    monkeypatch.setattr(helper_images, "image_exists", lambda kind, name: True)
+    urls = helper_images.get_post_image_urls("abc")
+    assert urls == {
+        "src": "/media/post_imgs/abc_feed.jpg",
+        "webp": "/media/post_imgs/abc_feed.webp",
+        "full": "/media/post_imgs/abc.jpg",
+    }
+
+
+def test_content_addressed_urls():
+    """
+    Tests that images named by their hash are split across subdirectories.
+    """
+    name = "ab" + "cd" + "0" * 60
+    url = "/media/post_imgs/ab/cd/{}.jpg".format(name)
+    assert helper_images.get_post_image_urls(name)["full"] == url
+    assert helper_images.parse_image_url(url) == ("post_imgs", name)
+    assert helper_images.get_variant_url(url) == (
+        "/media/post_imgs/ab/cd/{}_thumb.jpg".format(name)
+    )
+    assert not helper_images.is_content_hash("6c994a3b-c67f-45f5-8729-72ff53f1c819")
+
+
+def test_missing_sizes_use_original(monkeypatch, tmp_path):
+    """
+    Tests that older images whose smaller sizes haven't been generated yet
+    are shown using their original.
+    """
+    monkeypatch.setattr(helper_images, "IMAGES_DIR", str(tmp_path))
+    assert helper_images.get_variant_url("/static/images/avatars/abc.jpg") == (
+        "/media/avatars/abc.jpg"
+    )
+    assert helper_images.get_post_image_urls("abc") == {
+        "src": "/media/post_imgs/abc.jpg",
+        "webp": None,
+        "full": "/media/post_imgs/abc.jpg",
+    }
+    # Images named by their hash always have every size.
+    name = "ab" + "cd" + "0" * 60
+    assert helper_images.get_variant_url(helper_images.get_avatar_url(name)).endswith(
+        "_thumb.jpg"
+    )
@@ -179,3 +179,15 @@ def test_null_registration():
         cur = conn.cursor()
         valid, _ = helper_login.validate_registration(cur, "", "", "", "", "", "")
         assert valid is False
+
+
+def test_academic_domains():
+    """
+    Tests that only educational email domains are allowed, without looking
+    them up online.
+    """
+    assert helper_login.is_academic_domain("exeter.ac.uk")
+    assert helper_login.is_academic_domain("harvard.edu")
+    assert helper_login.is_academic_domain("sydney.edu.au")
+    assert not helper_login.is_academic_domain("gmail.com")
+    assert not helper_login.is_academic_domain("ac.example.com")
@@ -0,0 +1,86 @@
+import pytest
+import student_network.helpers.helper_images as helper_images
+import student_network.views.media as media
+from flask import Flask
+
+NAME = "ab" + "cd" + "0" * 60
+URL = "/media/post_imgs/ab/cd/{}_feed.jpg".format(NAME)
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """
+    Serves uploaded images from a temporary directory holding one image.
+    """
+    monkeypatch.setattr(helper_images, "IMAGES_DIR", str(tmp_path))
+    directory = tmp_path / "post_imgs" / "ab" / "cd"
+    directory.mkdir(parents=True)
+    (directory / "{}_feed.jpg".format(NAME)).write_bytes(b"0123456789")
+    app = Flask(__name__)
+    app.register_blueprint(media.media_blueprint)
+    return app
+
+
+def test_media_cached(app):
+    """
+    Tests that images are cached indefinitely, and only sent again when the
+    browser doesn't already have them.
+    """
+    client = app.test_client()
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.data == b"0123456789"
+    assert response.mimetype == "image/jpeg"
+    cache_control = response.cache_control
+    assert cache_control.max_age == media.MEDIA_MAX_AGE
+    assert cache_control.public and cache_control.immutable
+
+    etag = response.headers["ETag"]
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_media_range(app):
+    """
+    Tests that part of an image can be requested.
+    """
+    response = app.test_client().get(URL, headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.data == b"2345"
+    assert response.headers["Content-Range"] == "bytes 2-5/10"
+
+
+def test_media_not_found(app):
+    """
+    Tests that unknown kinds of images, paths outside the image directories
+    and missing images aren't found.
+    """
+    client = app.test_client()
+    for url in (
+        "/media/static/ab/cd/{}_feed.jpg".format(NAME),
+        "/media/post_imgs/../db.sqlite3",
+        "/media/post_imgs/ab/cd/{}_feed.png".format(NAME),
+        "/media/post_imgs/ab/cd/{}_thumb.jpg".format(NAME),
+    ):
+        assert client.get(url).status_code == 404
+
+
+def test_media_accel_redirect(app):
+    """
+    Tests that nginx is told which file to send, with the same caching
+    headers, when the transfer is handed off to it.
+    """
+    app.config["MEDIA_ACCEL_REDIRECT"] = "/internal/"
+    client = app.test_client()
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"] == (
+        "/internal/post_imgs/ab/cd/{}_feed.jpg".format(NAME)
+    )
+    assert response.data == b""
+    assert response.mimetype == "image/jpeg"
+    assert response.cache_control.immutable
+
+    etag = response.headers["ETag"]
+    assert client.get(URL, headers={"If-None-Match": etag}).status_code == 304
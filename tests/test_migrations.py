@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+import student_network.helpers.helper_migrations as helper_migrations
+
+
+def test_failed_migration_rolled_back(monkeypatch):
+    """
+    Tests that a migration which fails part of the way through leaves neither
+    its changes nor a new version behind, so that it is retried next time.
+    """
+    conn = sqlite3.connect(":memory:")
+
+    def create_table(cur):
+        cur.execute("CREATE TABLE Example (value TEXT);")
+
+    def fail_after_change(cur):
+        cur.execute("ALTER TABLE Example ADD COLUMN added TEXT;")
+        cur.execute("INSERT INTO Example VALUES ('a', 'b');")
+        raise sqlite3.OperationalError("failed")
+
+    monkeypatch.setattr(
+        helper_migrations, "MIGRATIONS", [create_table, fail_after_change]
+    )
+    with pytest.raises(sqlite3.OperationalError):
+        helper_migrations.apply_migrations(conn)
+
+    cur = conn.cursor()
+    assert helper_migrations.get_schema_version(cur) == 1
+    cur.execute("SELECT name FROM pragma_table_info('Example');")
+    assert cur.fetchall() == [("value",)]
+    cur.execute("SELECT COUNT(*) FROM Example;")
+    assert cur.fetchone()[0] == 0
+
+    monkeypatch.setattr(helper_migrations, "MIGRATIONS", [create_table])
+    assert helper_migrations.apply_migrations(conn) == 1
+    assert conn.isolation_level == ""
+
+
+def test_flashcards_split_out():
+    """
+    Tests that the cards of each set are moved into their own rows, keeping
+    the original columns.
+    """
+    cur = sqlite3.connect(":memory:").cursor()
+    cur.execute(
+        "CREATE TABLE QuestionSets (set_id INTEGER PRIMARY KEY, questions TEXT, "
+        "answers TEXT);"
+    )
+    cur.executemany(
+        "INSERT INTO QuestionSets VALUES (?, ?, ?);",
+        [(1, "a|b", "1"), (2, None, None)],
+    )
+    helper_migrations._create_flashcards(cur)
+
+    cur.execute("SELECT set_id, position, question, answer FROM Flashcard;")
+    assert cur.fetchall() == [(1, 0, "a", "1"), (1, 1, "b", "")]
+    cur.execute("SELECT set_id, questions, card_count FROM QuestionSets;")
+    assert cur.fetchall() == [(1, "a|b", 2), (2, None, 0)]
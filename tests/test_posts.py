@@ -0,0 +1,81 @@
+import sqlite3
+
+import student_network.helpers.helper_posts as helper_posts
+from flask import session
+from student_network.app import app
+
+
+def create_posts():
+    """
+    Creates a database with posts of each privacy setting on one profile.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE POSTS (postId INTEGER PRIMARY KEY, body VARCHAR, "
+        "likes INTEGER, username VARCHAR, date DATE, privacy VARCHAR);"
+    )
+    cur.execute(
+        "CREATE TABLE Comments (commentId INTEGER PRIMARY KEY, postId INTEGER);"
+    )
+    cur.execute("CREATE TABLE UserLikes (postId INTEGER, username VARCHAR);")
+    privacies = ["public", "protected", "close", "private", "deleted"]
+    cur.executemany(
+        "INSERT INTO POSTS VALUES (?, 'post', 0, 'student1', '2021-03-01', ?);",
+        [(i, privacies[i % 5]) for i in range(1, 26)],
+    )
+    cur.executemany("INSERT INTO Comments (postId) VALUES (?);", [(5,), (5,), (6,)])
+    cur.execute("INSERT INTO UserLikes VALUES (6, 'student2');")
+    return cur
+
+
+def test_profile_posts_pages():
+    """
+    Tests that pages of posts follow on from each other, newest first.
+    """
+    cur = create_posts()
+    with app.test_request_context():
+        ids = []
+        before = None
+        while True:
+            posts, before = helper_posts.get_profile_posts(
+                cur, "student1", "owner", before, limit=4
+            )
+            ids.extend(post["postId"] for post in posts)
+            if before is None:
+                break
+    assert ids == [i for i in range(25, 0, -1) if i % 5 != 4]
+    assert helper_posts.count_profile_posts(cur, "student1", "owner") == 20
+
+
+def test_profile_posts_privacy():
+    """
+    Tests that each tier of viewer only sees the posts meant for them.
+    """
+    cur = create_posts()
+    with app.test_request_context():
+        for tier, privacies in [
+            ("public", {"Public"}),
+            ("connection", {"Public", "Friends only"}),
+            ("close_friend", {"Public", "Friends only", "Close friends only"}),
+        ]:
+            posts, _ = helper_posts.get_profile_posts(cur, "student1", tier)
+            assert {post["privacy"] for post in posts} == privacies
+            assert helper_posts.count_profile_posts(cur, "student1", tier) == 5 * len(
+                privacies
+            )
+
+
+def test_profile_posts_counts():
+    """
+    Tests that comment counts and likes are looked up for the whole page.
+    """
+    cur = create_posts()
+    with app.test_request_context():
+        session["username"] = "student2"
+        posts, _ = helper_posts.get_profile_posts(cur, "student1", "owner", before=8)
+    posts = {post["postId"]: post for post in posts}
+    assert posts[5]["comments"] == 2
+    assert posts[6]["comments"] == 1
+    assert posts[6]["liked"]
+    assert not posts[7]["liked"]
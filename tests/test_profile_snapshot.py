@@ -0,0 +1,128 @@
+import sqlite3
+
+import student_network.helpers.helper_profile_snapshot as helper_profile_snapshot
+import student_network.helpers.helper_reference as helper_reference
+
+
+def create_profile():
+    """
+    Creates a database with a single user's profile.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.executescript(
+        "CREATE TABLE ACCOUNTS (username TEXT, email TEXT, type TEXT);"
+        "CREATE TABLE UserProfile (username TEXT, name TEXT, bio TEXT, "
+        "gender TEXT, birthday DATE, profilepicture TEXT, degree INTEGER);"
+        "CREATE TABLE Degree (degreeId INTEGER, degree TEXT);"
+        "CREATE TABLE UserLevel (username TEXT, experience INTEGER);"
+        "CREATE TABLE UserHobby (username TEXT, hobby TEXT);"
+        "CREATE TABLE UserInterests (username TEXT, interest TEXT);"
+        "CREATE TABLE UserSocial (username TEXT, social TEXT, link TEXT);"
+        "CREATE TABLE Achievements (achievement_ID INTEGER, description TEXT, "
+        "icon TEXT, rarity TEXT, xp_value INTEGER, achievement_name TEXT);"
+        "CREATE TABLE CompleteAchievements (username TEXT, achievement_ID INTEGER);"
+        "CREATE TABLE Quiz (quiz_id INTEGER PRIMARY KEY, quiz_name TEXT, "
+        "date_created DATE, author TEXT, plays INTEGER, question_count INTEGER);"
+        "CREATE TABLE QuestionSets (set_id INTEGER PRIMARY KEY, set_name TEXT, "
+        "date_created DATE, author TEXT, cards_played INTEGER, card_count INTEGER);"
+        "CREATE TABLE inventory_items (id INTEGER PRIMARY KEY, name TEXT, "
+        "description TEXT, rarity INTEGER, type TEXT);"
+        "CREATE TABLE inventory_backgrounds (id INTEGER, url TEXT);"
+        "CREATE TABLE POSTS (postId INTEGER PRIMARY KEY, username TEXT, "
+        "privacy TEXT);"
+        "INSERT INTO ACCOUNTS VALUES ('student1', 'student1@exeter.ac.uk', "
+        "'student');"
+        "INSERT INTO UserProfile VALUES ('student1', 'Student One', 'Hello', "
+        "'Female', '2001-02-03', '/static/images/default-pfp.jpg', 1);"
+        "INSERT INTO Degree VALUES (1, 'Computer Science');"
+        "INSERT INTO UserLevel VALUES ('student1', 120);"
+        "INSERT INTO UserHobby VALUES ('student1', 'chess');"
+        "INSERT INTO UserInterests VALUES ('student1', 'maths');"
+        "INSERT INTO UserSocial VALUES ('student1', 'twitter', 'student1');"
+        "INSERT INTO Quiz VALUES (1, 'Quiz', '2021-03-01', 'student1', 3, 4);"
+        "INSERT INTO POSTS VALUES (1, 'student1', 'public');"
+        "INSERT INTO POSTS VALUES (2, 'student1', 'protected');"
+    )
+    cur.executemany(
+        "INSERT INTO Achievements VALUES (?, '', '', '', ?, '');",
+        [(i, i * 10) for i in range(1, 9)],
+    )
+    cur.executemany(
+        "INSERT INTO CompleteAchievements VALUES ('student1', ?);",
+        [(i,) for i in range(1, 9)],
+    )
+    return cur
+
+
+def test_load_profile_snapshot(monkeypatch):
+    """
+    Tests that the snapshot holds everything shown in a profile's header.
+    """
+    cur = create_profile()
+    monkeypatch.setattr(
+        helper_reference,
+        "_reference_data",
+        helper_reference.load_reference_data(cur, 1),
+    )
+    snapshot = helper_profile_snapshot.load_profile_snapshot(cur, "student1", "owner")
+    assert snapshot.name == "Student One"
+    assert snapshot.email == "student1@exeter.ac.uk"
+    assert snapshot.degree == "Computer Science"
+    assert snapshot.hobbies == ["chess"]
+    assert snapshot.interests == ["maths"]
+    assert snapshot.socials == {"twitter": "student1"}
+    assert [quiz[0] for quiz in snapshot.quizzes] == [1]
+    assert snapshot.flashcards == []
+    assert [achievement[3] for achievement in snapshot.achievements] == [
+        80,
+        70,
+        60,
+        50,
+        40,
+        30,
+    ]
+    assert (snapshot.level, snapshot.current_xp) == (2, 20)
+    assert snapshot.total_posts == 2
+
+    snapshot = helper_profile_snapshot.load_profile_snapshot(cur, "student1", "public")
+    assert snapshot.total_posts == 1
+    assert (
+        helper_profile_snapshot.load_profile_snapshot(cur, "nobody", "public") is None
+    )
+
+
+def test_invalidate_profile_snapshot():
+    """
+    Tests that invalidating a profile removes its snapshot for every tier.
+    """
+    cache = helper_profile_snapshot.profile_snapshot_cache
+    for tier in helper_profile_snapshot.TIERS:
+        cache.set(("student1", tier), tier)
+    cache.set(("student2", "public"), "public")
+    helper_profile_snapshot.invalidate_profile_snapshot("student1")
+    for tier in helper_profile_snapshot.TIERS:
+        assert cache.get(("student1", tier)) is None
+    assert cache.get(("student2", "public")) == "public"
+    cache.clear()
+
+
+def test_public_profile_page():
+    """
+    Tests that cached pages stop being served once the profile changes.
+    """
+    version = helper_profile_snapshot.get_profile_version("student1")
+    helper_profile_snapshot.set_public_profile_page("student1", version, "page")
+    assert helper_profile_snapshot.get_public_profile_page("student1", version) == (
+        "page"
+    )
+
+    helper_profile_snapshot.bump_profile_version("student1")
+    version = helper_profile_snapshot.get_profile_version("student1")
+    assert helper_profile_snapshot.get_public_profile_page("student1", version) is None
+
+    helper_profile_snapshot.set_public_profile_page("student1", version, "page")
+    helper_profile_snapshot.invalidate_profile_snapshot("student1")
+    version = helper_profile_snapshot.get_profile_version("student1")
+    assert helper_profile_snapshot.get_public_profile_page("student1", version) is None
+    helper_profile_snapshot.profile_page_cache.clear()
@@ -0,0 +1,148 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import student_network.helpers.helper_hashing as helper_hashing
+import student_network.helpers.helper_provisioning as helper_provisioning
+
+DEGREES = {"Computer Science": 1, "1": 1}
+
+
+def make_row(number: int, username: str, **details) -> dict:
+    """
+    Creates the details of a student as read from the CSV file.
+    """
+    row = {
+        "row": number,
+        "username": username,
+        "name": "Student Name",
+        "email": "{}@exeter.ac.uk".format(username),
+        "degree": "Computer Science",
+        "hobbies": ["chess"],
+        "interests": [],
+        "password": None,
+    }
+    row.update(details)
+    return row
+
+
+def create_accounts():
+    """
+    Creates a database with the tables that accounts are created in, and one
+    existing account.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE ACCOUNTS (username TEXT PRIMARY KEY, password, "
+        "email TEXT UNIQUE, type);"
+    )
+    cur.execute(
+        "CREATE TABLE UserProfile (username, name, bio, gender, birthday, "
+        "profilepicture, degree);"
+    )
+    cur.execute("CREATE TABLE UserLevel (username, experience);")
+    cur.execute("CREATE TABLE UserHobby (username, hobby);")
+    cur.execute("CREATE TABLE UserInterests (username, interest);")
+    cur.execute(
+        "INSERT INTO ACCOUNTS VALUES " "('taken', '', 'taken@exeter.ac.uk', 'student');"
+    )
+    conn.commit()
+    return conn
+
+
+def test_validate_row():
+    """
+    Tests that rows are checked with the same rules as registering, except
+    that the password can be left out.
+    """
+    assert helper_provisioning.validate_row(make_row(2, "student1"), DEGREES) == ""
+    assert (
+        helper_provisioning.validate_row(
+            make_row(2, "student1", degree="1", password="goodpw123"), DEGREES
+        )
+        == ""
+    )
+    for details, error in [
+        ({"username": "bad name"}, "Username must only"),
+        ({"name": ""}, "Not all fields"),
+        ({"name": "Name 2"}, "Full name must only"),
+        ({"email": "student1@gmail.com"}, "Email does not belong"),
+        ({"email": "student1@"}, "Email is invalid"),
+        ({"degree": "History"}, "Degree does not exist"),
+        ({"password": "short1"}, "Password does not meet"),
+    ]:
+        row = make_row(2, "student1")
+        row.update(details)
+        assert helper_provisioning.validate_row(row, DEGREES).startswith(error)
+
+
+def test_provision_batch(monkeypatch):
+    """
+    Tests that only valid rows which aren't already registered or repeated in
+    the file are created, with a password generated when none is given.
+    """
+    monkeypatch.setattr(helper_hashing, "BCRYPT_ROUNDS", 4)
+    conn = create_accounts()
+    batch = [
+        make_row(2, "student1", password="goodpw123", interests=["maths"]),
+        make_row(3, "student2"),
+        make_row(4, "taken"),
+        make_row(5, "student1", email="other@exeter.ac.uk"),
+        make_row(6, "student3", email="student2@exeter.ac.uk"),
+        make_row(7, "student4", degree="History"),
+    ]
+    seen = set()
+    with ThreadPoolExecutor() as executor:
+        results = helper_provisioning.provision_batch(
+            conn, executor, batch, DEGREES, seen
+        )
+
+    assert [(x["row"], x["status"]) for x in results] == [
+        (2, "created"),
+        (3, "created"),
+        (4, "failed"),
+        (5, "failed"),
+        (6, "failed"),
+        (7, "failed"),
+    ]
+    assert results[2]["error"] == "Username has already been registered!"
+    assert results[3]["error"] == results[4]["error"]
+    assert results[0]["password"] == ""
+    generated = results[1]["password"]
+    row = make_row(3, "student2", password=generated)
+    assert helper_provisioning.validate_row(row, DEGREES) == ""
+
+    cur = conn.cursor()
+    cur.execute("SELECT username, password FROM ACCOUNTS ORDER BY username;")
+    accounts = dict(cur.fetchall())
+    assert sorted(accounts) == ["student1", "student2", "taken"]
+    assert bcrypt.checkpw(b"goodpw123", accounts["student1"])
+    assert bcrypt.checkpw(generated.encode(), accounts["student2"])
+    cur.execute("SELECT username, degree FROM UserProfile;")
+    assert cur.fetchall() == [("student1", 1), ("student2", 1)]
+    cur.execute("SELECT * FROM UserHobby;")
+    assert cur.fetchall() == [("student1", "chess"), ("student2", "chess")]
+    cur.execute("SELECT * FROM UserInterests;")
+    assert cur.fetchall() == [("student1", "maths")]
+
+
+def test_provision_batch_conflict(monkeypatch):
+    """
+    Tests that when a batch can't be inserted together, the other rows are
+    still created.
+    """
+    monkeypatch.setattr(helper_hashing, "BCRYPT_ROUNDS", 4)
+    conn = create_accounts()
+    # Registered after the batch was checked, such as by another process.
+    monkeypatch.setattr(helper_provisioning, "find_taken", lambda cur, rows: {})
+    batch = [make_row(2, "student1"), make_row(3, "taken", email="new@exeter.ac.uk")]
+    with ThreadPoolExecutor() as executor:
+        results = helper_provisioning.provision_batch(
+            conn, executor, batch, DEGREES, set()
+        )
+
+    assert [x["status"] for x in results] == ["created", "failed"]
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM UserProfile;")
+    assert cur.fetchone()[0] == 1
@@ -0,0 +1,125 @@
+import random
+import sqlite3
+
+import student_network.helpers.helper_quizzes as helper_quizzes
+
+
+def test_sample_indices_distinct():
+    """
+    Tests that sampled indices are distinct and never the excluded index.
+    """
+    rng = random.Random(1)
+    for exclude in (None, 0, 5, 9):
+        picked = helper_quizzes.sample_indices(rng, 10, 9, exclude)
+        assert len(picked) == len(set(picked))
+        assert exclude not in picked
+        assert all(0 <= index < 10 for index in picked)
+    # All the other indices are given when there aren't enough.
+    assert sorted(helper_quizzes.sample_indices(rng, 3, 5, 1)) == [0, 2]
+
+
+def test_generate_distractors():
+    """
+    Tests that wrong answers are different from each other and the answer.
+    """
+    answers = ["a", "b", "c", "d", "b", ""]
+    for distractors, answer in zip(
+        helper_quizzes.generate_distractors(answers, seed=1), answers
+    ):
+        assert len(distractors) == 3
+        assert len(set(distractors)) == 3
+        assert answer not in distractors
+        assert "" not in distractors
+
+
+def test_generate_distractors_small_set():
+    """
+    Tests that small sets give fewer wrong answers instead of duplicates.
+    """
+    assert helper_quizzes.generate_distractors(["a", "b", "a"], seed=1) == [
+        ["b"],
+        ["a"],
+        ["b"],
+    ]
+
+
+def test_generate_distractors_seed():
+    """
+    Tests that the same seed picks the same wrong answers.
+    """
+    answers = [str(i) for i in range(1000)]
+    for rank_by_similarity in (False, True):
+        assert helper_quizzes.generate_distractors(
+            answers, seed=42, rank_by_similarity=rank_by_similarity
+        ) == helper_quizzes.generate_distractors(
+            answers, seed=42, rank_by_similarity=rank_by_similarity
+        )
+
+
+def test_generate_distractors_similarity():
+    """
+    Tests that ranking prefers wrong answers which look like the answer.
+    """
+    answers = ["the mitochondria", "the nucleus", "x", "y", "z"]
+    distractors = helper_quizzes.generate_distractors(
+        answers, seed=1, rank_by_similarity=True, count=1
+    )
+    assert distractors[0] == ["the nucleus"]
+    assert distractors[1] == ["the mitochondria"]
+
+
+def test_get_attempt_questions():
+    """
+    Tests that options are shown in the order fixed for the attempt.
+    """
+    questions = {
+        3: ("What is 1 + 1?", ["2", "3", "4", "5"]),
+        7: ("What is 2 + 2?", ["4", "5", "6", "7"]),
+    }
+    order = [[7, [2, 0, 3, 1]], [3, [0, 1, 2, 3]]]
+    texts, options = helper_quizzes.get_attempt_questions(questions, order)
+    assert texts == ["What is 2 + 2?", "What is 1 + 1?"]
+    assert options == [["6", "4", "7", "5"], ["2", "3", "4", "5"]]
+
+
+def test_parse_choices():
+    """
+    Tests that every question must be answered with a valid option.
+    """
+    assert helper_quizzes.parse_choices(
+        {"userAnswer0": "3", "userAnswer1": "0"}, 2
+    ) == [3, 0]
+    assert helper_quizzes.parse_choices({"userAnswer0": "3"}, 2) is None
+    assert helper_quizzes.parse_choices({"userAnswer0": "4"}, 1) is None
+    assert helper_quizzes.parse_choices({"userAnswer0": "Drones"}, 1) is None
+
+
+def test_attempt_invalid_after_quiz_changed():
+    """
+    Tests that an attempt whose questions have been removed from the quiz
+    isn't graded, and that a new attempt is started instead of carrying it on.
+    """
+    cur = sqlite3.connect(":memory:").cursor()
+    cur.executescript(
+        "CREATE TABLE Quiz (quiz_id INTEGER PRIMARY KEY, quiz_name, author, "
+        "question_count);"
+        "CREATE TABLE Question (question_id INTEGER PRIMARY KEY, quiz_id, "
+        "question, answer_1, answer_2, answer_3, answer_4);"
+        "CREATE TABLE QuizAttempt (attempt_id INTEGER PRIMARY KEY, quiz_id, "
+        "username, questions, started, answers, score, submitted);"
+        "INSERT INTO Quiz VALUES (1, 'Quiz', 'author', 2);"
+        "INSERT INTO Question VALUES (1, 1, 'One?', 'a', 'b', 'c', 'd');"
+        "INSERT INTO Question VALUES (2, 1, 'Two?', 'a', 'b', 'c', 'd');"
+    )
+    questions = helper_quizzes.get_questions(cur, 1)
+    attempt_id, _ = helper_quizzes.start_attempt(cur, 1, "student1", questions)
+    assert helper_quizzes.start_attempt(cur, 1, "student1", questions)[0] == (
+        attempt_id
+    )
+
+    cur.execute("DELETE FROM Question WHERE question_id=2;")
+    assert helper_quizzes.grade_attempt(cur, attempt_id, "student1", [0, 0]) is None
+    questions = helper_quizzes.get_questions(cur, 1)
+    new_attempt_id, order = helper_quizzes.start_attempt(cur, 1, "student1", questions)
+    assert new_attempt_id != attempt_id
+    assert [question_id for question_id, _ in order] == [1]
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+import student_network.helpers.helper_achievements as helper_achievements
+import student_network.helpers.helper_reference as helper_reference
+
+
+def create_reference_tables():
+    """
+    Creates a database with a few rows in each reference table.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.executescript(
+        "CREATE TABLE Achievements (achievement_ID INTEGER PRIMARY KEY, "
+        "achievement_name TEXT, description TEXT, xp_value INTEGER, icon TEXT, "
+        "rarity TEXT);"
+        "CREATE TABLE CompleteAchievements (username TEXT, achievement_ID INTEGER);"
+        "CREATE TABLE Degree (degreeId INTEGER PRIMARY KEY, degree TEXT);"
+        "INSERT INTO Achievements VALUES (1, 'One', 'First', 25, 'eye', 'bronze');"
+        "INSERT INTO Achievements VALUES (2, 'Two', 'Second', 50, 'eye', 'silver');"
+        "INSERT INTO Achievements VALUES (3, 'Three', 'Third', 10, 'eye', 'bronze');"
+        "INSERT INTO CompleteAchievements VALUES ('student1', 1);"
+        "INSERT INTO CompleteAchievements VALUES ('student1', 2);"
+        "INSERT INTO Degree VALUES (1, 'Not specified');"
+        "INSERT INTO Degree VALUES (2, 'Computer Science BSc');"
+    )
+    return cur
+
+
+def test_load_reference_data():
+    """
+    Tests that the reference tables are read into maps which can't be changed.
+    """
+    reference_data = helper_reference.load_reference_data(create_reference_tables(), 3)
+    assert reference_data.version == 3
+    assert reference_data.achievements[2].name == "Two"
+    assert reference_data.achievements[2][3] == 50
+    assert reference_data.degrees[2] == "Computer Science BSc"
+    with pytest.raises(TypeError):
+        reference_data.degrees[3] = "History BA"
+
+
+def test_get_unlocked_achievements(monkeypatch):
+    """
+    Tests that unlocked achievements are looked up from the reference data,
+    rarest first.
+    """
+    cur = create_reference_tables()
+    monkeypatch.setattr(
+        helper_reference,
+        "_reference_data",
+        helper_reference.load_reference_data(cur, 1),
+    )
+    unlocked = helper_achievements.get_unlocked_achievements(cur, "student1")
+    assert [achievement.achievement_id for achievement in unlocked] == [2, 1]
+    assert helper_achievements.get_unlocked_achievements(cur, "student2") == []
+    assert helper_reference.get_degree_name(1) == "Not specified"
+    assert helper_reference.get_degree_name(9) is None
+
+
+def test_reference_data_reloaded_when_old(monkeypatch):
+    """
+    Tests that a copy older than the maximum age is replaced, so that other
+    worker processes pick up reloads.
+    """
+    cur = create_reference_tables()
+    reference_data = helper_reference.load_reference_data(cur, 1)
+    monkeypatch.setattr(helper_reference, "_reference_data", reference_data)
+    assert helper_reference.get_reference_data() is reference_data
+
+    monkeypatch.setattr(
+        helper_reference,
+        "_reference_data",
+        reference_data._replace(loaded_at=reference_data.loaded_at - 3600),
+    )
+    monkeypatch.setattr(
+        helper_reference,
+        "reload_reference_data",
+        lambda: helper_reference.load_reference_data(cur, 2),
+    )
+    assert helper_reference.get_reference_data().version == 2
@@ -1,3 +1,6 @@
+import sqlite3
+
+import student_network.helpers.helper_events as helper_events
 import student_network.helpers.helper_profile as helper_profile
 
 
@@ -46,3 +49,96 @@ def test_null_edit_profile():
     """
     valid, _ = helper_profile.validate_edit_profile("", "Male", "", [], [])
     assert valid is True
+
+
+def create_profile():
+    """
+    Creates a database with a single user's profile, hobbies and socials.
+    """
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.executescript(
+        "CREATE TABLE UserProfile (username TEXT PRIMARY KEY, bio TEXT, "
+        "gender TEXT, birthday DATE, profilepicture TEXT, degree INTEGER);"
+        "CREATE TABLE UserHobby (username TEXT, hobby TEXT, "
+        "PRIMARY KEY (username, hobby));"
+        "CREATE TABLE UserInterests (username TEXT, interest TEXT, "
+        "PRIMARY KEY (username, interest));"
+        "CREATE TABLE UserSocial (username TEXT, social, link, "
+        "PRIMARY KEY (username, social));"
+        "INSERT INTO UserProfile VALUES ('student1', 'Hello', 'Male', "
+        "'2001-05-31', '/static/images/default-pfp.jpg', 1);"
+        "INSERT INTO UserHobby VALUES ('student1', 'chess');"
+        "INSERT INTO UserHobby VALUES ('student1', 'running');"
+        "INSERT INTO UserSocial VALUES ('student1', 'twitter', 'student1');"
+        "INSERT INTO UserSocial VALUES ('student1', 'youtube', 'student1');"
+    )
+    return cur
+
+
+def test_diff_items():
+    """
+    Tests that only the items which changed are added or removed.
+    """
+    added, removed = helper_profile.diff_items(
+        ["chess", "running"], ["chess", "", "reading", "reading"]
+    )
+    assert added == ["reading"]
+    assert removed == ["running"]
+    assert helper_profile.diff_items(["chess"], ["chess"]) == ([], [])
+
+
+def test_update_profile():
+    """
+    Tests that editing a profile only writes and reports what changed.
+    """
+    cur = create_profile()
+    change = helper_profile.update_profile(
+        cur,
+        "student1",
+        {"bio": "Hello", "gender": "Female", "birthday": "2001-05-31", "degree": "1"},
+        {"hobbies": ["chess", "reading"], "interests": ["maths"]},
+    )
+    assert change == helper_profile.ProfileChange(
+        "student1", frozenset({"gender", "hobbies", "interests"})
+    )
+    cur.execute("SELECT hobby FROM UserHobby ORDER BY hobby;")
+    assert cur.fetchall() == [("chess",), ("reading",)]
+    cur.execute("SELECT interest FROM UserInterests;")
+    assert cur.fetchall() == [("maths",)]
+
+    change = helper_profile.update_profile(
+        cur,
+        "student1",
+        {"bio": "Hello", "gender": "Female", "birthday": "2001-05-31", "degree": "1"},
+        {"hobbies": ["reading", "chess"], "interests": ["maths"]},
+    )
+    assert not change.fields
+
+
+def test_update_socials():
+    """
+    Tests that socials are only written and removed when they change.
+    """
+    cur = create_profile()
+    change = helper_profile.update_socials(
+        cur, "student1", {"twitter": "student1", "youtube": "", "instagram": "s1"}
+    )
+    assert change.fields == {"socials"}
+    cur.execute("SELECT social, link FROM UserSocial ORDER BY social;")
+    assert cur.fetchall() == [("instagram", "s1"), ("twitter", "student1")]
+    change = helper_profile.update_socials(
+        cur, "student1", {"twitter": "student1", "instagram": "s1"}
+    )
+    assert not change.fields
+
+
+def test_publish_event():
+    """
+    Tests that subscribers are called with the details of each event.
+    """
+    received = []
+    helper_events.subscribe("test_event", received.append)
+    helper_events.publish("test_event", 1)
+    helper_events.publish("other_event", 2)
+    assert received == [1]
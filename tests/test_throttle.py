@@ -0,0 +1,39 @@
+import student_network.helpers.helper_throttle as helper_throttle
+
+
+def test_limiter_allows_bursts_then_rejects():
+    """
+    Tests that attempts beyond the burst are rejected until tokens refill.
+    """
+    limiter = helper_throttle.TokenBucketLimiter("test", 2, 60, persist=False)
+    assert limiter.try_attempt("student1") == (True, 0)
+    assert limiter.try_attempt("student1") == (True, 0)
+    allowed, retry_after = limiter.try_attempt("student1")
+    assert not allowed
+    assert 0 < retry_after <= 30
+    # Other keys have their own limit.
+    assert limiter.try_attempt("student2") == (True, 0)
+
+
+def test_limiter_refund():
+    """
+    Tests that refunded attempts can be made again.
+    """
+    limiter = helper_throttle.TokenBucketLimiter("test", 1, 60, persist=False)
+    assert limiter.try_attempt("student1")[0]
+    limiter.refund("student1")
+    assert limiter.try_attempt("student1")[0]
+
+
+def test_failed_login_cache():
+    """
+    Tests that a failed login is only remembered for the same password and hash.
+    """
+    helper_throttle.record_failed_login("student1", "badpw123", b"$2b$12$abc")
+    assert helper_throttle.has_recently_failed("student1", "badpw123", b"$2b$12$abc")
+    assert not helper_throttle.has_recently_failed(
+        "student1", "goodpw123", b"$2b$12$abc"
+    )
+    assert not helper_throttle.has_recently_failed(
+        "student1", "badpw123", b"$2b$12$def"
+    )
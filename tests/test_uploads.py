@@ -0,0 +1,183 @@
+import io
+import sqlite3
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+import student_network.helpers.helper_uploads as helper_uploads
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+
+class QueuedExecutor:
+    """
+    Holds submitted images without processing them, so that each test can
+    choose when and how they finish.
+    """
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, function, *args) -> Future:
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def make_upload(colour: str = "red", size: tuple = (4, 4), filename="a.png"):
+    """
+    Creates an uploaded PNG file.
+    """
+    data = io.BytesIO()
+    Image.new("RGB", size, colour).save(data, "PNG")
+    return FileStorage(io.BytesIO(data.getvalue()), filename=filename)
+
+
+@pytest.fixture
+def executor(monkeypatch, tmp_path):
+    """
+    Queues uploads in an empty database, without starting worker processes.
+    """
+    monkeypatch.chdir(tmp_path)
+    with sqlite3.connect("db.sqlite3") as conn:
+        conn.execute(
+            "CREATE TABLE Image (kind, name, referenceCount DEFAULT 0, uploaded, "
+            "PRIMARY KEY (kind, name));"
+        )
+        conn.execute(
+            "CREATE TABLE ImageUpload (kind, uploadHash, name, "
+            "PRIMARY KEY (kind, uploadHash));"
+        )
+    queued = QueuedExecutor()
+    monkeypatch.setattr(helper_uploads, "_get_executor", lambda: queued)
+    monkeypatch.setattr(helper_uploads, "_pending", 0)
+    monkeypatch.setattr(helper_uploads, "_jobs", {})
+    return queued
+
+
+def test_validate_upload():
+    """
+    Tests that only images within the size limit can be queued.
+    """
+    upload = make_upload()
+    assert helper_uploads.validate_upload(upload, upload.read()) == (True, "")
+    upload = make_upload(filename="a.txt")
+    assert not helper_uploads.validate_upload(upload, upload.read())[0]
+    upload = FileStorage(io.BytesIO(b"not an image"), filename="a.png")
+    assert not helper_uploads.validate_upload(upload, upload.read())[0]
+
+
+def test_queue_full(executor, monkeypatch):
+    """
+    Tests that uploads are turned away while the queue is full, and accepted
+    again once an image has finished.
+    """
+    monkeypatch.setattr(helper_uploads, "MAX_QUEUED_JOBS", 2)
+    assert helper_uploads.queue_post_image(make_upload("red"))[1:] == ("", False)
+    assert helper_uploads.queue_post_image(make_upload("blue"))[1:] == ("", False)
+    upload_id, message, full = helper_uploads.queue_post_image(make_upload("green"))
+    assert upload_id is None and message and full
+
+    executor.futures[0].set_result("a" * 64)
+    assert helper_uploads.queue_post_image(make_upload("green"))[1:] == ("", False)
+
+
+def test_status_once_done(executor, monkeypatch):
+    """
+    Tests that an image is processing until its worker finishes, and that the
+    same file isn't processed again afterwards.
+    """
+    upload_id, _, _ = helper_uploads.queue_post_image(make_upload())
+    assert helper_uploads.get_status(upload_id) == {
+        "status": "processing",
+        "name": None,
+    }
+
+    name = "a" * 64
+    executor.futures[0].set_result(name)
+    assert helper_uploads.get_status(upload_id) == {"status": "done", "name": name}
+
+    monkeypatch.setattr(
+        helper_uploads.helper_images, "image_exists", lambda kind, x: x == name
+    )
+    assert helper_uploads.queue_post_image(make_upload()) == (name, "", False)
+    assert len(executor.futures) == 1
+    assert helper_uploads.get_status(name) == {"status": "done", "name": name}
+    assert helper_uploads.get_status("unknown")["status"] == "failed"
+
+
+def test_failed_processing(executor):
+    """
+    Tests that an image whose worker fails is reported as failed, and frees
+    up its place in the queue.
+    """
+    upload_id, _, _ = helper_uploads.queue_post_image(make_upload())
+    executor.futures[0].set_exception(OSError("truncated"))
+    assert helper_uploads.get_status(upload_id) == {"status": "failed", "name": None}
+    assert helper_uploads._pending == 0
+
+
+def test_cancel(executor):
+    """
+    Tests that a cancelled image stays cancelled once its worker finishes, and
+    that only images still being processed can be cancelled.
+    """
+    upload_id, _, _ = helper_uploads.queue_post_image(make_upload())
+    assert helper_uploads.cancel(upload_id)
+    assert not helper_uploads.cancel(upload_id)
+    executor.futures[0].set_result("a" * 64)
+    assert helper_uploads.get_status(upload_id) == {
+        "status": "cancelled",
+        "name": None,
+    }
+    assert not helper_uploads.cancel("unknown")
+
+
+def test_recording_fails(executor, monkeypatch):
+    """
+    Tests that an image which can't be recorded in the database is reported
+    as failed, and frees up its place in the queue.
+    """
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(helper_uploads.helper_image_store, "record_upload", locked)
+    upload_id, _, _ = helper_uploads.queue_post_image(make_upload())
+    executor.futures[0].set_result("a" * 64)
+    assert helper_uploads.get_status(upload_id)["status"] == "failed"
+    assert helper_uploads._pending == 0
+
+
+def test_forgotten_job_finishes(executor, monkeypatch, caplog):
+    """
+    Tests that a cancelled image which has been forgotten by the time its
+    worker finishes still frees up its place in the queue.
+    """
+    monkeypatch.setattr(helper_uploads, "MAX_FINISHED_JOBS", 0)
+    upload_id, _, _ = helper_uploads.queue_post_image(make_upload("red"))
+    helper_uploads.cancel(upload_id)
+    helper_uploads.queue_post_image(make_upload("blue"))
+    executor.futures[0].set_result("a" * 64)
+    # Errors raised by the callback are logged rather than raised.
+    assert not caplog.records
+    assert helper_uploads._pending == 1
+    assert helper_uploads.get_status(upload_id)["status"] == "failed"
+
+
+def test_broken_pool(executor, monkeypatch):
+    """
+    Tests that an upload submitted to a pool whose worker has died is turned
+    away without taking up a place, and that a new pool is started next time.
+    """
+
+    def broken(function, *args):
+        raise BrokenProcessPool("A worker died")
+
+    monkeypatch.setattr(executor, "submit", broken)
+    monkeypatch.setattr(helper_uploads, "_executor", executor)
+    upload_id, message, full = helper_uploads.queue_post_image(make_upload())
+    assert upload_id is None and message and full
+    assert helper_uploads._pending == 0
+    assert helper_uploads._jobs == {}
+    assert helper_uploads._executor is None
@@ -0,0 +1,100 @@
+"""
+Benchmarks the queries used to award connection achievements, comparing the
+previous per-connection degree look-ups against the single grouped query. Two
+users with 1,000 connections each are added to an in-memory copy of the
+database, so the real database is left untouched.
+"""
+
+import random
+import sqlite3
+import timeit
+
+import student_network.helpers.helper_connections as helper_connections
+import student_network.helpers.helper_migrations as helper_migrations
+
+CONNECTION_COUNT = 1000
+REPEATS = 20
+
+
+def build_database() -> sqlite3.Connection:
+    """
+    Copies the database into memory and adds users with many connections.
+
+    Returns:
+        The connection to the in-memory database.
+    """
+    conn = sqlite3.connect(":memory:")
+    with sqlite3.connect("db.sqlite3") as source:
+        source.backup(conn)
+    helper_migrations.apply_migrations(conn)
+    cur = conn.cursor()
+
+    others = ["bench_other{}".format(i) for i in range(CONNECTION_COUNT)]
+    cur.executemany(
+        "INSERT INTO UserProfile (username, name, degree) VALUES (?, ?, ?);",
+        [(name, name, random.randint(1, 183)) for name in others]
+        + [("bench_a", "bench_a", 48), ("bench_b", "bench_b", 49)],
+    )
+    for owner in ("bench_a", "bench_b"):
+        cur.executemany(
+            "INSERT INTO Connection (user1, user2, connection_type) "
+            "VALUES (?, ?, 'connected');",
+            [
+                (owner, name) if i % 2 else (name, owner)
+                for i, name in enumerate(others)
+            ],
+        )
+    conn.commit()
+
+    return conn
+
+
+def count_per_connection(cur, username: str) -> tuple:
+    """
+    Counts connections with a different degree using one query per
+    connection, as was previously done when awarding achievements.
+    """
+    cur.execute(
+        "SELECT user2 FROM Connection "
+        "WHERE user1=? AND connection_type='connected' UNION ALL "
+        "SELECT user1 FROM Connection "
+        "WHERE user2=? AND connection_type='connected'",
+        (username, username),
+    )
+    connections = cur.fetchall()
+    cur.execute("SELECT degree FROM UserProfile WHERE username=?;", (username,))
+    degree = cur.fetchone()[0]
+    valid_user_count = 0
+    for user in connections:
+        cur.execute(
+            "SELECT username from UserProfile WHERE degree!=? AND username=?;",
+            (degree, user[0]),
+        )
+        if cur.fetchone():
+            valid_user_count += 1
+
+    return len(connections), valid_user_count
+
+
+def main():
+    conn = build_database()
+    cur = conn.cursor()
+    users = ["bench_a", "bench_b"]
+
+    expected = {user: count_per_connection(cur, user) for user in users}
+    assert helper_connections.get_connection_degree_counts(cur, users) == expected
+
+    per_connection = timeit.timeit(
+        lambda: [count_per_connection(cur, user) for user in users], number=REPEATS
+    )
+    grouped = timeit.timeit(
+        lambda: helper_connections.get_connection_degree_counts(cur, users),
+        number=REPEATS,
+    )
+    print("Users with {} connections each".format(CONNECTION_COUNT))
+    print("Per-connection queries: {:.2f} ms".format(1000 * per_connection / REPEATS))
+    print("Grouped query:          {:.2f} ms".format(1000 * grouped / REPEATS))
+
+
+if __name__ == "__main__":
+    main()
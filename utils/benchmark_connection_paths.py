@@ -0,0 +1,134 @@
+"""
+Benchmarks finding the shortest path between users on a generated network of
+100,000 users, comparing searching outwards from one end against searching
+from both ends at once. Each user is connected to users near them, as
+students on the same course would be, and to a few users picked at random.
+The real database isn't used.
+"""
+
+import random
+import statistics
+import time
+from collections import deque
+
+import student_network.helpers.helper_graph as helper_graph
+
+USER_COUNT = 100000
+LOCAL_CONNECTIONS = 8
+RANDOM_CONNECTIONS = 2
+QUERIES = 500
+
+
+def generate_edges(seed: int = 0) -> list:
+    """
+    Generates the connections of the network.
+
+    Returns:
+        Each pair of connected users.
+    """
+    rng = random.Random(seed)
+    edges = set()
+    for user in range(USER_COUNT):
+        for _ in range(LOCAL_CONNECTIONS // 2):
+            other = (user + rng.randint(1, 50)) % USER_COUNT
+            edges.add((min(user, other), max(user, other)))
+        for _ in range(RANDOM_CONNECTIONS // 2):
+            other = rng.randrange(USER_COUNT)
+            if other != user:
+                edges.add((min(user, other), max(user, other)))
+
+    return [("user{}".format(a), "user{}".format(b)) for a, b in edges]
+
+
+def one_sided_path(graph, source: str, target: str, max_hops: int) -> list:
+    """
+    Finds a shortest path by searching outwards from the source only.
+    """
+    source_index, target_index = graph.indexes[source], graph.indexes[target]
+    parents = {source_index: -1}
+    queue = deque([(source_index, 0)])
+    while queue:
+        index, depth = queue.popleft()
+        if index == target_index:
+            path = []
+            while index != -1:
+                path.append(graph.usernames[index])
+                index = parents[index]
+            return path[::-1]
+        if depth == max_hops:
+            continue
+        for neighbour in graph.get_neighbours(index):
+            if neighbour not in parents:
+                parents[neighbour] = index
+                queue.append((neighbour, depth + 1))
+
+    return None
+
+
+def time_queries(function, pairs: list) -> list:
+    """
+    Times each query in milliseconds.
+    """
+    timings = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        function(source, target)
+        timings.append(1000 * (time.perf_counter() - start))
+    return timings
+
+
+def main():
+    edges = generate_edges()
+    start = time.perf_counter()
+    graph = helper_graph.ConnectionGraph.from_edges(edges)
+    build_time = time.perf_counter() - start
+    print(
+        "{} users, {} connections, index built in {:.2f} s".format(
+            len(graph.usernames), len(edges), build_time
+        )
+    )
+
+    rng = random.Random(1)
+    # Picks pairs of users a few hops apart, as well as pairs picked at
+    # random which are usually too far apart to be found.
+    pairs = []
+    for _ in range(QUERIES):
+        source = rng.choice(graph.usernames)
+        target = source
+        for _ in range(rng.randint(2, 3)):
+            neighbours = graph.get_neighbours(graph.indexes[target])
+            target = graph.usernames[rng.choice(neighbours)]
+        pairs.append((source, target))
+        pairs.append((source, rng.choice(graph.usernames)))
+
+    found = 0
+    for source, target in pairs:
+        path = graph.shortest_path(source, target)
+        expected = one_sided_path(graph, source, target, helper_graph.MAX_HOPS)
+        assert (path is None) == (expected is None)
+        assert path is None or len(path) == len(expected)
+        found += path is not None
+    print(
+        "{} of {} pairs within {} hops".format(found, len(pairs), helper_graph.MAX_HOPS)
+    )
+
+    for name, function in [
+        (
+            "One-sided search",
+            lambda s, t: one_sided_path(graph, s, t, helper_graph.MAX_HOPS),
+        ),
+        ("Two-sided search", graph.shortest_path),
+    ]:
+        timings = sorted(time_queries(function, pairs))
+        print(
+            "{:<17} median {:.3f} ms, 95th percentile {:.3f} ms, max {:.3f} ms".format(
+                name + ":",
+                statistics.median(timings),
+                timings[int(0.95 * len(timings))],
+                timings[-1],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmarks logging in during a flood of logins, measuring how many logins are
+handled per second and how long a page which doesn't hash anything takes to
+load meanwhile. Checking passwords on the request thread is compared against
+the pool of hashing processes. A copy of the database is used, so the real
+database is left untouched.
+"""
+
+import http.client
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import bcrypt
+
+LOGIN_CLIENTS = 16
+DURATION = 10
+BACKOFF = 0.5
+USERNAME = "benchuser"
+PASSWORD = "benchpass1"
+
+
+def post_login(port: int) -> int:
+    """
+    Logs in as the benchmark user.
+
+    Returns:
+        The status code of the response.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = urllib.parse.urlencode({"username_input": USERNAME, "psw_input": PASSWORD})
+    conn.request(
+        "POST",
+        "/login",
+        body,
+        {"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+
+def get_page(port: int) -> float:
+    """
+    Loads the login page, which doesn't hash anything.
+
+    Returns:
+        The number of milliseconds the page took to load.
+    """
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/login")
+    conn.getresponse().read()
+    conn.close()
+    return 1000 * (time.perf_counter() - start)
+
+
+def run_flood(port: int) -> dict:
+    """
+    Floods the server with logins while repeatedly loading another page.
+
+    Returns:
+        The number of each status code returned for logins, and the latencies
+        of the other page.
+    """
+    statuses = {}
+    latencies = []
+    lock = threading.Lock()
+    end = time.monotonic() + DURATION
+
+    def log_in():
+        while time.monotonic() < end:
+            status = post_login(port)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+            if status == 503:
+                # Backs off as the server asks, though for less time than the
+                # Retry-After header so that the flood keeps up.
+                time.sleep(BACKOFF)
+
+    def load_page():
+        while time.monotonic() < end:
+            latencies.append(get_page(port))
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=log_in) for _ in range(LOGIN_CLIENTS)]
+    threads.append(threading.Thread(target=load_page))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {"statuses": statuses, "latencies": latencies}
+
+
+def report(mode: str, results: dict):
+    """
+    Prints the results of a flood.
+    """
+    latencies = sorted(results["latencies"])
+    logins = results["statuses"].get(302, 0)
+    print(mode)
+    print("  Successful logins per second: {:.1f}".format(logins / DURATION))
+    print("  Logins turned away (503): {}".format(results["statuses"].get(503, 0)))
+    print(
+        "  Other page latency: median {:.0f} ms, p95 {:.0f} ms".format(
+            statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+        )
+    )
+
+
+def main():
+    source = os.path.abspath("db.sqlite3")
+    directory = tempfile.mkdtemp()
+    shutil.copy(source, os.path.join(directory, "db.sqlite3"))
+    os.chdir(directory)
+
+    import student_network.helpers.helper_hashing as helper_hashing
+    from student_network.app import app
+    from werkzeug.serving import make_server
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        conn.execute(
+            "INSERT INTO ACCOUNTS (username, password, email, type) "
+            "VALUES (?, ?, ?, 'student');",
+            (
+                USERNAME,
+                bcrypt.hashpw(
+                    PASSWORD.encode(), bcrypt.gensalt(helper_hashing.BCRYPT_ROUNDS)
+                ),
+                "benchuser@exeter.ac.uk",
+            ),
+        )
+        conn.commit()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    check_password = helper_hashing.check_password
+    helper_hashing.check_password = lambda password, hashed: bcrypt.checkpw(
+        password.encode(), hashed
+    )
+    report("Checking passwords on the request thread", run_flood(server.port))
+
+    helper_hashing.check_password = check_password
+    report(
+        "Checking passwords in {} hashing processes".format(helper_hashing.MAX_WORKERS),
+        run_flood(server.port),
+    )
+
+    server.shutdown()
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Utility for checking that the connection counts kept for each user, which are
+shown in the navbar and used for achievements, match their connections. By
+default the incorrect counts are only listed; pass --repair to replace them
+with the correct ones.
+"""
+
+import argparse
+import sqlite3
+
+import student_network.helpers.helper_connections as helper_connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--repair", action="store_true", help="replace the incorrect counts"
+    )
+    args = parser.parse_args()
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        mismatches = helper_connections.repair_connection_counts(
+            conn.cursor(), repair=args.repair
+        )
+        conn.commit()
+
+    for username, kept, actual in mismatches:
+        differences = ", ".join(
+            "{} {} should be {}".format(field, kept_count, actual_count)
+            for field, kept_count, actual_count in zip(kept._fields, kept, actual)
+            if kept_count != actual_count
+        )
+        print("{}: {}".format(username, differences))
+    print(
+        "{} {} users with incorrect counts.".format(
+            "Repaired" if args.repair else "Found", len(mismatches)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
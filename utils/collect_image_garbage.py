@@ -0,0 +1,38 @@
+"""
+Utility for deleting uploaded images which aren't used by any post or profile,
+along with any stray files in the image directories. By default the unused
+files are only listed; pass --delete to remove them.
+"""
+
+import argparse
+import sqlite3
+
+import student_network.helpers.helper_image_store as helper_image_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delete", action="store_true", help="delete the unused files")
+    parser.add_argument(
+        "--grace-hours",
+        type=float,
+        default=helper_image_store.GARBAGE_GRACE_PERIOD / 3600,
+        help="keep files uploaded within this many hours",
+    )
+    args = parser.parse_args()
+
+    with sqlite3.connect("db.sqlite3") as conn:
+        unused = helper_image_store.collect_garbage(
+            conn, delete=args.delete, grace_period=args.grace_hours * 3600
+        )
+        conn.commit()
+
+    for file_path in unused:
+        print(file_path)
+    print(
+        "{} {} unused files.".format("Deleted" if args.delete else "Found", len(unused))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Utility for grouping users into communities of connections, which are shown
+to staff on /admin and used to rank recommended connections. The connections
+are read into an adjacency index and grouped using label propagation, then
+the community of every connected user is stored in UserCluster. Run it
+regularly, such as nightly, as communities aren't updated as connections
+change.
+
+Pass --synthetic to instead group a generated network of about 200,000
+connections with known communities, without reading or changing the database,
+to measure how long grouping takes and how much memory it uses.
+"""
+
+import argparse
+import random
+import sqlite3
+import resource
+import time
+from collections import Counter
+
+import student_network.helpers.helper_graph as helper_graph
+import student_network.helpers.helper_migrations as helper_migrations
+
+SYNTHETIC_USERS = 50000
+SYNTHETIC_COMMUNITY_SIZE = 100
+# Each user has about this many connections within their community, and
+# this many outside of it, giving about 200,000 connections in total.
+SYNTHETIC_INSIDE = 7
+SYNTHETIC_OUTSIDE = 1
+
+
+def generate_edges(seed: int = 0) -> list:
+    """
+    Generates a network where users are mostly connected to others in their
+    own community, which is their number divided by the community size.
+
+    Returns:
+        Each pair of connected users.
+    """
+    rng = random.Random(seed)
+    edges = set()
+    for user in range(SYNTHETIC_USERS):
+        community = user - user % SYNTHETIC_COMMUNITY_SIZE
+        others = [
+            community + rng.randrange(SYNTHETIC_COMMUNITY_SIZE)
+            for _ in range(SYNTHETIC_INSIDE // 2 + rng.randint(0, 1))
+        ]
+        if rng.random() < SYNTHETIC_OUTSIDE:
+            others.append(rng.randrange(SYNTHETIC_USERS))
+        for other in others:
+            if other != user:
+                edges.add((min(user, other), max(user, other)))
+
+    return [("user{}".format(a), "user{}".format(b)) for a, b in edges]
+
+
+def get_purity(graph, labels) -> float:
+    """
+    Measures how well the communities found match the generated ones, as the
+    share of users in the same community as most of their generated one.
+    """
+    communities = {}
+    for username, label in zip(graph.usernames, labels):
+        community = int(username[4:]) // SYNTHETIC_COMMUNITY_SIZE
+        communities.setdefault(community, Counter())[label] += 1
+    matched = sum(max(counts.values()) for counts in communities.values())
+    return matched / len(graph.usernames)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--synthetic", action="store_true", help="group a generated network instead"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="the seed for breaking ties randomly"
+    )
+    args = parser.parse_args()
+
+    if args.synthetic:
+        edges = generate_edges()
+    else:
+        with sqlite3.connect("db.sqlite3") as conn:
+            helper_migrations.apply_migrations(conn)
+
+    start = time.perf_counter()
+    if args.synthetic:
+        graph = helper_graph.ConnectionGraph.from_edges(edges)
+    else:
+        with sqlite3.connect("db.sqlite3") as conn:
+            graph = helper_graph.load_graph(conn.cursor())
+    built = time.perf_counter()
+    labels, rounds = helper_graph.propagate_labels(graph, seed=args.seed)
+    grouped = time.perf_counter()
+    index_memory = sum(
+        values.itemsize * len(values)
+        for values in (graph.offsets, graph.neighbours, labels)
+    )
+    # The peak is in kilobytes on Linux.
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    sizes = Counter(labels)
+    print(
+        "{} users, {} connections".format(
+            len(graph.usernames), len(graph.neighbours) // 2
+        )
+    )
+    print(
+        "Index built in {:.2f} s, grouped in {:.2f} s over {} rounds".format(
+            built - start, grouped - built, rounds
+        )
+    )
+    print(
+        "Index and communities use {:.1f} MB, peak memory used {:.1f} MB".format(
+            index_memory / 1024**2, peak_memory / 1024**2
+        )
+    )
+    print(
+        "{} communities, the largest with {} users".format(
+            len(sizes), ", ".join(str(size) for _, size in sizes.most_common(5))
+        )
+    )
+
+    if args.synthetic:
+        print(
+            "{:.1%} of users grouped with most of their generated community".format(
+                get_purity(graph, labels)
+            )
+        )
+    else:
+        with sqlite3.connect("db.sqlite3") as conn:
+            helper_graph.save_clusters(conn.cursor(), graph, labels)
+            conn.commit()
+        print("Saved the community of each user.")
+
+
+if __name__ == "__main__":
+    main()
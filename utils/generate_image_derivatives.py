@@ -0,0 +1,49 @@
+"""
+Utility for generating the smaller sizes and WebP versions of images which
+were uploaded before the image pipeline saved them. Images which already have
+their smaller sizes are skipped, so this is safe to run more than once. The
+original files are never rewritten, as they're served as unchanging.
+"""
+
+import os
+
+import student_network.helpers.helper_images as helper_images
+
+
+def generate_sizes(kind: str) -> int:
+    """
+    Generates the smaller sizes of each image of a kind which doesn't have
+    them yet.
+
+    Args:
+        kind: The kind of image, either "post_imgs" or "avatars".
+
+    Returns:
+        The number of images whose sizes were generated.
+    """
+    sizes, crop, webp = helper_images.KINDS[kind]
+    directory = os.path.join(helper_images.IMAGES_DIR, kind)
+    smaller_sizes = {size: sizes[size] for size in sizes if size != "full"}
+    generated = 0
+    for file_name in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(file_name)
+        if extension != ".jpg" or name.endswith(tuple("_" + size for size in sizes)):
+            continue
+        if helper_images.image_exists(kind, name):
+            continue
+
+        with open(os.path.join(directory, file_name), "rb") as file:
+            img = helper_images.open_image(file, sizes["full"])
+        helper_images.save_variants(img, directory, name, smaller_sizes, crop, webp)
+        generated += 1
+
+    return generated
+
+
+def main():
+    for kind in helper_images.KINDS:
+        print("Generated sizes for {} images in {}.".format(generate_sizes(kind), kind))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Utility for creating student accounts in bulk from a CSV file, such as when a
+new intake starts. The CSV must have the columns username, name, email,
+degree, hobbies and interests, and may have a password column. Hobbies and
+interests are separated by commas. Degrees can be given by name or ID.
+
+Rows are read and created in batches, with passwords hashed across every core.
+Students without a password are given a random one. The result of each row is
+written to a report CSV, which includes any generated passwords, so keep it
+somewhere safe.
+
+Usage: python utils/provision_accounts.py students.csv report.csv
+"""
+
+import argparse
+import csv
+import itertools
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import student_network.helpers.helper_provisioning as helper_provisioning
+
+REPORT_COLUMNS = ["row", "username", "status", "error", "password"]
+
+
+def split_list(value: str) -> list:
+    """
+    Splits a comma-separated list of hobbies or interests, formatting them in
+    the same way as the edit profile form.
+
+    Args:
+        value: The comma-separated list.
+
+    Returns:
+        The items in the list, without duplicates or blanks.
+    """
+    items = (item.strip().lower() for item in (value or "").split(","))
+    return list(dict.fromkeys(item for item in items if item))
+
+
+def read_rows(file) -> iter:
+    """
+    Reads the students from a CSV file one at a time.
+
+    Args:
+        file: The open CSV file.
+
+    Returns:
+        The details of each student, numbered by their row in the file.
+    """
+    for number, row in enumerate(csv.DictReader(file), start=2):
+        yield {
+            "row": number,
+            "username": (row.get("username") or "").strip().lower(),
+            "name": " ".join((row.get("name") or "").split()),
+            "email": (row.get("email") or "").strip(),
+            "degree": (row.get("degree") or "").strip(),
+            "hobbies": split_list(row.get("hobbies")),
+            "interests": split_list(row.get("interests")),
+            "password": row.get("password"),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("students", help="the CSV file of students to create")
+    parser.add_argument("report", help="the CSV file to write the results to")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="the number of hashing processes"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = {"created": 0, "failed": 0}
+    with sqlite3.connect("db.sqlite3") as conn, open(
+        args.students, newline="", encoding="utf-8-sig"
+    ) as students, open(args.report, "w", newline="") as report, ProcessPoolExecutor(
+        max_workers=args.workers
+    ) as executor:
+        cur = conn.cursor()
+        cur.execute("SELECT degree, degreeId FROM Degree;")
+        degrees = {}
+        for name, degree_id in cur.fetchall():
+            degrees[name.strip()] = degree_id
+            degrees[str(degree_id)] = degree_id
+
+        writer = csv.DictWriter(report, REPORT_COLUMNS)
+        writer.writeheader()
+        seen = set()
+        rows = read_rows(students)
+        while True:
+            batch = list(itertools.islice(rows, helper_provisioning.BATCH_SIZE))
+            if not batch:
+                break
+            for result in helper_provisioning.provision_batch(
+                conn, executor, batch, degrees, seen
+            ):
+                writer.writerow(result)
+                counts[result["status"]] += 1
+                if result["status"] == "failed":
+                    print(
+                        "Row {} ({}): {}".format(
+                            result["row"], result["username"], result["error"]
+                        )
+                    )
+            elapsed = time.perf_counter() - start
+            print(
+                "{} created, {} failed, {:.1f} accounts per second".format(
+                    counts["created"], counts["failed"], counts["created"] / elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()